@@ -1,7 +1,58 @@
+import io
 import os
-from flask import Flask, request, render_template_string
+import uuid
+from datetime import datetime, timezone
+from flask import Flask, Response, request, render_template, jsonify, stream_with_context, url_for
+from jinja2 import DictLoader
 
-app = Flask(__name__)
+import assets
+import bulk
+import carbon
+import chargers
+import distribution
+import history
+import inverse
+import jobs
+import matrix
+import metrics
+import projection
+import scheduler
+import solar
+from cache import DEFAULT_SLOT_BYTES, LRUCache, SharedCache
+from calculator import (EV_EFFICIENCY, TVA_MULTIPLIER, calculate_charging_time, calculate_costs,
+                        calculate_environmental_impact, calculate_summary, charging_time_values,
+                        format_duration)
+from curves import CURVES, CURVES_PATH, get_curve
+from vehicles import CATALOG, MODELS_PATH, get_vehicle
+from tariffs import TimeOfUseTariff, format_clock, overnight_window, parse_clock, time_of_use_summary
+
+# Static files are served by static_file() below, from memory and pre-compressed
+app = Flask(__name__, static_folder=None)
+STATIC_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+static_assets = assets.StaticAssets(STATIC_FOLDER)
+
+# Size and lifetime (seconds) of the JSON API result cache
+app.config['CALC_CACHE_SIZE'] = int(os.environ.get('CALC_CACHE_SIZE', 1024))
+app.config['CALC_CACHE_TTL'] = float(os.environ.get('CALC_CACHE_TTL', 3600))
+# Memory-mapped file shared by every worker on the host; unset keeps the cache per process
+app.config['CALC_CACHE_FILE'] = os.environ.get('CALC_CACHE_FILE') or None
+app.config['CALC_CACHE_SLOT_BYTES'] = int(os.environ.get('CALC_CACHE_SLOT_BYTES', DEFAULT_SLOT_BYTES))
+app.config['CALC_CACHE_SNAPSHOT'] = os.environ.get('CALC_CACHE_SNAPSHOT') or None
+# Heavy requests run as background jobs; results are files in JOB_DIR, shared by all workers
+app.config['JOB_DIR'] = os.environ.get('JOB_DIR') or jobs.DEFAULT_JOB_DIR
+app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', jobs.DEFAULT_WORKERS))
+app.config['JOB_QUEUE_LIMIT'] = int(os.environ.get('JOB_QUEUE_LIMIT', jobs.DEFAULT_QUEUE_LIMIT))
+# What counts as heavy: distribution samples, and vehicles x slots for a site schedule
+app.config['JOB_DISTRIBUTION_SAMPLES'] = int(os.environ.get('JOB_DISTRIBUTION_SAMPLES',
+                                                            distribution.PARALLEL_SAMPLES))
+app.config['JOB_SCHEDULE_CELLS'] = int(os.environ.get('JOB_SCHEDULE_CELLS', 1000000))
+
+# Charging currents compared on the results page and by default in the API
+DEFAULT_AMPERAGES = (6, 8, 10, 16)
+
+# Samples drawn for the ranges shown on the results page
+FORM_DISTRIBUTION_SAMPLES = 5000
+FORM_PERCENTILES = (5, 50, 95)
 
 # HTML template with external CSS
 HTML_TEMPLATE = '''
@@ -11,14 +62,19 @@ HTML_TEMPLATE = '''
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>EV Charge Calculator</title>
-    <link rel="stylesheet" href="/static/styles.css">
+    <link rel="stylesheet" href="{{ static_url('styles.css') }}">
 </head>
 <body>
     <div class="container">
         <h1>EV Charge Calculator</h1>
         
         <form method="post">
-            <input type="hidden" name="voltage" value="230">
+            <div class="form-group" style="grid-column: 1 / -1;">
+                <label for="vehicle_id">Vehicle (optional):</label>
+                <input type="text" id="vehicle_id" name="vehicle_id" list="vehicle_options" value="{{ request.form.get('vehicle_id', '') }}" placeholder="Start typing a make or model" autocomplete="off">
+                <datalist id="vehicle_options"></datalist>
+                <small><a href="/matrix">Compare all vehicles on every charger</a></small>
+            </div>
             <div class="form-group">
                 <label for="battery_size">Battery Size (kWh):</label>
                 <input type="number" id="battery_size" name="battery_size" value="{{ request.form.get('battery_size', '26.8') }}" step="0.1" required>
@@ -63,6 +119,49 @@ HTML_TEMPLATE = '''
                     </div>
                 </div>
             </div>
+            <div class="form-group" style="grid-column: 1 / -1;">
+                <label for="charger">Charger:</label>
+                <select id="charger" name="charger">
+                    {% for charger in charger_types %}
+                    <option value="{{ charger.id }}"{% if request.form.get('charger') == charger.id %} selected{% endif %}>{{ charger.label }}</option>
+                    {% endfor %}
+                </select>
+            </div>
+            <div class="form-group" style="grid-column: 1 / -1;">
+                <label for="charge_curve">Charge curve:</label>
+                <select id="charge_curve" name="charge_curve">
+                    <option value="">Vehicle default (constant power if no vehicle)</option>
+                    {% for curve in charge_curves %}
+                    <option value="{{ curve.name }}"{% if request.form.get('charge_curve') == curve.name %} selected{% endif %}>{{ curve.description or curve.name }}</option>
+                    {% endfor %}
+                </select>
+            </div>
+            <div class="form-group" style="grid-column: 1 / -1;">
+                <label for="tou_prices">Time-of-use prices (€/kWh before TVA, optional):</label>
+                <input type="text" id="tou_prices" name="tou_prices" value="{{ request.form.get('tou_prices', '') }}" placeholder="Comma-separated, 24, 48 or 96 slots from midnight">
+            </div>
+            <div class="form-group">
+                <label for="plug_in">Plug-in time:</label>
+                <input type="time" id="plug_in" name="plug_in" value="{{ request.form.get('plug_in', '18:00') }}">
+            </div>
+            <div class="form-group">
+                <label for="ready_by">Ready by:</label>
+                <input type="time" id="ready_by" name="ready_by" value="{{ request.form.get('ready_by', '07:00') }}">
+            </div>
+            {% if carbon_regions %}
+            <div class="form-group" style="grid-column: 1 / -1;">
+                <label for="carbon_region">Grid carbon intensity:</label>
+                <select id="carbon_region" name="carbon_region">
+                    <option value="">Ireland average (2023)</option>
+                    {% for region in carbon_regions %}
+                    <option value="{{ region }}"{% if request.form.get('carbon_region') == region %} selected{% endif %}>{{ region }} grid from today's plug-in time</option>
+                    {% endfor %}
+                </select>
+            </div>
+            {% endif %}
+            <div class="form-group" style="grid-column: 1 / -1;">
+                <label><input type="checkbox" name="distribution" value="1"{% if request.form.get('distribution') %} checked{% endif %}> Show likely ranges for real-world conditions</label>
+            </div>
             <div class="form-group" style="grid-column: 1 / -1;">
                 <button type="submit">Calculate Charging Times</button>
             </div>
@@ -71,58 +170,30 @@ HTML_TEMPLATE = '''
         {% if charge_times %}
             <div class="results">
                 <h2>Charging Time Estimates</h2>
+                {% if vehicle %}
+                <p>{{ vehicle.name }}: {{ vehicle.usable_kwh }} kWh usable, {{ vehicle.efficiency_kwh_per_km }} kWh/km, {{ vehicle.onboard_charger_kw }} kW onboard charger</p>
+                {% endif %}
+                {% if charger %}
+                <p>On {{ charger.label }}, after {{ "%.0f"|format((1 - charger.efficiency) * 100) }}% charger losses:</p>
+                {% else %}
                 <p>For EU standard voltage (230V):</p>
-                <table>
-                    <thead>
-                        <tr>
-                            <th>Current</th>
-                            <th>Power</th>
-                            <th>Total Charging Time</th>
-                            <th>Time per 10%</th>
-                        </tr>
-                    </thead>
-                    <tbody>
-                        {% for time in charge_times %}
-                        <tr>
-                            <td>{{ time.amperage }}A</td>
-                            <td>{{ time.power_kw }}kW</td>
-                            <td>{{ time.duration }}</td>
-                            <td>{{ time.time_per_10_percent }}</td>
-                        </tr>
-                        {% endfor %}
-                    </tbody>
-                </table>
+                {% endif %}
+                {% include 'results_table.html' %}
                 
-                <div class="cost-summary">
-                    <h2>Cost Summary</h2>
-                    <p>Electricity rate: €{{ "%.5f"|format(cost_per_kwh) }}/kWh (before TVA)</p>
-                    <p>Rate with TVA (20%): €{{ "%.5f"|format(cost_per_kwh * 1.2) }}/kWh</p>
-                    <p>Total energy needed: {{ "%.1f"|format(energy_needed) }} kWh</p>
-                    <p>Total cost: {{ total_cost }}</p>
-                    <p>Cost for full 100% charge: {{ cost_for_full }}</p>
-                </div>
+                {% include 'cost_summary.html' %}
+                {% if time_of_use %}
+                {% include 'time_of_use.html' %}
+                {% endif %}
+                {% if distribution %}
+                {% include 'distribution.html' %}
+                {% endif %}
             </div>
             
-            <div class="environmental-impact">
-                <h2>Environmental Impact</h2>
-                <p>Estimated range: {{ environmental.ev_range }} km</p>
-                <p>EV CO2 emissions: {{ environmental.ev_emissions }}</p>
-                <p>CO2 savings vs petrol: {{ environmental.petrol_savings }} kg</p>
-                <p>CO2 savings vs diesel: {{ environmental.diesel_savings }} kg</p>
-                
-                <h3>Air Quality Impact</h3>
-                <p>NOx emissions avoided:</p>
-                <ul>
-                    <li>vs petrol: {{ environmental.petrol_nox_saved }}g</li>
-                    <li>vs diesel: {{ environmental.diesel_nox_saved }}g</li>
-                </ul>
-                <p>Particulate Matter (PM) emissions avoided:</p>
-                <ul>
-                    <li>vs petrol: {{ environmental.petrol_pm_saved }}g</li>
-                    <li>vs diesel: {{ environmental.diesel_pm_saved }}g</li>
-                </ul>
-                <small>Based on Ireland's grid carbon intensity and Euro 6 vehicle emission standards (2023)</small>
-            </div>
+            {% include 'environmental.html' %}
+            
+            {% include 'projection.html' %}
+            
+            {% include 'planner.html' %}
         {% endif %}
     </div>
     <script>
@@ -165,183 +236,1364 @@ HTML_TEMPLATE = '''
             // Initialize the displays
             updatePercentageValue(startSlider, startValue);
             updatePercentageValue(endSlider, endValue);
+            
+            // Re-project the year as the driving sliders move; the server only
+            // recomputes the totals affected by the change
+            const projectionPanel = document.getElementById('projection');
+            if (projectionPanel) {
+                const weekdayKm = document.getElementById('projection_weekday_km');
+                const weekendKm = document.getElementById('projection_weekend_km');
+                let projectionToken = null;
+                let projectionTimer = null;
+                
+                function updateProjection() {
+                    const weekday = parseFloat(weekdayKm.value);
+                    const weekend = parseFloat(weekendKm.value);
+                    document.querySelector('label[for="projection_weekday_km"] .percentage-value').textContent = weekday + ' km';
+                    document.querySelector('label[for="projection_weekend_km"] .percentage-value').textContent = weekend + ' km';
+                    fetch('/api/v1/projection', {
+                        method: 'POST',
+                        headers: {'Content-Type': 'application/json'},
+                        body: JSON.stringify({
+                            token: projectionToken,
+                            weekday_km: [weekday, weekday, weekday, weekday, weekday, weekend, weekend],
+                            tariff: parseFloat(document.getElementById('cost_per_kwh').value),
+                            vehicle_id: document.getElementById('vehicle_id').value || null
+                        })
+                    })
+                        .then(response => response.json())
+                        .then(data => {
+                            if (data.error) {
+                                return;
+                            }
+                            projectionToken = data.token;
+                            document.getElementById('projection_cost').textContent = '€' + data.annual.cost.toFixed(2);
+                            document.getElementById('projection_energy').textContent = data.annual.energy_kwh.toFixed(0) + ' kWh';
+                            document.getElementById('projection_emissions').textContent = data.annual.emissions_kg.toFixed(0) + ' kg';
+                            document.getElementById('projection_session').textContent = '€' + data.average_session_cost.toFixed(2);
+                        });
+                }
+                
+                [weekdayKm, weekendKm].forEach(slider => slider.addEventListener('input', function() {
+                    clearTimeout(projectionTimer);
+                    projectionTimer = setTimeout(updateProjection, 100);
+                }));
+                updateProjection();
+            }
+            
+            // Answer the reverse questions as the deadline and budget sliders move
+            const plannerPanel = document.getElementById('planner');
+            if (plannerPanel) {
+                const readyBy = document.getElementById('planner_ready_by');
+                const budget = document.getElementById('planner_budget');
+                const form = document.querySelector('form');
+                
+                function clock(hours) {
+                    const minutes = Math.round(hours * 60) % (24 * 60);
+                    return String(Math.floor(minutes / 60)).padStart(2, '0') + ':' + String(minutes % 60).padStart(2, '0');
+                }
+                
+                function updatePlanner() {
+                    document.querySelector('label[for="planner_ready_by"] .percentage-value').textContent = clock(parseFloat(readyBy.value));
+                    document.querySelector('label[for="planner_budget"] .percentage-value').textContent = '€' + parseFloat(budget.value).toFixed(2);
+                    const data = new FormData(form);
+                    data.set('ready_by', clock(parseFloat(readyBy.value)));
+                    data.set('budget', budget.value);
+                    fetch('/api/v1/solve', {method: 'POST', body: data})
+                        .then(response => response.json())
+                        .then(result => {
+                            if (result.error) {
+                                return;
+                            }
+                            const current = result.minimum_current;
+                            document.getElementById('planner_current').textContent = current.feasible
+                                ? current.amperage + 'A, starting ' + current.start + ', €' + current.cost.toFixed(2)
+                                : 'not possible (' + current.limit + ')';
+                            const start = result.latest_start;
+                            document.getElementById('planner_start').textContent = start.feasible
+                                ? start.start + ', €' + start.cost.toFixed(2)
+                                : 'not possible (' + start.limit + ')';
+                            const reachable = result.reachable;
+                            document.getElementById('planner_reachable').textContent =
+                                reachable.end_percentage.toFixed(0) + '% (limited by ' + reachable.limit + ')';
+                        });
+                }
+                
+                [readyBy, budget].forEach(slider => slider.addEventListener('input', updatePlanner));
+                updatePlanner();
+            }
+            
+            // Suggest catalog vehicles as the user types and fill in the battery size
+            const vehicleInput = document.getElementById('vehicle_id');
+            const vehicleOptions = document.getElementById('vehicle_options');
+            const batteryInput = document.getElementById('battery_size');
+            let suggestions = [];
+            
+            vehicleInput.addEventListener('input', function() {
+                const match = suggestions.find(vehicle => vehicle.id === this.value);
+                if (match) {
+                    batteryInput.value = match.usable_kwh;
+                    return;
+                }
+                if (this.value.length < 2) {
+                    return;
+                }
+                fetch('/api/v1/vehicles?q=' + encodeURIComponent(this.value))
+                    .then(response => response.json())
+                    .then(data => {
+                        suggestions = data.vehicles;
+                        vehicleOptions.innerHTML = '';
+                        suggestions.forEach(vehicle => {
+                            const option = document.createElement('option');
+                            option.value = vehicle.id;
+                            option.label = vehicle.name;
+                            vehicleOptions.appendChild(option);
+                        });
+                    });
+            });
         });
     </script>
 </body>
 </html>
 '''
 
-def calculate_environmental_impact(energy_needed):
-    """
-    Calculate environmental impact and savings compared to ICE vehicles.
-    
-    Args:
-        energy_needed (float): Energy needed for charging in kWh
-        
-    Returns:
-        dict: Environmental impact metrics including CO2 and air pollutants
-    """
-    # Average CO2 emissions per kWh of electricity in Ireland (2023)
-    grid_carbon_intensity = 0.220  # kg CO2/kWh
-    
-    # Average petrol car emissions for the same distance
-    # Assuming 0.2 kWh/km for EV efficiency
-    ev_range = energy_needed / 0.2  # km
-    petrol_emissions_per_km = 0.120  # kg CO2/km (average new car 2023)
-    diesel_emissions_per_km = 0.110  # kg CO2/km (average new car 2023)
-    
-    # Air pollutant emissions per km (mg/km) - Euro 6 standards
-    petrol_nox = 60.0  # mg/km NOx
-    diesel_nox = 80.0  # mg/km NOx
-    petrol_pm = 4.5   # mg/km PM (both PM2.5 and PM10)
-    diesel_pm = 4.5   # mg/km PM (both PM2.5 and PM10)
-    
-    # Calculate CO2 emissions
-    ev_emissions = energy_needed * grid_carbon_intensity
-    petrol_emissions = ev_range * petrol_emissions_per_km
-    diesel_emissions = ev_range * diesel_emissions_per_km
-    
-    # Calculate CO2 savings
-    petrol_savings = petrol_emissions - ev_emissions
-    diesel_savings = diesel_emissions - ev_emissions
-    
-    # Calculate air pollutant savings (in grams)
-    petrol_nox_saved = (ev_range * petrol_nox) / 1000  # Convert mg to g
-    diesel_nox_saved = (ev_range * diesel_nox) / 1000
-    petrol_pm_saved = (ev_range * petrol_pm) / 1000
-    diesel_pm_saved = (ev_range * diesel_pm) / 1000
-    
-    # Convert CO2 to more readable units if small
-    if ev_emissions < 1:
-        ev_emissions_str = f"{ev_emissions * 1000:.1f} g"
-    else:
-        ev_emissions_str = f"{ev_emissions:.2f} kg"
-    
-    return {
-        'ev_emissions': ev_emissions_str,
-        'ev_range': f"{ev_range:.1f}",
-        'petrol_savings': f"{petrol_savings:.2f}",
-        'diesel_savings': f"{diesel_savings:.2f}",
-        'petrol_nox_saved': f"{petrol_nox_saved:.1f}",
-        'diesel_nox_saved': f"{diesel_nox_saved:.1f}",
-        'petrol_pm_saved': f"{petrol_pm_saved:.1f}",
-        'diesel_pm_saved': f"{diesel_pm_saved:.1f}"
-    }
+# Partials rendered inside HTML_TEMPLATE's results section
+RESULTS_TABLE_TEMPLATE = '''
+<table>
+    <thead>
+        <tr>
+            <th>Current</th>
+            <th>Power</th>
+            <th>Total Charging Time</th>
+            <th>Time per 10%</th>
+        </tr>
+    </thead>
+    <tbody>
+        {% for time in charge_times %}
+        <tr>
+            <td>{{ time.amperage }}A</td>
+            <td>{{ time.power_kw|round(2) }}kW</td>
+            <td>{{ time.duration }}</td>
+            <td>{{ time.time_per_10_percent }}</td>
+        </tr>
+        {% endfor %}
+    </tbody>
+</table>
+'''
 
+COST_SUMMARY_TEMPLATE = '''
+<div class="cost-summary">
+    <h2>Cost Summary</h2>
+    <p>Electricity rate: €{{ "%.5f"|format(cost_per_kwh) }}/kWh (before TVA)</p>
+    <p>Rate with TVA (20%): €{{ "%.5f"|format(cost_per_kwh * 1.2) }}/kWh</p>
+    <p>Total energy needed: {{ "%.1f"|format(energy_needed) }} kWh</p>
+    {% if charger %}
+    <p>Energy drawn from the grid: {{ "%.1f"|format(energy_needed / charger.efficiency) }} kWh, including {{ "%.0f"|format((1 - charger.efficiency) * 100) }}% charger losses</p>
+    {% endif %}
+    <p>Total cost{% if charger %} of the grid energy{% endif %}: {{ total_cost }}</p>
+    <p>Cost for full 100% charge: {{ cost_for_full }}</p>
+</div>
+'''
 
-def calculate_costs(battery_size, start_percentage, end_percentage, cost_per_kwh):
-    """Calculate electricity costs for charging.
-    
-    Args:
-        battery_size (float): Battery capacity in kWh
-        start_percentage (float): Starting battery percentage
-        end_percentage (float): Target battery percentage
-        cost_per_kwh (float): Electricity cost per kWh before TVA
-        
-    Returns:
-        tuple: (energy_needed, total_cost, cost_per_10_percent)
-    """
-    # Calculate energy needed
-    energy_needed = battery_size * (end_percentage - start_percentage) / 100
-    energy_for_full = battery_size  # Energy needed for 0-100%
-    
-    # Calculate costs with TVA (20%)
-    tva_multiplier = 1.20
-    energy_cost_with_tva = cost_per_kwh * tva_multiplier
-    
-    # Format costs with euro symbol and 2 decimal places
-    total_cost = f"€{energy_needed * energy_cost_with_tva:.2f}"
-    cost_for_full = f"€{energy_for_full * energy_cost_with_tva:.2f}"
-    
-    return energy_needed, total_cost, cost_for_full
+TIME_OF_USE_TEMPLATE = '''
+<div class="cost-summary">
+    <h2>Time-of-Use Tariff</h2>
+    <table>
+        <thead>
+            <tr>
+                <th>Current</th>
+                <th>Cost if started at plug-in</th>
+                <th>Cheapest start</th>
+                <th>Cheapest cost</th>
+            </tr>
+        </thead>
+        <tbody>
+            {% for option in time_of_use %}
+            <tr>
+                <td>{{ option.amperage }}A</td>
+                {% if option.cheapest_start %}
+                <td>€{{ "%.2f"|format(option.immediate_cost) }}</td>
+                <td>{{ option.cheapest_start }}</td>
+                <td>€{{ "%.2f"|format(option.cheapest_cost) }}</td>
+                {% else %}
+                <td colspan="3">Cannot finish before the ready-by time</td>
+                {% endif %}
+            </tr>
+            {% endfor %}
+        </tbody>
+    </table>
+</div>
+'''
 
+DISTRIBUTION_TEMPLATE = '''
+<div class="cost-summary">
+    <h2>Likely Ranges</h2>
+    <p>{{ distribution.samples }} simulations varying state-of-charge readings, temperature, charger losses and grid intensity (5th / median / 95th percentile):</p>
+    <table>
+        <thead>
+            <tr>
+                <th>Current</th>
+                <th>Fast</th>
+                <th>Typical</th>
+                <th>Slow</th>
+            </tr>
+        </thead>
+        <tbody>
+            {% for time in distribution.charge_times %}
+            <tr>
+                <td>{{ time.amperage }}A</td>
+                <td>{{ time.hours.p5|duration }}</td>
+                <td>{{ time.hours.p50|duration }}</td>
+                <td>{{ time.hours.p95|duration }}</td>
+            </tr>
+            {% endfor %}
+        </tbody>
+    </table>
+    <p>Total cost: €{{ "%.2f"|format(distribution.total_cost.p5) }} / €{{ "%.2f"|format(distribution.total_cost.p50) }} / €{{ "%.2f"|format(distribution.total_cost.p95) }}</p>
+    <p>EV CO2 emissions: {{ "%.2f"|format(distribution.ev_emissions.p5) }} / {{ "%.2f"|format(distribution.ev_emissions.p50) }} / {{ "%.2f"|format(distribution.ev_emissions.p95) }} kg</p>
+</div>
+'''
 
-def calculate_charging_time(battery_size, voltage, amperage, start_percentage, end_percentage):
-    # Validate percentage bounds
-    if not (0 <= start_percentage <= 100) or not (0 <= end_percentage <= 100):
-        raise ValueError("Percentages must be between 0 and 100")
-    
-    # Validate charging direction
-    if end_percentage <= start_percentage:
-        raise ValueError("End percentage must be greater than start percentage")
-    
-    # Calculate power in kilowatts (voltage * amperage = watts, divide by 1000 for kW)
-    power_kw = (voltage * amperage) / 1000
-    
-    # Calculate energy needed (kWh)
-    energy_needed = battery_size * (end_percentage - start_percentage) / 100
-    
-    # Calculate hours needed (energy needed / power)
-    hours = energy_needed / power_kw
-    
-    # Calculate time for 10% charge
-    time_for_10_percent = (battery_size * 0.1) / power_kw
-    time_10_hours = int(time_for_10_percent)
-    time_10_minutes = int((time_for_10_percent - time_10_hours) * 60)
-    
-    # Convert total time to hours and minutes
-    hours_whole = int(hours)
-    minutes = int((hours - hours_whole) * 60)
+PROJECTION_TEMPLATE = '''
+<div class="cost-summary" id="projection">
+    <h2>Annual Projection</h2>
+    <div class="form-group slider-group">
+        <label for="projection_weekday_km">Weekday driving: <span class="percentage-value">40 km</span></label>
+        <input type="range" id="projection_weekday_km" min="0" max="200" step="5" value="40">
+    </div>
+    <div class="form-group slider-group">
+        <label for="projection_weekend_km">Weekend driving: <span class="percentage-value">20 km</span></label>
+        <input type="range" id="projection_weekend_km" min="0" max="200" step="5" value="20">
+    </div>
+    <p>Yearly charging cost: <span id="projection_cost">-</span></p>
+    <p>Yearly energy: <span id="projection_energy">-</span></p>
+    <p>Yearly EV CO2 emissions: <span id="projection_emissions">-</span></p>
+    <p>Average daily session: <span id="projection_session">-</span></p>
+    <small>Daily charging over the next 365 days, with higher consumption in winter</small>
+</div>
+'''
+
+PLANNER_TEMPLATE = '''
+<div class="cost-summary" id="planner">
+    <h2>Plan Backwards</h2>
+    <div class="form-group slider-group">
+        <label for="planner_ready_by">Ready by: <span class="percentage-value">07:00</span></label>
+        <input type="range" id="planner_ready_by" min="0" max="23.5" step="0.5" value="7">
+    </div>
+    <div class="form-group slider-group">
+        <label for="planner_budget">Budget: <span class="percentage-value">€10.00</span></label>
+        <input type="range" id="planner_budget" min="0" max="40" step="0.5" value="10">
+    </div>
+    <p>Lowest current that makes it: <span id="planner_current">-</span></p>
+    <p>Latest start at 16A: <span id="planner_start">-</span></p>
+    <p>Charge reached at 16A from plug-in: <span id="planner_reachable">-</span></p>
+    <small>Plugged in at {{ request.form.get('plug_in') or '18:00' }}, using the time-of-use prices if entered</small>
+</div>
+'''
+
+ENVIRONMENTAL_TEMPLATE = '''
+<div class="environmental-impact">
+    <h2>Environmental Impact</h2>
+    <p>Estimated range: {{ environmental.ev_range }} km</p>
+    <p>EV CO2 emissions: {{ environmental.ev_emissions }}</p>
+    <p>CO2 savings vs petrol: {{ environmental.petrol_savings }} kg</p>
+    <p>CO2 savings vs diesel: {{ environmental.diesel_savings }} kg</p>
     
-    return {
-        'amperage': amperage,
-        'power_kw': power_kw,
-        'duration': f"{hours_whole}h {minutes}m",
-        'time_per_10_percent': f"{time_10_hours}h {time_10_minutes}m"
-    }
+    <h3>Air Quality Impact</h3>
+    <p>NOx emissions avoided:</p>
+    <ul>
+        <li>vs petrol: {{ environmental.petrol_nox_saved }}g</li>
+        <li>vs diesel: {{ environmental.diesel_nox_saved }}g</li>
+    </ul>
+    <p>Particulate Matter (PM) emissions avoided:</p>
+    <ul>
+        <li>vs petrol: {{ environmental.petrol_pm_saved }}g</li>
+        <li>vs diesel: {{ environmental.diesel_pm_saved }}g</li>
+    </ul>
+    {% if carbon_region %}
+    <small>Based on the {{ carbon_region }} grid carbon intensity during this charging window ({{ "%.0f"|format(grid_intensity * 1000) }} g CO2/kWh) and Euro 6 vehicle emission standards</small>
+    {% else %}
+    <small>Based on Ireland's grid carbon intensity and Euro 6 vehicle emission standards (2023)</small>
+    {% endif %}
+</div>
+'''
+
+# Vehicle x charger comparison page, one page of rows at a time
+MATRIX_TEMPLATE = '''
+<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Charging Comparison - EV Charge Calculator</title>
+    <link rel="stylesheet" href="{{ static_url('styles.css') }}">
+</head>
+<body>
+    <div class="container" style="max-width: none;">
+        <h1>Charging Comparison</h1>
+        <p><a href="/">Back to the calculator</a></p>
+
+        <form method="get">
+            <div class="form-group">
+                <label for="q">Search:</label>
+                <input type="text" id="q" name="q" value="{{ args.get('q', '') }}" placeholder="Make or model">
+            </div>
+            <div class="form-group">
+                <label for="start_percentage">Start (%):</label>
+                <input type="number" id="start_percentage" name="start_percentage" min="0" max="100" value="{{ start_percentage }}">
+            </div>
+            <div class="form-group">
+                <label for="end_percentage">Target (%):</label>
+                <input type="number" id="end_percentage" name="end_percentage" min="0" max="100" value="{{ end_percentage }}">
+            </div>
+            <div class="form-group">
+                <label for="cost_per_kwh">Home cost (€/kWh before TVA):</label>
+                <input type="number" id="cost_per_kwh" name="cost_per_kwh" step="0.00001" value="{{ cost_per_kwh }}">
+            </div>
+            <div class="form-group">
+                <label for="dc_cost_per_kwh">DC cost (€/kWh before TVA):</label>
+                <input type="number" id="dc_cost_per_kwh" name="dc_cost_per_kwh" step="0.00001" value="{{ dc_cost_per_kwh }}">
+            </div>
+            <div class="form-group">
+                <label for="min_range_km">Minimum range added (km):</label>
+                <input type="number" id="min_range_km" name="min_range_km" min="0" value="{{ args.get('min_range_km', '') }}">
+            </div>
+            <div class="form-group">
+                <label><input type="checkbox" name="dc_only" value="1" {% if args.get('dc_only') %}checked{% endif %}> DC fast charging only</label>
+            </div>
+            <input type="hidden" name="sort" value="{{ sort }}">
+            <input type="hidden" name="order" value="{{ order }}">
+            <button type="submit">Compare</button>
+        </form>
+
+        {% if error %}
+        <div class="error">{{ error }}</div>
+        {% else %}
+        <div class="results" style="overflow-x: auto;">
+            <p>{{ result.total }} vehicles. Hours to charge from {{ start_percentage }}% to {{ end_percentage }}%, cost with TVA and CO2. <a href="{{ url_for('api_matrix', format='csv', **query) }}">Download CSV</a></p>
+            <table>
+                <thead>
+                    <tr>
+                        <th><a href="{{ sort_url('name') }}">Vehicle</a></th>
+                        <th><a href="{{ sort_url('energy_kwh') }}">Energy</a></th>
+                        <th><a href="{{ sort_url('range_km') }}">Range</a></th>
+                        {% for charger in chargers %}
+                        <th><a href="{{ sort_url('hours:' ~ charger.id) }}">{{ charger.label }}</a></th>
+                        {% endfor %}
+                    </tr>
+                </thead>
+                <tbody>
+                    {% for row in result.rows %}
+                    <tr>
+                        <td>{{ row.name }}</td>
+                        <td>{{ "%.1f"|format(row.energy_kwh) }} kWh</td>
+                        <td>{{ "%.0f"|format(row.range_km) }} km</td>
+                        {% for cell in row.cells %}
+                        {% if cell.hours is none %}
+                        <td>-</td>
+                        {% else %}
+                        <td>{{ cell.hours|duration }}<br><small>{{ "%.0f"|format(cell.power_kw) if cell.power_kw >= 10 else "%.1f"|format(cell.power_kw) }} kW, €{{ "%.2f"|format(cell.cost) }}, {{ "%.1f"|format(cell.emissions_kg) }} kg CO2</small></td>
+                        {% endif %}
+                        {% endfor %}
+                    </tr>
+                    {% endfor %}
+                </tbody>
+            </table>
+            <p>
+                {% if result.page > 1 %}<a href="{{ page_url(result.page - 1) }}">Previous</a>{% endif %}
+                Page {{ result.page }} of {{ result.pages }}
+                {% if result.page < result.pages %}<a href="{{ page_url(result.page + 1) }}">Next</a>{% endif %}
+            </p>
+        </div>
+        {% endif %}
+    </div>
+</body>
+</html>
+'''
+
+# Serve the templates from memory so Jinja compiles each one once and reuses
+# the compiled template object on every request
+app.jinja_loader = DictLoader({
+    'index.html': HTML_TEMPLATE,
+    'results_table.html': RESULTS_TABLE_TEMPLATE,
+    'cost_summary.html': COST_SUMMARY_TEMPLATE,
+    'time_of_use.html': TIME_OF_USE_TEMPLATE,
+    'distribution.html': DISTRIBUTION_TEMPLATE,
+    'projection.html': PROJECTION_TEMPLATE,
+    'planner.html': PLANNER_TEMPLATE,
+    'environmental.html': ENVIRONMENTAL_TEMPLATE,
+    'matrix.html': MATRIX_TEMPLATE,
+})
+app.jinja_env.filters['duration'] = format_duration
+app.jinja_env.globals['static_url'] = static_assets.url
+app.jinja_env.globals['charge_curves'] = list(CURVES.values())
+app.jinja_env.globals['charger_types'] = chargers.CHARGER_TYPES
+app.jinja_env.globals['carbon_regions'] = carbon.available_regions()
+for _template_name in app.jinja_loader.list_templates():
+    app.jinja_env.get_template(_template_name)
+
+# The GET page only depends on the defaults below, so it is rendered and
+# compressed once; it changes only when this file does
+_default_page = None
+# The default page is built from the template here and the charger, curve, vehicle,
+# carbon region and static files, so it changes when any of them does
+DEFAULT_PAGE_LAST_MODIFIED = assets.file_modified(
+    os.path.abspath(__file__), chargers.__file__, CURVES_PATH, MODELS_PATH, carbon.CARBON_DATA_DIR, STATIC_FOLDER
+)
+
+if app.config['CALC_CACHE_FILE']:
+    calculation_cache = SharedCache(app.config['CALC_CACHE_FILE'], app.config['CALC_CACHE_SIZE'],
+                                    app.config['CALC_CACHE_TTL'] or None, app.config['CALC_CACHE_SLOT_BYTES'],
+                                    app.config['CALC_CACHE_SNAPSHOT'])
+else:
+    calculation_cache = LRUCache(app.config['CALC_CACHE_SIZE'], app.config['CALC_CACHE_TTL'] or None)
+
+# Annual projections being explored, by token, so what-if changes only
+# recompute the totals they affect; they are mutable, so each worker keeps its own
+projection_sessions = LRUCache(app.config['CALC_CACHE_SIZE'], app.config['CALC_CACHE_TTL'] or None)
+
+job_queue = jobs.JobQueue(app.config['JOB_DIR'], app.config['JOB_WORKERS'], app.config['JOB_QUEUE_LIMIT'])
+
+# Request counters and per-stage latency for home(), exported at /metrics
+HOME_REQUESTS = {
+    method: metrics.REGISTRY.counter('ev_home_requests_total', "Requests to the calculator page",
+                                     method=method)
+    for method in ('GET', 'HEAD', 'POST')
+}
+HOME_ERRORS = metrics.REGISTRY.counter('ev_home_errors_total',
+                                       "Calculator form submissions rejected with a ValueError")
+HOME_STAGES = {
+    stage: metrics.REGISTRY.histogram('ev_home_stage_seconds', "Time spent in each stage of home()",
+                                      stage=stage)
+    for stage in ('parse', 'calculate', 'render')
+}
+
+
+def timed_calculation(function):
+    """Observe each call of a calculator function in ev_calculation_seconds."""
+    histogram = metrics.REGISTRY.histogram('ev_calculation_seconds', "Time spent in calculator functions",
+                                           function=function.__name__)
+    return metrics.REGISTRY.timed(histogram, function)
+
+
+calculate_costs = timed_calculation(calculate_costs)
+calculate_environmental_impact = timed_calculation(calculate_environmental_impact)
+calculate_charging_time = timed_calculation(calculate_charging_time)
+calculate_summary = timed_calculation(calculate_summary)
+time_of_use_summary = timed_calculation(time_of_use_summary)
+
 
 @app.route('/', methods=['GET', 'POST'])
 def home():
+    HOME_REQUESTS[request.method].inc()
+    stages = metrics.REGISTRY.stage_timer(HOME_STAGES)
     charge_times = None
     if request.method == 'POST':
         try:
             battery_size = float(request.form['battery_size'])
-            voltage = float(request.form['voltage'])  # Hidden field, always 230V
             start_percentage = float(request.form['start_percentage'])
             end_percentage = float(request.form['end_percentage'])
             
             # Calculate for different amperage values
-            amperages = [6, 8, 10, 16]
+            amperages = DEFAULT_AMPERAGES
             cost_per_kwh = float(request.form['cost_per_kwh'])
             
+            # Use the selected catalog vehicle's efficiency, charger limit and curve
+            vehicle = None
+            efficiency = EV_EFFICIENCY
+            max_power_kw = None
+            curve_name = request.form.get('charge_curve')
+            if request.form.get('vehicle_id'):
+                vehicle = get_vehicle(request.form['vehicle_id'])
+                efficiency = vehicle.efficiency_kwh_per_km
+                max_power_kw = vehicle.onboard_charger_kw
+                curve_name = curve_name or vehicle.charge_curve
+            curve = get_curve(curve_name)
+            
+            # The charger type sets phases, power factor, losses and which
+            # vehicle limit applies; older clients post a single-phase 'voltage'
+            charger = requested_charger(request.form)
+            charger_efficiency = None
+            if charger is not None:
+                charger_options = chargers.calculator_options(charger, max_power_kw, vehicle and vehicle.dc_max_kw)
+                # The other models take a voltage and a cap with the same battery power
+                voltage, max_power_kw = chargers.effective_supply(charger, max_power_kw,
+                                                                  vehicle and vehicle.dc_max_kw)
+                amperages = chargers.charger_currents(charger, amperages)
+                charger_efficiency = charger['efficiency']
+            else:
+                voltage = float(request.form['voltage'])
+                charger_options = {'voltage': voltage, 'max_power_kw': max_power_kw}
+            stages.mark('parse')
+            
             # Calculate costs
             energy_needed, total_cost, cost_for_full = calculate_costs(
-                battery_size, start_percentage, end_percentage, cost_per_kwh
+                battery_size, start_percentage, end_percentage, cost_per_kwh, charger_efficiency or 1.0
             )
             
-            # Calculate environmental impact
-            environmental_impact = calculate_environmental_impact(energy_needed)
+            # Calculate environmental impact, using the grid intensity during
+            # today's charging window if a region was chosen
+            carbon_inputs = None
+            if request.form.get('carbon_region'):
+                midnight = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+                plug_in = parse_clock(request.form.get('plug_in') or '18:00')
+                carbon_inputs = (request.form['carbon_region'], midnight.timestamp() + plug_in * 3600)
+            grid_intensity = window_intensity(carbon_inputs, battery_size, voltage, amperages,
+                                              start_percentage, end_percentage, curve, max_power_kw)
+            environmental_impact = calculate_environmental_impact(energy_needed, efficiency, grid_intensity,
+                                                                  charger_efficiency or 1.0)
             
             # Calculate charging times for different amperages
             charge_times = [
                 calculate_charging_time(
-                    battery_size, voltage, amperage,
-                    start_percentage, end_percentage
+                    battery_size, amperage=amperage, start_percentage=start_percentage,
+                    end_percentage=end_percentage, curve=curve, **charger_options
                 )
                 for amperage in amperages
             ]
             
-            return render_template_string(HTML_TEMPLATE,
+            # Compare against a time-of-use tariff if one was entered
+            time_of_use = None
+            tariff = parse_time_of_use_inputs(request.form)
+            if tariff:
+                time_of_use = time_of_use_summary(
+                    *tariff, battery_size, voltage, amperages, start_percentage, end_percentage,
+                    curve=curve, max_power_kw=max_power_kw, charger_efficiency=charger_efficiency
+                )
+            
+            # Ranges under real-world variation if requested
+            ranges = None
+            if request.form.get('distribution'):
+                distribution_inputs = (battery_size, voltage, amperages, start_percentage, end_percentage,
+                                       cost_per_kwh, curve, efficiency, max_power_kw, charger_efficiency,
+                                       grid_intensity)
+                ranges, _ = calculation_cache.get_or_compute(
+                    ('form distribution', distribution_inputs),
+                    lambda: distribution.calculate_distribution(
+                        *distribution_inputs, samples=FORM_DISTRIBUTION_SAMPLES, percentiles=FORM_PERCENTILES
+                    )
+                )
+            stages.mark('calculate')
+            
+            # Cost and emissions are both for the energy drawn from the grid
+            grid_energy = energy_needed / (charger_efficiency or 1.0)
+            record_calculation(request.form, battery_size, start_percentage, end_percentage,
+                               energy_needed, grid_energy * cost_per_kwh * TVA_MULTIPLIER,
+                               grid_energy * grid_intensity)
+            page = render_template('index.html',
                                    charge_times=charge_times,
                                    cost_per_kwh=cost_per_kwh,
                                    energy_needed=energy_needed,
                                    total_cost=total_cost,
                                    cost_for_full=cost_for_full,
-                                   environmental=environmental_impact)
+                                   environmental=environmental_impact,
+                                   time_of_use=time_of_use,
+                                   distribution=ranges,
+                                   vehicle=vehicle,
+                                   charger=charger,
+                                   carbon_region=carbon_inputs and carbon_inputs[0],
+                                   grid_intensity=grid_intensity)
+            stages.mark('render')
+            return page
         except ValueError:
+            HOME_ERRORS.inc()
             charge_times = [{'amperage': 0, 'power_kw': 0, 'duration': "Error: Please enter valid numbers"}]
+            stages = metrics.REGISTRY.stage_timer(HOME_STAGES)  # time only the error page render
     
+    page = render_default_page(charge_times)
+    stages.mark('render')
+    return page
+
+
+def render_default_page(charge_times=None):
+    """Render the form with default cost values.
+
+    The plain GET page is identical for every visitor, so it is cached and
+    pre-compressed after the first render and served with an ETag. Error
+    results are rendered fresh each time.
+    """
+    global _default_page
+    if charge_times is None and _default_page is not None:
+        return _default_page.response(request)
+
     # Provide default values for cost variables when form hasn't been submitted
-    return render_template_string(HTML_TEMPLATE,
-                               charge_times=charge_times,
-                               cost_per_kwh=0.16428,
-                               energy_needed=0,
-                               total_cost="€0.00",
-                               cost_for_full="€0.00",
-                               environmental={'ev_emissions': '0 g',
-                                            'ev_range': '0',
-                                            'petrol_savings': '0.00',
-                                            'diesel_savings': '0.00'})
+    page = render_template('index.html',
+                           charge_times=charge_times,
+                           cost_per_kwh=0.16428,
+                           energy_needed=0,
+                           total_cost="€0.00",
+                           cost_for_full="€0.00",
+                           environmental={'ev_emissions': '0 g',
+                                          'ev_range': '0',
+                                          'petrol_savings': '0.00',
+                                          'diesel_savings': '0.00'})
+    if charge_times is None and request.method == 'GET':
+        _default_page = assets.CompressedAsset(page.encode('utf-8'), 'text/html; charset=utf-8',
+                                               DEFAULT_PAGE_LAST_MODIFIED)
+        return _default_page.response(request)
+    return page
+
+
+def record_calculation(data, battery_size, start_percentage, end_percentage, energy_kwh, cost, co2_kg):
+    """Queue a calculated session for the history store, if one is configured."""
+    if history.STORE is not None:
+        history.STORE.record('calculated', energy_kwh, cost, co2_kg,
+                             vehicle_id=data.get('vehicle_id'), site=data.get('site'),
+                             battery_size=battery_size, start_percentage=start_percentage,
+                             end_percentage=end_percentage)
+
+
+def parse_time_of_use_inputs(data):
+    """Normalize optional time-of-use fields into (prices, plug_in, ready_by).
+
+    Prices may be a list or a comma-separated string. Returns None when no
+    prices were given.
+    """
+    prices = data.get('tou_prices')
+    if isinstance(prices, str):
+        prices = [price for price in prices.replace(';', ',').split(',') if price.strip()]
+    if not prices:
+        return None
+    return (
+        tuple(float(price) for price in prices),
+        format_clock(parse_clock(data.get('plug_in') or '18:00')),
+        format_clock(parse_clock(data.get('ready_by') or '07:00'))
+    )
+
+
+def parse_carbon_inputs(data):
+    """Normalize optional (carbon_region, charge_start) fields.
+
+    Returns None when no region was given; charge_start is an ISO 8601 time
+    (UTC if no offset) and is converted to epoch seconds.
+    """
+    region = data.get('carbon_region')
+    if not region:
+        return None
+    if not data.get('charge_start'):
+        raise KeyError('charge_start')
+    return region, carbon.to_epoch(data['charge_start'])
+
+
+def window_intensity(carbon_inputs, battery_size, voltage, amperages, start_percentage,
+                     end_percentage, curve=None, max_power_kw=None):
+    """Grid intensity averaged over the session at the fastest amperage."""
+    if not carbon_inputs:
+        return carbon.GRID_CARBON_INTENSITY
+    region, charge_start = carbon_inputs
+    timing = charging_time_values(battery_size, voltage, max(amperages), start_percentage,
+                                  end_percentage, curve, max_power_kw)
+    return carbon.session_intensity(region, charge_start, timing['hours'])
+
+
+def calculate_api_result(inputs, tariff, carbon_inputs=None):
+    (battery_size, voltage, amperages, start_percentage, end_percentage, _, curve, _, max_power_kw,
+     charger_efficiency) = inputs
+    intensity = window_intensity(carbon_inputs, battery_size, voltage, amperages,
+                                 start_percentage, end_percentage, curve, max_power_kw)
+    result = calculate_summary(*inputs, carbon_intensity=intensity)
+    if tariff:
+        result['time_of_use'] = time_of_use_summary(
+            *tariff, battery_size, voltage, amperages, start_percentage, end_percentage,
+            curve=curve, max_power_kw=max_power_kw, charger_efficiency=charger_efficiency
+        )
+    return result
+
+
+def requested_charger(data):
+    """The charger type a form or API request asks for.
+
+    Requests with neither field get chargers.DEFAULT_CHARGER. Returns None
+    for older clients that send only a 'voltage', which is a single-phase
+    supply with no losses.
+    """
+    if data.get('charger') or data.get('voltage') in (None, ''):
+        return chargers.get_charger(data.get('charger'))
+    return None
+
+
+def parse_calculation_inputs(data):
+    """Normalize API inputs into the tuple used as the cache key.
+
+    Numbers may arrive as JSON numbers or strings, so everything is converted
+    to float; amperages may be a list or a comma-separated string. The charge
+    curve name is resolved to the loaded curve. With a 'vehicle_id', the
+    catalog supplies the battery size (unless given), efficiency, onboard
+    charger and DC limits and default charge curve. The charger type comes
+    from requested_charger(): its voltage and power cap are
+    chargers.effective_supply() for it, and a DC charger is compared at its
+    full current only. A 'voltage' alone is a single-phase supply with no
+    losses. The last item is the charger's
+    efficiency, or None without a charger type, so costs and the
+    distribution know which losses the supply already includes.
+    """
+    amperages = data.get('amperages', DEFAULT_AMPERAGES)
+    if isinstance(amperages, str):
+        amperages = amperages.split(',')
+
+    battery_size = data.get('battery_size')
+    curve_name = data.get('charge_curve')
+    efficiency = EV_EFFICIENCY
+    max_power_kw = None
+    dc_max_kw = None
+    if data.get('vehicle_id'):
+        vehicle = get_vehicle(data['vehicle_id'])
+        if battery_size in (None, ''):
+            battery_size = vehicle.usable_kwh
+        curve_name = curve_name or vehicle.charge_curve
+        efficiency = vehicle.efficiency_kwh_per_km
+        max_power_kw = vehicle.onboard_charger_kw
+        dc_max_kw = vehicle.dc_max_kw
+    if battery_size in (None, ''):
+        raise KeyError('battery_size')
+
+    amperages = tuple(float(amperage) for amperage in amperages)
+    charger_efficiency = None
+    charger = requested_charger(data)
+    if charger is not None:
+        voltage, max_power_kw = chargers.effective_supply(charger, max_power_kw, dc_max_kw)
+        amperages = chargers.charger_currents(charger, amperages)
+        charger_efficiency = charger['efficiency']
+    else:
+        voltage = float(data['voltage'])
+
+    return (
+        float(battery_size),
+        voltage,
+        amperages,
+        float(data['start_percentage']),
+        float(data['end_percentage']),
+        float(data['cost_per_kwh']),
+        get_curve(curve_name),
+        efficiency,
+        max_power_kw,
+        charger_efficiency
+    )
+
+
+@app.route('/api/v1/calculate', methods=['GET', 'POST'])
+def api_calculate():
+    data = request.get_json(silent=True) if request.is_json else request.values
+    try:
+        inputs = parse_calculation_inputs(data or {})
+        tariff = parse_time_of_use_inputs(data or {})
+        carbon_inputs = parse_carbon_inputs(data or {})
+    except KeyError as exc:
+        return jsonify(error=f"Missing field: {exc.args[0]}"), 400
+    except TypeError:
+        return jsonify(error="Please enter valid numbers"), 400
+    except ValueError as exc:
+        return jsonify(error=str(exc)), 400
+
+    try:
+        result, hit = calculation_cache.get_or_compute(
+            (inputs, tariff, carbon_inputs), lambda: calculate_api_result(inputs, tariff, carbon_inputs)
+        )
+    except (ValueError, ZeroDivisionError) as exc:
+        return jsonify(error=str(exc)), 400
+
+    record_calculation(data or {}, inputs[0], inputs[3], inputs[4], result['energy_needed'],
+                       result['total_cost'], result['environmental']['ev_emissions'])
+
+    response = jsonify(result)
+    response.headers['X-Cache'] = 'HIT' if hit else 'MISS'
+    return response
+
+
+def parse_distribution_inputs(data):
+    """Normalize the sample count, seed, percentiles and uncertainty overrides."""
+    percentiles = data.get('percentiles', distribution.DEFAULT_PERCENTILES)
+    if isinstance(percentiles, str):
+        percentiles = percentiles.split(',')
+    uncertainty = tuple(
+        (name, float(data[name])) for name in distribution.DEFAULT_UNCERTAINTY if data.get(name) not in (None, '')
+    )
+    samples = int(data.get('samples', distribution.DEFAULT_SAMPLES))
+    # Checked here as well, so a request that would run as a job is still rejected with a 400
+    if not 1 <= samples <= distribution.MAX_SAMPLES:
+        raise ValueError(f"Samples must be between 1 and {distribution.MAX_SAMPLES}")
+    return (
+        samples,
+        int(data.get('seed', distribution.DEFAULT_SEED)),
+        tuple(float(p) for p in percentiles),
+        uncertainty
+    )
+
+
+def wants_job(data, work, threshold):
+    """Whether a request should run as a background job rather than inline."""
+    return work >= threshold or str(data.get('async', '')).lower() in ('1', 'true', 'yes', 'on')
+
+
+def submit_job(kind, function, *args):
+    """Queue a heavy request and answer 202 with where to poll, or 429 when the queue is full."""
+    try:
+        job_id = job_queue.submit(kind, function, *args)
+    except jobs.QueueFull as exc:
+        return jsonify(error=str(exc)), 429, {'Retry-After': str(exc.retry_after)}
+    location = url_for('api_job', job_id=job_id)
+    return (jsonify(job_id=job_id, status='queued', location=location), 202,
+            {'Location': location, 'Retry-After': str(job_queue.retry_after())})
+
+
+@app.route('/api/v1/distribution', methods=['GET', 'POST'])
+def api_distribution():
+    """Percentile ranges of the calculator outputs under input uncertainty.
+
+    Accepts the /api/v1/calculate fields plus 'samples', 'seed',
+    'percentiles' and overrides for any of distribution.DEFAULT_UNCERTAINTY.
+    The same inputs and seed always give the same result. Runs of
+    JOB_DISTRIBUTION_SAMPLES or more, or with 'async' set, are answered with
+    a job to poll at /api/v1/jobs/<job_id>.
+    """
+    data = (request.get_json(silent=True) if request.is_json else request.values) or {}
+    try:
+        inputs = parse_calculation_inputs(data)
+        carbon_inputs = parse_carbon_inputs(data)
+        samples, seed, percentiles, uncertainty = parse_distribution_inputs(data)
+    except KeyError as exc:
+        return jsonify(error=f"Missing field: {exc.args[0]}"), 400
+    except TypeError:
+        return jsonify(error="Please enter valid numbers"), 400
+    except ValueError as exc:
+        return jsonify(error=str(exc)), 400
+
+    def compute():
+        battery_size, voltage, amperages, start_percentage, end_percentage, _, curve, _, max_power_kw, _ = inputs
+        intensity = window_intensity(carbon_inputs, battery_size, voltage, amperages,
+                                     start_percentage, end_percentage, curve, max_power_kw)
+        return distribution.calculate_distribution(
+            *inputs, carbon_intensity=intensity, samples=samples, seed=seed,
+            uncertainty=dict(uncertainty), percentiles=percentiles
+        )
+
+    key = ('distribution', inputs, carbon_inputs, samples, seed, percentiles, uncertainty)
+    if wants_job(data, samples, app.config['JOB_DISTRIBUTION_SAMPLES']):
+        return submit_job('distribution', lambda: calculation_cache.get_or_compute(key, compute)[0])
+
+    try:
+        result, hit = calculation_cache.get_or_compute(key, compute)
+    except (ValueError, ZeroDivisionError) as exc:
+        return jsonify(error=str(exc)), 400
+
+    response = jsonify(result)
+    response.headers['X-Cache'] = 'HIT' if hit else 'MISS'
+    return response
+
+
+def parse_projection_inputs(data):
+    """Pick the annual projection inputs present in a request.
+
+    'weekday_km' may be one number, seven numbers or a comma-separated
+    string; 'tariff' may be a price or a list of [effective date, price]
+    pairs. A 'vehicle_id' supplies the efficiency unless one is given.
+    """
+    inputs = {name: data[name] for name in projection.INPUTS if data.get(name) not in (None, '')}
+    if isinstance(inputs.get('weekday_km'), str):
+        inputs['weekday_km'] = [float(km) for km in inputs['weekday_km'].split(',')]
+        if len(inputs['weekday_km']) == 1:
+            inputs['weekday_km'] = inputs['weekday_km'][0]
+    if isinstance(inputs.get('tariff'), str):
+        inputs['tariff'] = float(inputs['tariff'])
+    if data.get('vehicle_id') and 'efficiency' not in inputs:
+        inputs['efficiency'] = get_vehicle(data['vehicle_id']).efficiency_kwh_per_km
+    return inputs
+
+
+@app.route('/api/v1/projection', methods=['POST'])
+def api_projection():
+    """Project a year of daily charging, updating an earlier projection if possible.
+
+    Send the projection inputs (see parse_projection_inputs) and, after the
+    first call, the returned 'token' with only the inputs that changed. If
+    the token has expired or belongs to another worker, the projection is
+    rebuilt from the inputs in the request.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        inputs = parse_projection_inputs(data)
+        token = data.get('token') or uuid.uuid4().hex
+        session, existing = projection_sessions.get_or_compute(
+            token, lambda: projection.AnnualProjection(**inputs)
+        )
+        with session.lock:
+            if existing:
+                session.update(**inputs)
+            summary = session.summary()
+            recomputed = session.recomputed
+    except (TypeError, ValueError) as exc:
+        return jsonify(error=str(exc)), 400
+
+    return jsonify(dict(summary, token=token, recomputed=recomputed))
+
+
+def parse_solver_inputs(data):
+    """Normalize the deadline, budget, amperage and optional tariff for the inverse solver.
+
+    On a charger type, the amperage is clamped to its rating, DC
+    chargers always run at their full current, and the minimum current
+    search stops at the charger's rating.
+
+    Returns:
+        dict: Keyword arguments shared by the inverse functions, plus
+        'amperage' for the latest start and reachable charge queries and
+        'max_current' for the minimum current
+    """
+    plug_in, deadline = overnight_window(data.get('plug_in') or '18:00', data.get('ready_by') or '07:00')
+    budget = float(data['budget']) if data.get('budget') not in (None, '') else None
+    if budget is not None and budget < 0:
+        raise ValueError("Budget must not be negative")
+    tariff = parse_time_of_use_inputs(data)
+    amperage = float(data.get('amperage') or scheduler.MAX_CURRENT)
+    max_current = scheduler.MAX_CURRENT
+    charger = requested_charger(data)
+    if charger is not None:
+        amperage = chargers.charger_currents(charger, (amperage,))[0]
+        max_current = charger['max_current']
+    return {
+        'plug_in_hour': plug_in,
+        'deadline_hour': deadline,
+        'budget': budget,
+        'tariff': TimeOfUseTariff.from_daily_profile(tariff[0]) if tariff else None,
+        'amperage': amperage,
+        'max_current': max_current,
+    }
+
+
+@app.route('/api/v1/solve', methods=['GET', 'POST'])
+def api_solve():
+    """Answer the reverse questions for a deadline ('ready_by') and optional 'budget'.
+
+    Accepts the /api/v1/calculate fields plus 'plug_in', 'ready_by',
+    'budget' (€ including TVA), 'amperage' (for the latest start and
+    reachable charge, 16 A by default, or a DC charger's full current) and
+    optional 'tou_prices'. Returns
+    the lowest current, the latest start and the charge reachable from
+    plug-in; each says which constraint limits it.
+    """
+    data = (request.get_json(silent=True) if request.is_json else request.values) or {}
+    try:
+        (battery_size, voltage, _, start_percentage, end_percentage, cost_per_kwh, curve, _, max_power_kw,
+         charger_efficiency) = parse_calculation_inputs(data)
+        inputs = parse_solver_inputs(data)
+    except KeyError as exc:
+        return jsonify(error=f"Missing field: {exc.args[0]}"), 400
+    except TypeError:
+        return jsonify(error="Please enter valid numbers"), 400
+    except ValueError as exc:
+        return jsonify(error=str(exc)), 400
+
+    amperage = inputs.pop('amperage')
+    max_current = inputs.pop('max_current')
+    options = dict(inputs, voltage=voltage, curve=curve, max_power_kw=max_power_kw, cost_per_kwh=cost_per_kwh,
+                   charger_efficiency=charger_efficiency or 1.0)
+    try:
+        current = inverse.minimum_current(battery_size, start_percentage, end_percentage,
+                                          max_current=max_current, **options)
+        start = inverse.latest_start(battery_size, start_percentage, end_percentage, amperage, **options)
+        reachable = inverse.reachable_percentage(battery_size, start_percentage, amperage, **options)
+    except (ValueError, ZeroDivisionError) as exc:
+        return jsonify(error=str(exc)), 400
+
+    for result in (current, start):
+        if result['feasible']:
+            result['start'] = format_clock(result['start_hour'])
+    if start['feasible']:
+        start['end'] = format_clock(start['end_hour'])
+    return jsonify(minimum_current=current, latest_start=start, reachable=reachable,
+                   plug_in=format_clock(inputs['plug_in_hour']), ready_by=format_clock(inputs['deadline_hour']))
+
+
+@app.route('/api/v1/cache')
+def api_cache_stats():
+    return jsonify(calculation_cache.stats())
+
+
+@app.route('/api/v1/bulk', methods=['POST'])
+def api_bulk():
+    """Stream per-row results for an uploaded CSV or NDJSON fleet manifest.
+
+    The manifest can be sent as the raw request body or as a multipart
+    'file' field. The input format follows the Content-Type (or ?input=),
+    and the output format follows ?format= (ndjson by default).
+    """
+    upload = request.files.get('file')
+    if upload is not None:
+        stream = upload.stream
+        content_type = upload.mimetype
+    else:
+        stream = request.stream
+        content_type = request.mimetype
+
+    input_format = request.args.get('input') or ('csv' if 'csv' in content_type else 'ndjson')
+    output_format = request.args.get('format', 'ndjson')
+    if input_format not in bulk.READERS or output_format not in bulk.WRITERS:
+        return jsonify(error="Formats must be csv or ndjson"), 400
+
+    # Invalid UTF-8 becomes a per-row error instead of aborting the stream
+    lines = io.TextIOWrapper(stream, encoding='utf-8', errors='replace', newline='')
+    mimetype = 'text/csv' if output_format == 'csv' else 'application/x-ndjson'
+    return Response(stream_with_context(bulk.stream_results(lines, input_format, output_format)),
+                    mimetype=mimetype)
+
+
+@app.route('/api/v1/schedule', methods=['POST'])
+def api_schedule():
+    """Plan charging current for every vehicle at a site with a shared limit.
+
+    Expects JSON with 'site_limit_amps' and a 'vehicles' list of objects with
+    'id', 'battery_kwh', 'start_pct', 'target_pct', 'departure_slot' and an
+    optional 'arrival_slot'. 'slots', 'slot_minutes' and 'voltage' are
+    optional; set 'include_schedule' to get the per-slot current of each
+    vehicle. Sites of JOB_SCHEDULE_CELLS or more vehicle-slots, or requests
+    with 'async' set, are answered with a job to poll at /api/v1/jobs/<job_id>.
+    """
+    data = request.get_json(silent=True) or {}
+    vehicles = data.get('vehicles') or []
+    try:
+        arguments = dict(
+            battery_size=[float(v['battery_kwh']) for v in vehicles],
+            start_percentage=[float(v['start_pct']) for v in vehicles],
+            target_percentage=[float(v['target_pct']) for v in vehicles],
+            departure_slot=[int(v['departure_slot']) for v in vehicles],
+            site_limit_amps=float(data['site_limit_amps']),
+            arrival_slot=[int(v.get('arrival_slot', 0)) for v in vehicles],
+            slots=int(data.get('slots', 96)),
+            slot_minutes=float(data.get('slot_minutes', scheduler.DEFAULT_SLOT_MINUTES)),
+            voltage=float(data.get('voltage', scheduler.DEFAULT_VOLTAGE))
+        )
+        scheduler.validate_site(arguments['site_limit_amps'], arguments['slot_minutes'], arguments['voltage'])
+    except KeyError as exc:
+        return jsonify(error=f"Missing field: {exc.args[0]}"), 400
+    except (TypeError, ValueError) as exc:
+        return jsonify(error=str(exc)), 400
+
+    ids = [v.get('id', index) for index, v in enumerate(vehicles)]
+    include_schedule = bool(data.get('include_schedule'))
+    if wants_job(data, len(vehicles) * arguments['slots'], app.config['JOB_SCHEDULE_CELLS']):
+        return submit_job('schedule', site_schedule, arguments, ids, include_schedule)
+    try:
+        return jsonify(site_schedule(arguments, ids, include_schedule))
+    except (TypeError, ValueError) as exc:
+        return jsonify(error=str(exc)), 400
+
+
+def site_schedule(arguments, ids, include_schedule):
+    """Run scheduler.schedule_site and convert the plan to plain JSON values."""
+    plan = scheduler.schedule_site(**arguments)
+    results = []
+    for index, vehicle_id in enumerate(ids):
+        result = {
+            'id': vehicle_id,
+            'energy_delivered': float(plan['energy_delivered'][index]),
+            'final_percentage': float(plan['final_percentage'][index]),
+            'met': bool(plan['met'][index])
+        }
+        if include_schedule:
+            result['current'] = plan['current'][index].tolist()
+        results.append(result)
+
+    return {
+        'vehicles': results,
+        'site_current': plan['site_current'].tolist(),
+        'missed': [ids[index] for index in plan['missed']],
+        'unreachable': [ids[index] for index in plan['unreachable']]
+    }
+
+
+@app.route('/api/v1/jobs/<job_id>')
+def api_job(job_id):
+    """Status of a background job, with its result or error once finished.
+
+    Answers 202 with a Retry-After while the job is queued or running, and
+    200 once it is done or has failed.
+    """
+    record = job_queue.get(job_id)
+    if record is None:
+        return jsonify(error=f"Unknown or expired job: {job_id}"), 404
+    if record['status'] in ('queued', 'running'):
+        return jsonify(record), 202, {'Retry-After': str(job_queue.retry_after())}
+    return jsonify(record)
+
+
+@app.route('/api/v1/jobs')
+def api_job_stats():
+    """Queue depth across workers and this worker's capacity, for capacity planning."""
+    return jsonify(job_queue.stats())
+
+
+@app.route('/static/<path:filename>', endpoint='static')
+def static_file(filename):
+    response = static_assets.response(request, filename)
+    if response is None:
+        return jsonify(error=f"Not found: {filename}"), 404
+    return response
+
+
+@app.after_request
+def compress(response):
+    return assets.compress_response(request, response)
+
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus text-format metrics summed over all worker processes."""
+    if not metrics.REGISTRY.enabled:
+        return jsonify(error="Metrics are disabled"), 404
+    # The calculation cache keeps its own counters, shared by all workers when file-backed
+    stats = calculation_cache.stats()
+    cache_samples = [
+        ('ev_calc_cache_hits_total', 'counter', "Calculation cache hits", stats['hits']),
+        ('ev_calc_cache_misses_total', 'counter', "Calculation cache misses", stats['misses']),
+        ('ev_calc_cache_evictions_total', 'counter', "Calculation cache evictions", stats['evictions']),
+        ('ev_calc_cache_entries', 'gauge', "Entries in the calculation cache", stats['size']),
+    ]
+    # Queue depth is read from the job files, so it covers every worker
+    job_counts = job_queue.stats()['jobs']
+    job_samples = [
+        ('ev_jobs_queued', 'gauge', "Background jobs waiting to run", job_counts['queued']),
+        ('ev_jobs_running', 'gauge', "Background jobs running", job_counts['running']),
+    ]
+    return Response(metrics.REGISTRY.render() + metrics.render_samples(cache_samples + job_samples),
+                    mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/api/v1/solar', methods=['POST'])
+def api_solar():
+    """Plan home charging around rooftop PV to minimize grid import.
+
+    Expects JSON with 'pv_kw' (one value per slot), 'base_load_kw' (one
+    value per slot or a constant), 'start_percentage', 'end_percentage',
+    'deadline_slot' and 'battery_size' or 'vehicle_id'. 'arrival_slot',
+    'slot_minutes' (5), 'voltage' and 'cost_per_kwh' are optional.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        battery_size = data.get('battery_size')
+        max_power_kw = None
+        if data.get('vehicle_id'):
+            vehicle = get_vehicle(data['vehicle_id'])
+            battery_size = battery_size or vehicle.usable_kwh
+            max_power_kw = vehicle.onboard_charger_kw
+        if battery_size in (None, ''):
+            raise KeyError('battery_size')
+        plan = solar.plan_solar_charging(
+            data['pv_kw'],
+            data.get('base_load_kw', 0),
+            float(battery_size),
+            float(data['start_percentage']),
+            float(data['end_percentage']),
+            int(data['deadline_slot']),
+            cost_per_kwh=float(data.get('cost_per_kwh', 0)),
+            arrival_slot=int(data.get('arrival_slot', 0)),
+            slot_minutes=float(data.get('slot_minutes', solar.DEFAULT_SLOT_MINUTES)),
+            voltage=float(data.get('voltage', solar.DEFAULT_VOLTAGE)),
+            max_power_kw=max_power_kw
+        )
+    except KeyError as exc:
+        return jsonify(error=f"Missing field: {exc.args[0]}"), 400
+    except (TypeError, ValueError) as exc:
+        return jsonify(error=str(exc)), 400
+
+    return jsonify({
+        name: value.tolist() if hasattr(value, 'tolist') else value
+        for name, value in plan.items()
+    })
+
+
+def session_store_or_404():
+    if history.STORE is None:
+        return None, (jsonify(error="Session history is disabled; set SESSION_DB"), 404)
+    return history.STORE, None
+
+
+@app.route('/api/v1/sessions', methods=['POST'])
+def api_record_session():
+    """Record an actual charging session.
+
+    Expects JSON with 'energy_kwh' and either 'cost' (including TVA) or
+    'cost_per_kwh'. 'co2_kg' defaults to the energy at the average grid
+    intensity; 'started_at' (ISO 8601), 'vehicle_id' and 'site' are optional.
+    """
+    store, error = session_store_or_404()
+    if error:
+        return error
+    data = request.get_json(silent=True) or {}
+    try:
+        energy_kwh = float(data['energy_kwh'])
+        if data.get('cost') is not None:
+            cost = float(data['cost'])
+        else:
+            cost = energy_kwh * float(data['cost_per_kwh']) * TVA_MULTIPLIER
+        co2_kg = float(data.get('co2_kg', energy_kwh * carbon.GRID_CARBON_INTENSITY))
+        started_at = carbon.to_epoch(data['started_at']) if data.get('started_at') else None
+        queued = store.record('actual', energy_kwh, cost, co2_kg, started_at=started_at,
+                              vehicle_id=data.get('vehicle_id'), site=data.get('site'))
+    except KeyError as exc:
+        return jsonify(error=f"Missing field: {exc.args[0]}"), 400
+    except (TypeError, ValueError) as exc:
+        return jsonify(error=str(exc)), 400
+    if not queued:
+        return jsonify(error="Session history is busy, try again"), 503
+    return jsonify(queued=True), 202
+
+
+@app.route('/api/v1/sessions')
+def api_sessions():
+    """Recent sessions, filtered by 'vehicle_id', 'site', 'since' and 'until' (ISO 8601)."""
+    store, error = session_store_or_404()
+    if error:
+        return error
+    args = request.args
+    try:
+        sessions = store.sessions(
+            vehicle_id=args.get('vehicle_id'), site=args.get('site'),
+            since=carbon.to_epoch(args['since']) if args.get('since') else None,
+            until=carbon.to_epoch(args['until']) if args.get('until') else None,
+            limit=max(1, min(int(args.get('limit', 100)), 1000))
+        )
+    except ValueError as exc:
+        return jsonify(error=str(exc)), 400
+    return jsonify(sessions=sessions)
+
+
+@app.route('/api/v1/sessions/rollups')
+def api_session_rollups():
+    """Daily or monthly totals ('period'), filtered like /api/v1/sessions and by 'kind'."""
+    store, error = session_store_or_404()
+    if error:
+        return error
+    args = request.args
+    try:
+        rollups = store.rollups(args.get('period', 'day'), vehicle_id=args.get('vehicle_id'),
+                                site=args.get('site'), since=args.get('since'),
+                                until=args.get('until'), kind=args.get('kind'))
+    except ValueError as exc:
+        return jsonify(error=str(exc)), 400
+    return jsonify(rollups=rollups, **store.stats())
+
+
+@app.route('/api/v1/vehicles')
+def api_vehicles():
+    """Autocomplete catalog vehicles by make, model or ID prefix."""
+    try:
+        limit = max(1, min(int(request.args.get('limit', 10)), 50))
+    except ValueError:
+        limit = 10
+    vehicles = CATALOG.search(request.args.get('q', ''), limit)
+    return jsonify(vehicles=[vehicle.to_dict() for vehicle in vehicles])
+
+
+@app.route('/api/v1/vehicles/<vehicle_id>')
+def api_vehicle(vehicle_id):
+    vehicle = CATALOG.get(vehicle_id)
+    if vehicle is None:
+        return jsonify(error=f"Unknown vehicle: {vehicle_id}"), 404
+    return jsonify(vehicle.to_dict())
+
+
+def parse_matrix_inputs(data):
+    """Normalize the charge window, prices and filters for the comparison matrix."""
+    cost_per_kwh = float(data.get('cost_per_kwh') or 0.16428)
+    min_range_km = data.get('min_range_km')
+    return {
+        'start_percentage': float(data.get('start_percentage') or 20),
+        'end_percentage': float(data.get('end_percentage') or 80),
+        'cost_per_kwh': cost_per_kwh,
+        'dc_cost_per_kwh': float(data.get('dc_cost_per_kwh') or cost_per_kwh),
+        'query': data.get('q') or None,
+        'make': data.get('make') or None,
+        'min_range_km': float(min_range_km) if min_range_km not in (None, '') else None,
+        'dc_only': data.get('dc_only') not in (None, '', '0', 'false'),
+        'sort': data.get('sort') or 'name',
+        'descending': data.get('order') == 'desc',
+    }
+
+
+def matrix_rows(inputs):
+    """The whole catalog matrix for a charge window and prices, and the selected row order.
+
+    The matrix is cached per window and prices, so sorting, filtering and
+    paging reuse it.
+    """
+    key = ('matrix', inputs['start_percentage'], inputs['end_percentage'],
+           inputs['cost_per_kwh'], inputs['dc_cost_per_kwh'])
+    result, _ = calculation_cache.get_or_compute(key, lambda: matrix.compute_matrix(
+        CATALOG, inputs['start_percentage'], inputs['end_percentage'],
+        inputs['cost_per_kwh'], inputs['dc_cost_per_kwh']
+    ))
+    indexes = matrix.select_rows(result, inputs['query'], inputs['make'], inputs['min_range_km'],
+                                 inputs['dc_only'], inputs['sort'], inputs['descending'])
+    return result, indexes
+
+
+@app.route('/api/v1/matrix')
+def api_matrix():
+    """Charging time and cost for every catalog vehicle on every charger.
+
+    Accepts 'start_percentage', 'end_percentage', 'cost_per_kwh',
+    'dc_cost_per_kwh', filters ('q', 'make', 'min_range_km', 'dc_only'),
+    'sort' (a per-vehicle column, or 'hours:<charger id>',
+    'cost:<charger id>' or 'emissions_kg:<charger id>'), 'order' and
+    paging ('page', 'per_page').
+    With format=csv every matching row is streamed instead of one page.
+    """
+    args = request.args
+    try:
+        inputs = parse_matrix_inputs(args)
+        result, indexes = matrix_rows(inputs)
+        if args.get('format') == 'csv':
+            return Response(matrix.write_csv(result, indexes), mimetype='text/csv',
+                            headers={'Content-Disposition': 'attachment; filename=matrix.csv'})
+        rows = matrix.page(result, indexes, args.get('page', 1), args.get('per_page', matrix.DEFAULT_PER_PAGE))
+    except ValueError as exc:
+        return jsonify(error=str(exc)), 400
+    return jsonify(dict(rows, chargers=result['chargers']))
+
+
+@app.route('/matrix')
+def matrix_page():
+    # Rendered pages are cached too, so paging back and forth skips rendering
+    key = ('matrix.html', tuple(sorted(request.args.items(multi=True))))
+    page, _ = calculation_cache.get_or_compute(key, lambda: render_matrix_page(request.args))
+    return page
+
+
+def render_matrix_page(args):
+    query = {name: value for name, value in args.items() if value not in ('', None) and name != 'page'}
+    inputs = {}
+    result = error = None
+    try:
+        inputs = parse_matrix_inputs(args)
+        full, indexes = matrix_rows(inputs)
+        result = matrix.page(full, indexes, args.get('page', 1), args.get('per_page', matrix.DEFAULT_PER_PAGE))
+    except ValueError as exc:
+        error = str(exc)
+
+    sort = inputs.get('sort', 'name')
+    order = 'desc' if inputs.get('descending') else 'asc'
+
+    def sort_url(column):
+        # Clicking the current sort column again reverses it
+        reverse = 'desc' if column == sort and order == 'asc' else 'asc'
+        return url_for('matrix_page', **dict(query, sort=column, order=reverse))
+
+    def page_url(number):
+        return url_for('matrix_page', **dict(query, page=number))
+
+    return render_template('matrix.html', args=args, query=query, result=result, error=error,
+                           chargers=matrix.CHARGERS, sort=sort, order=order,
+                           sort_url=sort_url, page_url=page_url,
+                           start_percentage=args.get('start_percentage', 20),
+                           end_percentage=args.get('end_percentage', 80),
+                           cost_per_kwh=args.get('cost_per_kwh', 0.16428),
+                           dc_cost_per_kwh=args.get('dc_cost_per_kwh', ''))
+
+
+# Render and compress the default page before the first request
+with app.test_request_context('/'):
+    render_default_page()
+
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5001))
@@ -0,0 +1,157 @@
+"""Fingerprinted, pre-compressed static files and responses.
+
+At startup every file in the static folder is read once, hashed and
+compressed with gzip (and brotli when the optional brotli package is
+installed). Pages link to /static/<name>.<hash>.<ext>, which can be cached
+forever because a change to the file changes its URL. The plain
+/static/<name> URL still works, but clients must revalidate it.
+
+The same CompressedAsset is used for the default GET page, so it is
+compressed once per worker instead of on every request. Smaller dynamic
+responses are compressed on the fly by compress_response().
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+from datetime import datetime, timezone
+
+from flask import Response
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip is offered
+    brotli = None
+
+# Long-lived caching for fingerprinted URLs; plain URLs and pages revalidate
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+# Dynamic responses smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 500
+COMPRESSIBLE_MIMETYPES = ('text/', 'application/json', 'application/javascript', 'image/svg+xml')
+
+
+def accepted_encoding(request, available):
+    """Best encoding in available that the client accepts: br, then gzip, else identity."""
+    for encoding in ('br', 'gzip'):
+        if encoding in available and request.accept_encodings.quality(encoding) > 0:
+            return encoding
+    return 'identity'
+
+
+class CompressedAsset:
+    """A response body stored alongside its compressed variants.
+
+    Args:
+        body (bytes): Uncompressed content
+        content_type (str): Content-Type header to send
+        last_modified (datetime): Sent as Last-Modified
+    """
+
+    def __init__(self, body, content_type, last_modified=None):
+        self.content_type = content_type
+        self.last_modified = last_modified
+        self.digest = hashlib.sha256(body).hexdigest()
+        self.bodies = {'identity': body, 'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            self.bodies['br'] = brotli.compress(body, quality=11)
+
+    def response(self, request, cache_control=REVALIDATE_CACHE_CONTROL):
+        """Serve the best encoding, answering 304 if the client's copy is current."""
+        encoding = accepted_encoding(request, self.bodies)
+        response = Response(self.bodies[encoding], content_type=self.content_type)
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['Cache-Control'] = cache_control
+        # Each encoding is a different representation, so it needs its own ETag
+        response.set_etag(self.digest[:16] if encoding == 'identity' else f"{self.digest[:16]}-{encoding}")
+        if self.last_modified is not None:
+            response.last_modified = self.last_modified
+        # make_conditional is comparatively slow, so only call it when there is something to compare
+        if 'If-None-Match' not in request.headers and 'If-Modified-Since' not in request.headers:
+            return response
+        return response.make_conditional(request)
+
+
+def file_modified(*paths):
+    """The newest modification time of files, as an aware datetime to the second.
+
+    Directories count every file under them, and missing paths are skipped.
+    """
+    newest = 0.0
+    for path in paths:
+        if os.path.isdir(path):
+            for folder, _, names in os.walk(path):
+                for name in names:
+                    newest = max(newest, os.path.getmtime(os.path.join(folder, name)))
+        elif os.path.exists(path):
+            newest = max(newest, os.path.getmtime(path))
+    return datetime.fromtimestamp(int(newest), timezone.utc)
+
+
+class StaticAssets:
+    """Every file under a folder, loaded and compressed once.
+
+    Args:
+        folder (str): The static folder
+    """
+
+    def __init__(self, folder):
+        self.assets = {}
+        self.fingerprints = {}
+        if not os.path.isdir(folder):
+            return
+        for root, _, files in os.walk(folder):
+            for name in files:
+                path = os.path.join(root, name)
+                filename = os.path.relpath(path, folder).replace(os.sep, '/')
+                content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+                if content_type.startswith('text/'):
+                    content_type += '; charset=utf-8'
+                with open(path, 'rb') as f:
+                    asset = CompressedAsset(f.read(), content_type, file_modified(path))
+                stem, extension = os.path.splitext(filename)
+                fingerprinted = f"{stem}.{asset.digest[:12]}{extension}"
+                self.assets[filename] = asset
+                self.assets[fingerprinted] = asset
+                self.fingerprints[filename] = fingerprinted
+
+    def url(self, filename):
+        """Fingerprinted URL for a static file, or the plain one if it is unknown."""
+        return '/static/' + self.fingerprints.get(filename, filename)
+
+    def response(self, request, filename):
+        """Serve a static file, or None if there is no such file."""
+        asset = self.assets.get(filename)
+        if asset is None:
+            return None
+        if filename in self.fingerprints:
+            return asset.response(request)
+        return asset.response(request, IMMUTABLE_CACHE_CONTROL)
+
+
+def compress_response(request, response):
+    """Compress a finished dynamic response if the client accepts it.
+
+    Streamed, already encoded, small and binary responses are left alone.
+    """
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or not response.mimetype.startswith(COMPRESSIBLE_MIMETYPES)):
+        return response
+    response.vary.add('Accept-Encoding')
+    # Check the client before reading the body, which is the common no-compression case
+    encoding = accepted_encoding(request, ('br', 'gzip') if brotli is not None else ('gzip',))
+    if encoding == 'identity':
+        return response
+    body = response.get_data()
+    if len(body) < MIN_COMPRESS_SIZE:
+        return response
+    if encoding == 'br':
+        response.set_data(brotli.compress(body, quality=4))
+    else:
+        response.set_data(gzip.compress(body, compresslevel=6))
+    response.headers['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,148 @@
+"""NumPy-backed batch versions of the calculator functions.
+
+Every input may be a scalar or an array; inputs are broadcast against each
+other and each output is a column array with one entry per row. The
+arithmetic mirrors calculator.py operation for operation, including charge
+curves and the charger model (phases, power factor and losses), so results
+are bit-for-bit identical to calling the scalar functions row by row.
+"""
+import numpy as np
+
+from calculator import EV_EFFICIENCY, GRID_CARBON_INTENSITY, TVA_MULTIPLIER
+
+
+def validate_percentages_batch(start_percentage, end_percentage):
+    """Apply calculator.validate_percentages to every row.
+
+    Raises ValueError for the first invalid row, using the same rules and
+    message as the scalar check.
+    """
+    start = np.asarray(start_percentage, dtype=float)
+    end = np.asarray(end_percentage, dtype=float)
+    start, end = np.broadcast_arrays(start, end)
+
+    out_of_bounds = ~((0 <= start) & (start <= 100) & (0 <= end) & (end <= 100))
+    wrong_direction = end <= start
+    invalid = (out_of_bounds | wrong_direction).ravel()
+    if invalid.any():
+        row = int(np.argmax(invalid))
+        if out_of_bounds.ravel()[row]:
+            raise ValueError(f"Row {row}: Percentages must be between 0 and 100")
+        raise ValueError(f"Row {row}: End percentage must be greater than start percentage")
+
+
+def curve_hours(curve, battery_size, power_kw, start, end):
+    """Apply curve.charging_hours to every row.
+
+    Absolute curves are tabulated per charger power, so rows are evaluated
+    once per distinct power.
+    """
+    if curve.relative:
+        return curve.charging_hours(battery_size, power_kw, start, end)
+    hours = np.empty_like(power_kw)
+    for power in np.unique(power_kw):
+        rows = power_kw == power
+        hours[rows] = curve.charging_hours(battery_size[rows], float(power), start[rows], end[rows])
+    return hours
+
+
+def calculate_batch(battery_size, voltage, amperage, start_percentage, end_percentage,
+                    cost_per_kwh=0.0, efficiency=EV_EFFICIENCY, max_power_kw=np.inf, curve=None,
+                    phases=1, power_factor=1.0, charger_efficiency=1.0):
+    """Calculate charging time, energy, cost and emissions for many rows.
+
+    Args:
+        battery_size (array_like): Battery capacity in kWh
+        voltage (array_like): Charger phase voltage in volts
+        amperage (array_like): Charging current in amps
+        start_percentage (array_like): Starting battery percentage
+        end_percentage (array_like): Target battery percentage
+        cost_per_kwh (array_like): Electricity cost per kWh before TVA
+        efficiency (array_like): Vehicle consumption in kWh/km
+        max_power_kw (array_like): Vehicle onboard charger limit in kW
+        curve (ChargeCurve): Optional non-linear charge curve for every row
+        phases (array_like): Number of AC phases in use
+        power_factor (array_like): Ratio of real to apparent power drawn
+        charger_efficiency (array_like): Share of the drawn power stored in the battery
+
+    Returns:
+        dict: Column arrays keyed by 'power_kw' (reaching the battery),
+        'energy_needed', 'hours', 'time_per_10_percent' (hours), 'total_cost',
+        'cost_for_full', 'ev_range' (km) and 'ev_emissions' (kg CO2). Costs
+        and emissions are for the grid energy, including the charger's losses.
+    """
+    (battery_size, voltage, amperage, start, end, cost_per_kwh, efficiency, max_power_kw, phases, power_factor,
+     charger_efficiency) = np.broadcast_arrays(
+        *(np.asarray(value, dtype=float) for value in
+          (battery_size, voltage, amperage, start_percentage, end_percentage, cost_per_kwh,
+           efficiency, max_power_kw, phases, power_factor, charger_efficiency))
+    )
+    validate_percentages_batch(start, end)
+
+    power_kw = np.minimum((phases * voltage * amperage * power_factor) / 1000, max_power_kw) * charger_efficiency
+    if not power_kw.all():
+        raise ZeroDivisionError("float division by zero")
+
+    energy_needed = battery_size * (end - start) / 100
+    energy_cost_with_tva = cost_per_kwh * TVA_MULTIPLIER / charger_efficiency
+
+    if curve is not None and not curve.is_linear:
+        hours = curve_hours(curve, battery_size, power_kw, start, end)
+        time_per_10_percent = hours * 10 / (end - start)
+    else:
+        hours = energy_needed / power_kw
+        time_per_10_percent = (battery_size * 0.1) / power_kw
+
+    return {
+        'power_kw': power_kw,
+        'energy_needed': energy_needed,
+        'hours': hours,
+        'time_per_10_percent': time_per_10_percent,
+        'total_cost': energy_needed * energy_cost_with_tva,
+        'cost_for_full': battery_size * energy_cost_with_tva,
+        'ev_range': energy_needed / efficiency,
+        'ev_emissions': energy_needed / charger_efficiency * GRID_CARBON_INTENSITY,
+    }
+
+
+def split_hours(hours):
+    """Split fractional hours into whole hours and minutes, truncating like int()."""
+    hours = np.asarray(hours, dtype=float)
+    hours_whole = np.trunc(hours)
+    minutes = np.trunc((hours - hours_whole) * 60)
+    return hours_whole.astype(np.int64), minutes.astype(np.int64)
+
+
+def format_durations(hours):
+    """Format an array of hours as "Xh Ym" strings."""
+    hours_whole, minutes = split_hours(hours)
+    return [f"{h}h {m}m" for h, m in zip(hours_whole.ravel().tolist(), minutes.ravel().tolist())]
+
+
+def format_charging_times(amperage, result):
+    """Turn calculate_batch columns into calculate_charging_time style dicts.
+
+    Args:
+        amperage (array_like): Charging current for each row
+        result (dict): Output of calculate_batch
+
+    Returns:
+        list: One dict per row with 'amperage', 'power_kw', 'duration'
+        and 'time_per_10_percent'
+    """
+    power_kw = result['power_kw'].ravel()
+    amperage = np.broadcast_to(np.asarray(amperage), power_kw.shape)
+    return [
+        {
+            'amperage': amps,
+            'power_kw': power,
+            'duration': duration,
+            'time_per_10_percent': per_10
+        }
+        for amps, power, duration, per_10 in zip(
+            amperage.tolist(),
+            power_kw.tolist(),
+            format_durations(result['hours']),
+            format_durations(result['time_per_10_percent'])
+        )
+    ]
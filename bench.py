@@ -0,0 +1,290 @@
+"""Micro-benchmarks and load tests for the calculator and the web path.
+
+Measures the calculator functions and template rendering in-process, then
+drives home() through the Flask test client and, optionally, a local
+gunicorn instance. Results are compared with bench_baseline.json and the run
+fails when throughput drops, or p95 latency rises, by more than the
+threshold.
+
+Usage:
+    python bench.py                        # run and compare with the baseline
+    python bench.py --save-baseline        # run and store a new baseline
+    python bench.py --gunicorn --workers 4 # include a real gunicorn server
+    python bench.py --threshold 0.3        # allow 30% regressions
+    python bench.py --rounds 5             # run each test 5 times
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlencode
+
+from flask import render_template
+
+from app import app
+from calculator import calculate_charging_time, calculate_costs, calculate_environmental_impact
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baseline.json')
+
+DEFAULT_THRESHOLD = 0.20
+
+# Each test runs this many times and each metric keeps its median, in both
+# the comparison and the baseline, so one burst of load from elsewhere on the
+# machine neither fails the check nor sets an unreachable baseline.
+DEFAULT_ROUNDS = 3
+
+FORM = {
+    'battery_size': '26.8',
+    'charger': 'ac1',
+    'cost_per_kwh': '0.16428',
+    'start_percentage': '20',
+    'end_percentage': '80'
+}
+
+# Metric suffixes checked for regressions and which direction is better
+REGRESSION_METRICS = {'ops_per_sec': 'higher', 'rps': 'higher', 'p95_ms': 'lower'}
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(int(fraction * len(sorted_values)), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def summarize(latencies, elapsed):
+    """Requests/sec and latency percentiles (ms) for a list of request times in seconds."""
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3)
+    }
+
+
+def time_function(function, duration):
+    """Call function repeatedly for about duration seconds and report its speed."""
+    calls = 0
+    batch = 1
+    start = time.perf_counter()
+    while True:
+        for _ in range(batch):
+            function()
+        calls += batch
+        elapsed = time.perf_counter() - start
+        if elapsed >= duration:
+            break
+        batch = min(batch * 2, 10000)
+    return {
+        'ops_per_sec': round(calls / elapsed, 1),
+        'mean_us': round(elapsed / calls * 1e6, 3)
+    }
+
+
+def median_of(rounds, measure):
+    """Run measure() rounds times and keep each metric's median value."""
+    runs = [measure() for _ in range(rounds)]
+    return {metric: statistics.median(run[metric] for run in runs) for metric in runs[0]}
+
+
+def micro_benchmarks(duration, rounds=1):
+    energy_needed, total_cost, cost_for_full = calculate_costs(26.8, 20, 80, 0.16428)
+    environmental = calculate_environmental_impact(energy_needed)
+    charge_times = [calculate_charging_time(26.8, 230, amperage, 20, 80) for amperage in (6, 8, 10, 16)]
+
+    def render_results():
+        with app.test_request_context('/', method='POST', data=FORM):
+            render_template('index.html',
+                            charge_times=charge_times,
+                            cost_per_kwh=0.16428,
+                            energy_needed=energy_needed,
+                            total_cost=total_cost,
+                            cost_for_full=cost_for_full,
+                            environmental=environmental)
+
+    functions = {
+        'calculate_charging_time': lambda: calculate_charging_time(26.8, 230, 10, 20, 80),
+        'calculate_costs': lambda: calculate_costs(26.8, 20, 80, 0.16428),
+        'calculate_environmental_impact': lambda: calculate_environmental_impact(16.08),
+        'render_results_page': render_results
+    }
+    return {name: median_of(rounds, lambda: time_function(function, duration))
+            for name, function in functions.items()}
+
+
+def client_load(requests, rounds=1):
+    """Sequential requests to home() through the Flask test client."""
+    client = app.test_client()
+
+    def load(method, data):
+        latencies = []
+        start = time.perf_counter()
+        for _ in range(requests):
+            request_start = time.perf_counter()
+            response = client.open('/', method=method, data=data)
+            latencies.append(time.perf_counter() - request_start)
+            if response.status_code != 200:
+                raise RuntimeError(f"{method} / returned {response.status_code}")
+        return summarize(latencies, time.perf_counter() - start)
+
+    results = {}
+    for name, method, data in (('client_get', 'GET', None), ('client_post', 'POST', FORM)):
+        for _ in range(min(requests, 50)):
+            client.open('/', method=method, data=data)
+        results[name] = median_of(rounds, lambda: load(method, data))
+    return results
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"gunicorn did not start listening on port {port}")
+
+
+def http_load(port, method, body, requests, concurrency):
+    """Spread requests over concurrent keep-alive connections."""
+    headers = {'Content-Type': 'application/x-www-form-urlencoded'} if body else {}
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    per_thread = max(requests // concurrency, 1)
+
+    def worker():
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        own = []
+        try:
+            for _ in range(per_thread):
+                request_start = time.perf_counter()
+                connection.request(method, '/', body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                own.append(time.perf_counter() - request_start)
+                if response.status != 200:
+                    errors.append(response.status)
+        except (OSError, http.client.HTTPException) as exc:
+            errors.append(exc)
+        finally:
+            connection.close()
+        with lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    if errors:
+        raise RuntimeError(f"{len(errors)} failed requests, first: {errors[0]}")
+    return summarize(latencies, elapsed)
+
+
+def gunicorn_load(requests, workers, concurrency):
+    """Start gunicorn on a free port and load both GET and POST /."""
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'app:app', '--bind', f'127.0.0.1:{port}',
+         '--workers', str(workers), '--log-level', 'warning'],
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    try:
+        wait_for_port(port)
+        body = urlencode(FORM)
+        http_load(port, 'GET', None, min(requests, 100), concurrency)  # warm up every worker
+        return {
+            'gunicorn_get': http_load(port, 'GET', None, requests, concurrency),
+            'gunicorn_post': http_load(port, 'POST', body, requests, concurrency)
+        }
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def compare(results, baseline, threshold):
+    """Return a message for every metric that regressed by more than threshold."""
+    regressions = []
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            direction = REGRESSION_METRICS.get(metric)
+            previous = baseline.get(name, {}).get(metric)
+            if direction is None or not previous:
+                continue
+            change = (value - previous) / previous
+            if (direction == 'higher' and change < -threshold) or (direction == 'lower' and change > threshold):
+                regressions.append(f"{name}.{metric}: {previous} -> {value} ({change:+.0%})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the calculator and web path.")
+    parser.add_argument('--duration', type=float, default=1.0, help="Seconds per micro-benchmark")
+    parser.add_argument('--requests', type=int, default=2000, help="Requests per load test")
+    parser.add_argument('--rounds', type=int, default=DEFAULT_ROUNDS,
+                        help="Runs of each test, compared and saved at their median (default 3)")
+    parser.add_argument('--gunicorn', action='store_true', help="Also load test a local gunicorn server")
+    parser.add_argument('--workers', type=int, default=2, help="gunicorn worker processes")
+    parser.add_argument('--concurrency', type=int, default=8, help="Concurrent gunicorn connections")
+    parser.add_argument('--threshold', type=float,
+                        default=float(os.environ.get('BENCH_THRESHOLD', DEFAULT_THRESHOLD)),
+                        help="Allowed fractional regression before failing (default 0.20)")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true')
+    args = parser.parse_args(argv)
+
+    results = micro_benchmarks(args.duration, args.rounds)
+    results.update(client_load(args.requests, args.rounds))
+    if args.gunicorn:
+        results.update(gunicorn_load(args.requests, args.workers, args.concurrency))
+
+    for name, metrics in results.items():
+        print(f"{name:32} " + '  '.join(f"{metric}={value}" for metric, value in metrics.items()))
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({
+                'environment': {'python': platform.python_version(), 'platform': platform.platform()},
+                'results': results
+            }, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare with; run with --save-baseline first")
+        return 0
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)['results']
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"Regressions beyond {args.threshold:.0%}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print(f"No regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
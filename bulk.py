@@ -0,0 +1,210 @@
+"""Streaming bulk calculations for fleet manifests.
+
+Rows are read incrementally from CSV or NDJSON, computed in fixed-size
+chunks with the batch engine and written back one line at a time, so memory
+use does not grow with the size of the manifest. A bad row produces an
+error entry in the output instead of aborting the whole run. Input is
+decoded with invalid UTF-8 replaced, and rows containing a replaced byte
+are reported as errors.
+
+Each input row needs vehicle_id, battery_kwh, start_pct, end_pct and tariff
+(€/kWh before TVA); amperage (default 16) and voltage (default 230) are
+optional.
+
+Usage:
+    python bulk.py fleet.csv -o results.ndjson
+    python bulk.py fleet.ndjson --output-format csv > results.csv
+"""
+import argparse
+import csv
+import io
+import json
+import math
+import sys
+
+from batch import calculate_batch
+from calculator import format_duration, validate_percentages
+
+CHUNK_SIZE = 1000
+
+DEFAULT_AMPERAGE = 16
+DEFAULT_VOLTAGE = 230
+
+# What the decoder puts in place of invalid UTF-8 with errors='replace'
+REPLACEMENT_CHARACTER = '\ufffd'
+
+OUTPUT_FIELDS = ['line', 'vehicle_id', 'power_kw', 'energy_kwh', 'hours', 'duration',
+                 'cost', 'ev_emissions_kg', 'error']
+
+
+def read_csv_rows(lines):
+    """Yield one dict per CSV data row from an iterable of text lines."""
+    yield from csv.DictReader(lines)
+
+
+def read_ndjson_rows(lines):
+    """Yield one dict per non-blank NDJSON line.
+
+    Lines that are not JSON objects are yielded as their error message so
+    they still produce an output row.
+    """
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield f"Invalid JSON: {exc}"
+            continue
+        yield row if isinstance(row, dict) else "Invalid JSON: expected an object"
+
+
+def parse_row(row):
+    """Convert a manifest row to calculator inputs, raising ValueError if invalid."""
+    if isinstance(row, str):
+        raise ValueError(row)
+    if any(isinstance(value, str) and REPLACEMENT_CHARACTER in value for value in row.values()):
+        raise ValueError("Row is not valid UTF-8")
+    try:
+        parsed = (
+            float(row['battery_kwh']),
+            float(row.get('voltage') or DEFAULT_VOLTAGE),
+            float(row.get('amperage') or DEFAULT_AMPERAGE),
+            float(row['start_pct']),
+            float(row['end_pct']),
+            float(row['tariff'])
+        )
+    except KeyError as exc:
+        raise ValueError(f"Missing field: {exc.args[0]}")
+    except (TypeError, ValueError):
+        raise ValueError("Please enter valid numbers")
+    # float() accepts 'nan' and 'inf', which would put NaN in the output
+    if not all(math.isfinite(value) for value in parsed):
+        raise ValueError("Please enter valid numbers")
+
+    validate_percentages(parsed[3], parsed[4])
+    if parsed[0] <= 0:
+        raise ValueError("Battery size must be positive")
+    if parsed[1] <= 0 or parsed[2] <= 0:
+        raise ValueError("Voltage and amperage must be positive")
+    return parsed
+
+
+def calculate_rows(rows, chunk_size=CHUNK_SIZE):
+    """Yield one result dict per input row, computing a chunk at a time.
+
+    Args:
+        rows (iterable): Manifest rows from read_csv_rows or read_ndjson_rows
+        chunk_size (int): Rows validated and computed together
+
+    Yields:
+        dict: Result fields from OUTPUT_FIELDS; invalid rows only carry
+        'line', 'vehicle_id' and 'error'
+    """
+    chunk = []
+    for line, row in enumerate(rows, start=1):
+        chunk.append((line, row))
+        if len(chunk) >= chunk_size:
+            yield from _calculate_chunk(chunk)
+            chunk = []
+    if chunk:
+        yield from _calculate_chunk(chunk)
+
+
+def _calculate_chunk(chunk):
+    results = []
+    valid_indexes = []
+    valid_inputs = []
+    for line, row in chunk:
+        vehicle_id = row.get('vehicle_id') if isinstance(row, dict) else None
+        result = {'line': line, 'vehicle_id': vehicle_id}
+        try:
+            valid_inputs.append(parse_row(row))
+            valid_indexes.append(len(results))
+        except ValueError as exc:
+            result['error'] = str(exc)
+        results.append(result)
+
+    if valid_inputs:
+        columns = calculate_batch(*zip(*valid_inputs))
+        for position, index in enumerate(valid_indexes):
+            hours = float(columns['hours'][position])
+            results[index].update({
+                'power_kw': float(columns['power_kw'][position]),
+                'energy_kwh': float(columns['energy_needed'][position]),
+                'hours': hours,
+                'duration': format_duration(hours),
+                'cost': float(columns['total_cost'][position]),
+                'ev_emissions_kg': float(columns['ev_emissions'][position]),
+                'error': None
+            })
+    return results
+
+
+def write_ndjson(results):
+    """Yield each result as one JSON line."""
+    for result in results:
+        yield json.dumps(result) + '\n'
+
+
+def write_csv(results):
+    """Yield a CSV header followed by one line per result."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=OUTPUT_FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    for result in results:
+        writer.writerow(result)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+READERS = {'csv': read_csv_rows, 'ndjson': read_ndjson_rows}
+WRITERS = {'csv': write_csv, 'ndjson': write_ndjson}
+
+
+def stream_results(lines, input_format='csv', output_format='ndjson', chunk_size=CHUNK_SIZE):
+    """Read a manifest from text lines and yield formatted output chunks."""
+    rows = READERS[input_format](lines)
+    return WRITERS[output_format](calculate_rows(rows, chunk_size))
+
+
+def guess_format(path, default='csv'):
+    if path.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    if path.endswith('.csv'):
+        return 'csv'
+    return default
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calculate charging times, costs and emissions for a fleet manifest.")
+    parser.add_argument('input', help="CSV or NDJSON manifest, or - for stdin")
+    parser.add_argument('-o', '--output', default='-', help="Output file (default: stdout)")
+    parser.add_argument('--input-format', choices=sorted(READERS), help="Defaults to the input file extension")
+    parser.add_argument('--output-format', choices=sorted(WRITERS), help="Defaults to the output file extension, then ndjson")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    input_format = args.input_format or guess_format(args.input)
+    output_format = args.output_format or guess_format(args.output, default='ndjson')
+
+    if args.input == '-':
+        sys.stdin.reconfigure(errors='replace')
+        source = sys.stdin
+    else:
+        source = open(args.input, newline='', encoding='utf-8', errors='replace')
+    target = sys.stdout if args.output == '-' else open(args.output, 'w', newline='', encoding='utf-8')
+    try:
+        for chunk in stream_results(source, input_format, output_format, args.chunk_size):
+            target.write(chunk)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,306 @@
+"""Bounded LRU caches with optional expiry.
+
+LRUCache lives in one process. SharedCache keeps its entries in a
+memory-mapped file, so every gunicorn worker on a host shares one cache and
+a restarted worker starts warm. The file holds a fixed table of equal-sized
+slots; a file lock serializes access between processes, and the slot
+metadata is scanned with NumPy so lookups stay in the microseconds.
+"""
+import fcntl
+import hashlib
+import mmap
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+
+# Largest pickled value a SharedCache slot holds; bigger values are not cached
+DEFAULT_SLOT_BYTES = 65536
+
+MAGIC = b'EVCACHE1'
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'), ('slots', '<u4'), ('slot_bytes', '<u4'), ('clock', '<u8'),
+    ('hits', '<u8'), ('misses', '<u8'), ('evictions', '<u8'), ('oversize', '<u8'),
+])
+HEADER_BYTES = 64
+SLOT_DTYPE = np.dtype([
+    ('key_high', '<u8'), ('key_low', '<u8'), ('last_used', '<u8'), ('expires', '<f8'), ('length', '<u4'),
+])
+
+
+class LRUCache:
+    """Least-recently-used cache with a size bound and optional TTL.
+
+    Args:
+        maxsize (int): Maximum number of entries kept; 0 disables caching
+        ttl (float): Seconds an entry stays valid, or None to never expire
+    """
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        """Return (value, hit) for key, calling compute() on a miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[1] is None or entry[1] > now):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0], True
+            self.misses += 1
+
+        # Compute outside the lock so slow calls don't block cache hits
+        value = compute()
+        if self.maxsize <= 0:
+            return value, False
+
+        expires = now + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value, False
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """Return hit/miss counters and current occupancy."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl
+            }
+
+
+def key_digest(key):
+    """128-bit digest of a cache key; keys must have a stable repr across processes."""
+    digest = hashlib.blake2b(repr(key).encode('utf-8'), digest_size=16).digest()
+    return int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little')
+
+
+class SharedCache:
+    """LRU cache shared by every process that opens the same file.
+
+    Values are pickled into fixed-size slots. Expiry uses wall-clock time,
+    and the least recently used slot (by a shared access clock) is replaced
+    when the table is full. Hit, miss and eviction counts live in the file,
+    so stats() covers all processes.
+
+    Args:
+        path (str): Cache file, created (or reset if its layout differs) on first use
+        maxsize (int): Number of slots; 0 disables caching
+        ttl (float): Seconds an entry stays valid, or None to never expire
+        slot_bytes (int): Largest pickled value stored
+        snapshot (str): Optional snapshot file loaded when the cache file is created
+    """
+
+    def __init__(self, path, maxsize=1024, ttl=None, slot_bytes=DEFAULT_SLOT_BYTES, snapshot=None):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.slot_bytes = slot_bytes
+        self.snapshot = snapshot
+        self._table_offset = HEADER_BYTES
+        self._data_offset = HEADER_BYTES + maxsize * SLOT_DTYPE.itemsize
+        self._size = self._data_offset + maxsize * slot_bytes
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path, snapshot=None):
+        """Open an existing cache file with the layout recorded in its header, or None."""
+        header = np.fromfile(path, HEADER_DTYPE, count=1) if os.path.exists(path) else ()
+        if not len(header) or header[0]['magic'] != MAGIC:
+            return None
+        return cls(path, int(header[0]['slots']), slot_bytes=int(header[0]['slot_bytes']), snapshot=snapshot)
+
+    def _open(self):
+        """Map the file in this process (again after a fork, for a separate file lock)."""
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, 'a+b')
+        fcntl.flock(self._file, fcntl.LOCK_EX)
+        try:
+            header = np.fromfile(self.path, HEADER_DTYPE, count=1)
+            fresh = (not len(header) or header[0]['magic'] != MAGIC or header[0]['slots'] != self.maxsize
+                     or header[0]['slot_bytes'] != self.slot_bytes or os.path.getsize(self.path) != self._size)
+            if fresh:
+                self._file.truncate(0)
+                self._file.truncate(self._size)
+            self._map = mmap.mmap(self._file.fileno(), self._size)
+            self._header = np.ndarray((), HEADER_DTYPE, buffer=self._map)
+            self._table = np.ndarray(self.maxsize, SLOT_DTYPE, buffer=self._map, offset=self._table_offset)
+            if fresh:
+                self._header['magic'] = MAGIC
+                self._header['slots'] = self.maxsize
+                self._header['slot_bytes'] = self.slot_bytes
+                if self.snapshot and os.path.exists(self.snapshot):
+                    self._load_snapshot()
+        finally:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._pid = pid
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            self._open()
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._file, fcntl.LOCK_UN)
+
+    def _find(self, key_high, key_low):
+        table = self._table
+        found = np.flatnonzero((table['key_high'] == key_high) & (table['key_low'] == key_low)
+                               & (table['length'] > 0))
+        return int(found[0]) if len(found) else None
+
+    def _touch(self, index):
+        self._header['clock'] += 1
+        self._table[index]['last_used'] = self._header['clock']
+
+    def _store(self, key_high, key_low, payload, expires):
+        """Write a pickled value, replacing an expired or the least recently used slot."""
+        index = self._find(key_high, key_low)
+        if index is None:
+            table = self._table
+            free = np.flatnonzero((table['length'] == 0)
+                                  | ((table['expires'] > 0) & (table['expires'] <= time.time())))
+            if len(free):
+                index = int(free[0])
+            else:
+                index = int(np.argmin(table['last_used']))
+                self._header['evictions'] += 1
+        start = self._data_offset + index * self.slot_bytes
+        self._map[start:start + len(payload)] = payload
+        entry = self._table[index]
+        entry['key_high'], entry['key_low'] = key_high, key_low
+        entry['expires'] = expires
+        entry['length'] = len(payload)
+        self._touch(index)
+
+    def get_or_compute(self, key, compute):
+        """Return (value, hit) for key, calling compute() on a miss."""
+        if self.maxsize <= 0:
+            return compute(), False
+        key_high, key_low = key_digest(key)
+        payload = None
+        with self._locked():
+            index = self._find(key_high, key_low)
+            if index is not None:
+                entry = self._table[index]
+                if entry['expires'] == 0 or entry['expires'] > time.time():
+                    start = self._data_offset + index * self.slot_bytes
+                    payload = self._map[start:start + int(entry['length'])]
+                    self._touch(index)
+                    self._header['hits'] += 1
+            if payload is None:
+                self._header['misses'] += 1
+        if payload is not None:
+            return pickle.loads(payload), True
+
+        # Compute outside the lock so slow calls don't block other processes
+        value = compute()
+        payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        expires = time.time() + self.ttl if self.ttl else 0.0
+        with self._locked():
+            if len(payload) > self.slot_bytes:
+                self._header['oversize'] += 1
+            else:
+                self._store(key_high, key_low, payload, expires)
+        return value, False
+
+    def clear(self):
+        with self._locked():
+            self._table['length'] = 0
+            for name in ('clock', 'hits', 'misses', 'evictions', 'oversize'):
+                self._header[name] = 0
+
+    def stats(self):
+        """Return hit/miss counters and current occupancy, across all processes."""
+        with self._locked():
+            hits, misses = int(self._header['hits']), int(self._header['misses'])
+            now = time.time()
+            live = (self._table['length'] > 0) & ((self._table['expires'] == 0) | (self._table['expires'] > now))
+            lookups = hits + misses
+            return {
+                'hits': hits,
+                'misses': misses,
+                'evictions': int(self._header['evictions']),
+                'oversize': int(self._header['oversize']),
+                'hit_rate': hits / lookups if lookups else 0.0,
+                'size': int(live.sum()),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'shared': True
+            }
+
+    def save_snapshot(self, path=None):
+        """Write the live entries to a snapshot file, most recently used first.
+
+        Returns:
+            int: Number of entries written
+        """
+        path = path or self.snapshot
+        with self._locked():
+            table = self._table
+            now = time.time()
+            live = np.flatnonzero((table['length'] > 0) & ((table['expires'] == 0) | (table['expires'] > now)))
+            live = live[np.argsort(-table['last_used'][live].astype(np.int64), kind='stable')]
+            entries = []
+            for index in live.tolist():
+                entry = table[index]
+                start = self._data_offset + index * self.slot_bytes
+                entries.append((int(entry['key_high']), int(entry['key_low']), float(entry['expires']),
+                                self._map[start:start + int(entry['length'])]))
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, 'wb') as f:
+            pickle.dump(entries, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+        return len(entries)
+
+    def _load_snapshot(self):
+        """Fill a freshly created file from the snapshot; the caller holds the file lock."""
+        try:
+            with open(self.snapshot, 'rb') as f:
+                entries = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return  # a missing or damaged snapshot only means a cold start
+        now = time.time()
+        # Oldest first, so the most recently used entries end up most recent here too
+        for key_high, key_low, expires, payload in reversed(entries[:self.maxsize]):
+            if (expires == 0 or expires > now) and len(payload) <= self.slot_bytes:
+                self._store(key_high, key_low, payload, expires)
+
+
+def remove_cache_file(path):
+    """Delete a shared cache file so the next process to open it starts fresh."""
+    if path and os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,289 @@
+"""Charging time, cost and environmental impact calculations.
+
+These functions are pure and shared by the web app, the batch engine and
+the other planning tools.
+"""
+
+# TVA applied on top of the electricity rate (20%)
+TVA_MULTIPLIER = 1.20
+
+# Average CO2 emissions per kWh of electricity in Ireland (2023)
+GRID_CARBON_INTENSITY = 0.220  # kg CO2/kWh
+
+# Average EV efficiency used to convert energy into driving range
+EV_EFFICIENCY = 0.2  # kWh/km
+
+
+def validate_percentages(start_percentage, end_percentage):
+    """Raise ValueError if the charging window is not a valid increase."""
+    # Validate percentage bounds
+    if not (0 <= start_percentage <= 100) or not (0 <= end_percentage <= 100):
+        raise ValueError("Percentages must be between 0 and 100")
+    
+    # Validate charging direction
+    if end_percentage <= start_percentage:
+        raise ValueError("End percentage must be greater than start percentage")
+
+
+def environmental_impact_values(energy_needed, efficiency=EV_EFFICIENCY,
+                                carbon_intensity=GRID_CARBON_INTENSITY, charger_efficiency=1.0):
+    """
+    Calculate environmental impact and savings compared to ICE vehicles.
+    
+    Emissions come from the energy drawn from the grid, as costs do; the
+    range comes from the energy stored in the battery.
+    
+    Args:
+        energy_needed (float): Energy needed for charging in kWh
+        efficiency (float): Vehicle consumption in kWh/km
+        carbon_intensity (float): Grid kg CO2/kWh while charging
+        charger_efficiency (float): Share of the grid energy stored in the battery
+        
+    Returns:
+        dict: Raw metrics - 'ev_emissions', 'petrol_savings' and
+        'diesel_savings' in kg CO2, 'ev_range' in km and the pollutant
+        savings in grams
+    """
+    grid_carbon_intensity = carbon_intensity  # kg CO2/kWh
+    
+    # Average petrol car emissions for the same distance
+    ev_range = energy_needed / efficiency  # km
+    petrol_emissions_per_km = 0.120  # kg CO2/km (average new car 2023)
+    diesel_emissions_per_km = 0.110  # kg CO2/km (average new car 2023)
+    
+    # Air pollutant emissions per km (mg/km) - Euro 6 standards
+    petrol_nox = 60.0  # mg/km NOx
+    diesel_nox = 80.0  # mg/km NOx
+    petrol_pm = 4.5   # mg/km PM (both PM2.5 and PM10)
+    diesel_pm = 4.5   # mg/km PM (both PM2.5 and PM10)
+    
+    # Calculate CO2 emissions
+    ev_emissions = energy_needed / charger_efficiency * grid_carbon_intensity
+    petrol_emissions = ev_range * petrol_emissions_per_km
+    diesel_emissions = ev_range * diesel_emissions_per_km
+    
+    # Calculate CO2 savings
+    petrol_savings = petrol_emissions - ev_emissions
+    diesel_savings = diesel_emissions - ev_emissions
+    
+    # Calculate air pollutant savings (in grams)
+    petrol_nox_saved = (ev_range * petrol_nox) / 1000  # Convert mg to g
+    diesel_nox_saved = (ev_range * diesel_nox) / 1000
+    petrol_pm_saved = (ev_range * petrol_pm) / 1000
+    diesel_pm_saved = (ev_range * diesel_pm) / 1000
+    
+    return {
+        'grid_intensity': grid_carbon_intensity,
+        'ev_emissions': ev_emissions,
+        'ev_range': ev_range,
+        'petrol_savings': petrol_savings,
+        'diesel_savings': diesel_savings,
+        'petrol_nox_saved': petrol_nox_saved,
+        'diesel_nox_saved': diesel_nox_saved,
+        'petrol_pm_saved': petrol_pm_saved,
+        'diesel_pm_saved': diesel_pm_saved
+    }
+
+
+def calculate_environmental_impact(energy_needed, efficiency=EV_EFFICIENCY,
+                                   carbon_intensity=GRID_CARBON_INTENSITY, charger_efficiency=1.0):
+    """
+    Calculate environmental impact and savings compared to ICE vehicles.
+    
+    Args:
+        energy_needed (float): Energy needed for charging in kWh
+        efficiency (float): Vehicle consumption in kWh/km
+        carbon_intensity (float): Grid kg CO2/kWh while charging
+        charger_efficiency (float): Share of the grid energy stored in the battery
+        
+    Returns:
+        dict: Environmental impact metrics including CO2 and air pollutants
+    """
+    values = environmental_impact_values(energy_needed, efficiency, carbon_intensity, charger_efficiency)
+    ev_emissions = values['ev_emissions']
+    
+    # Convert CO2 to more readable units if small
+    if ev_emissions < 1:
+        ev_emissions_str = f"{ev_emissions * 1000:.1f} g"
+    else:
+        ev_emissions_str = f"{ev_emissions:.2f} kg"
+    
+    return {
+        'ev_emissions': ev_emissions_str,
+        'ev_range': f"{values['ev_range']:.1f}",
+        'petrol_savings': f"{values['petrol_savings']:.2f}",
+        'diesel_savings': f"{values['diesel_savings']:.2f}",
+        'petrol_nox_saved': f"{values['petrol_nox_saved']:.1f}",
+        'diesel_nox_saved': f"{values['diesel_nox_saved']:.1f}",
+        'petrol_pm_saved': f"{values['petrol_pm_saved']:.1f}",
+        'diesel_pm_saved': f"{values['diesel_pm_saved']:.1f}"
+    }
+
+
+def cost_values(battery_size, start_percentage, end_percentage, cost_per_kwh, charger_efficiency=1.0):
+    """Calculate electricity costs for charging as raw euro amounts.
+    
+    Energy is paid for as it leaves the grid, so the charger's losses are
+    added to the energy stored in the battery.
+    
+    Returns:
+        tuple: (energy_needed, total_cost, cost_for_full) with energy_needed
+        stored in the battery and costs including TVA
+    """
+    # Calculate energy needed
+    energy_needed = battery_size * (end_percentage - start_percentage) / 100
+    energy_for_full = battery_size  # Energy needed for 0-100%
+    
+    # Calculate costs with TVA (20%) for the energy drawn from the grid
+    energy_cost_with_tva = cost_per_kwh * TVA_MULTIPLIER / charger_efficiency
+    
+    return (energy_needed,
+            energy_needed * energy_cost_with_tva,
+            energy_for_full * energy_cost_with_tva)
+
+
+def calculate_costs(battery_size, start_percentage, end_percentage, cost_per_kwh, charger_efficiency=1.0):
+    """Calculate electricity costs for charging.
+    
+    Args:
+        battery_size (float): Battery capacity in kWh
+        start_percentage (float): Starting battery percentage
+        end_percentage (float): Target battery percentage
+        cost_per_kwh (float): Electricity cost per kWh before TVA
+        charger_efficiency (float): Share of the grid energy stored in the battery
+        
+    Returns:
+        tuple: (energy_needed, total_cost, cost_per_10_percent)
+    """
+    energy_needed, total_cost, cost_for_full = cost_values(
+        battery_size, start_percentage, end_percentage, cost_per_kwh, charger_efficiency
+    )
+    
+    # Format costs with euro symbol and 2 decimal places
+    return energy_needed, f"€{total_cost:.2f}", f"€{cost_for_full:.2f}"
+
+
+def format_duration(hours):
+    """Format fractional hours as "Xh Ym", truncating to whole minutes."""
+    hours_whole = int(hours)
+    minutes = int((hours - hours_whole) * 60)
+    return f"{hours_whole}h {minutes}m"
+
+
+def supply_power(voltage, amperage, phases=1, power_factor=1.0, charger_efficiency=1.0, max_power_kw=None):
+    """Power reaching the battery in kW.
+    
+    The charger draws phases x phase voltage x amperage x power factor. The
+    vehicle's acceptance limit caps that draw, and the charger efficiency is
+    lost on the way to the battery. The defaults are single-phase with no
+    losses.
+    """
+    # Calculate power in kilowatts (voltage * amperage = watts, divide by 1000 for kW)
+    power_kw = (phases * voltage * amperage * power_factor) / 1000
+    if max_power_kw is not None and power_kw > max_power_kw:
+        power_kw = max_power_kw
+    return power_kw * charger_efficiency
+
+
+def charging_time_values(battery_size, voltage, amperage, start_percentage, end_percentage,
+                         curve=None, max_power_kw=None, phases=1, power_factor=1.0, charger_efficiency=1.0):
+    """Calculate charging power and times as raw numbers.
+    
+    Args:
+        voltage (float): Phase voltage (the DC voltage for DC chargers)
+        curve (ChargeCurve): Optional non-linear charge curve; by default
+            power is constant from start to end
+        max_power_kw (float): Optional vehicle acceptance limit, the onboard
+            charger on AC
+        phases (int): Number of AC phases in use
+        power_factor (float): Ratio of real to apparent power drawn
+        charger_efficiency (float): Share of the drawn power stored in the battery
+    
+    Returns:
+        dict: 'amperage', 'power_kw' (reaching the battery), 'hours' and
+        'time_per_10_percent' (hours). With a non-linear curve, time per 10%
+        is the average over the session.
+    """
+    validate_percentages(start_percentage, end_percentage)
+    
+    power_kw = supply_power(voltage, amperage, phases, power_factor, charger_efficiency, max_power_kw)
+    
+    if curve is not None and not curve.is_linear:
+        hours = curve.charging_hours(battery_size, power_kw, start_percentage, end_percentage)
+        return {
+            'amperage': amperage,
+            'power_kw': power_kw,
+            'hours': hours,
+            'time_per_10_percent': hours * 10 / (end_percentage - start_percentage)
+        }
+    
+    # Calculate energy needed (kWh)
+    energy_needed = battery_size * (end_percentage - start_percentage) / 100
+    
+    return {
+        'amperage': amperage,
+        'power_kw': power_kw,
+        # Calculate hours needed (energy needed / power)
+        'hours': energy_needed / power_kw,
+        # Calculate time for 10% charge
+        'time_per_10_percent': (battery_size * 0.1) / power_kw
+    }
+
+
+def calculate_charging_time(battery_size, voltage, amperage, start_percentage, end_percentage,
+                            curve=None, max_power_kw=None, phases=1, power_factor=1.0, charger_efficiency=1.0):
+    values = charging_time_values(battery_size, voltage, amperage, start_percentage, end_percentage,
+                                  curve, max_power_kw, phases, power_factor, charger_efficiency)
+    
+    return {
+        'amperage': amperage,
+        'power_kw': values['power_kw'],
+        'duration': format_duration(values['hours']),
+        'time_per_10_percent': format_duration(values['time_per_10_percent'])
+    }
+
+def calculate_summary(battery_size, voltage, amperages, start_percentage, end_percentage, cost_per_kwh,
+                      curve=None, efficiency=EV_EFFICIENCY, max_power_kw=None, charger_efficiency=None,
+                      carbon_intensity=GRID_CARBON_INTENSITY):
+    """Run all three calculations and return their raw numbers.
+    
+    Args:
+        battery_size (float): Battery capacity in kWh
+        voltage (float): Charger voltage in volts
+        amperages (iterable): Charging currents to compare, in amps
+        start_percentage (float): Starting battery percentage
+        end_percentage (float): Target battery percentage
+        cost_per_kwh (float): Electricity cost per kWh before TVA
+        curve (ChargeCurve): Optional non-linear charge curve
+        efficiency (float): Vehicle consumption in kWh/km
+        max_power_kw (float): Optional vehicle onboard charger limit
+        charger_efficiency (float): The charger type's efficiency when voltage
+            and max_power_kw already include its losses; None for a lossless supply
+        carbon_intensity (float): Grid kg CO2/kWh while charging
+        
+    Returns:
+        dict: 'charge_times' (one entry per amperage), 'energy_needed' in the
+        battery, 'grid_energy' drawn for it, cost figures in euro including
+        TVA and 'environmental' metrics
+    """
+    charge_times = [
+        charging_time_values(battery_size, voltage, amperage, start_percentage, end_percentage,
+                             curve, max_power_kw)
+        for amperage in amperages
+    ]
+    charger_efficiency = charger_efficiency or 1.0
+    energy_needed, total_cost, cost_for_full = cost_values(
+        battery_size, start_percentage, end_percentage, cost_per_kwh, charger_efficiency
+    )
+    
+    return {
+        'charge_times': charge_times,
+        'energy_needed': energy_needed,
+        'grid_energy': energy_needed / charger_efficiency,
+        'cost_per_kwh': cost_per_kwh,
+        'cost_per_kwh_with_tva': cost_per_kwh * TVA_MULTIPLIER,
+        'total_cost': total_cost,
+        'cost_for_full': cost_for_full,
+        'environmental': environmental_impact_values(energy_needed, efficiency, carbon_intensity,
+                                                     charger_efficiency)
+    }
@@ -0,0 +1,196 @@
+"""Time-varying grid carbon intensity from memory-mapped history files.
+
+Each region is stored in CARBON_DATA_DIR as three files:
+
+    <region>.json             start time (UTC epoch seconds) and slot length
+    <region>.intensity.npy    kg CO2/kWh for every slot (float32)
+    <region>.cumulative.npy   running sum of the intensity column (float64)
+
+The .npy columns are opened with mmap_mode='r' on the first query, so a
+worker only pages in the parts of a multi-year file it touches. The running
+sum makes the average intensity over any charging window O(1).
+
+Build a region file from a CSV of "timestamp,intensity" rows (ISO 8601
+timestamps, g CO2/kWh) with:
+
+    python carbon.py build IE history.csv
+"""
+import argparse
+import csv
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+
+from calculator import GRID_CARBON_INTENSITY
+
+CARBON_DATA_DIR = os.environ.get(
+    'CARBON_DATA_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'carbon')
+)
+
+DEFAULT_SLOT_MINUTES = 30
+
+
+def to_epoch(value):
+    """Convert a datetime (naive means UTC), ISO string or number to epoch seconds."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    return float(value)
+
+
+class CarbonIntensitySeries:
+    """Lazily loaded carbon intensity history and forecast for one region.
+
+    Args:
+        region (str): Region code, e.g. 'IE'
+        directory (str): Directory holding the region files
+    """
+
+    def __init__(self, region, directory=None):
+        self.region = region
+        self.directory = directory or CARBON_DATA_DIR
+        self._meta = None
+        self._intensity = None
+        self._cumulative = None
+
+    def _path(self, suffix):
+        return os.path.join(self.directory, f"{self.region}{suffix}")
+
+    def _load(self):
+        if self._cumulative is None:
+            with open(self._path('.json'), encoding='utf-8') as f:
+                self._meta = json.load(f)
+            self._intensity = np.load(self._path('.intensity.npy'), mmap_mode='r')
+            self._cumulative = np.load(self._path('.cumulative.npy'), mmap_mode='r')
+        return self._meta
+
+    @property
+    def start(self):
+        return self._load()['start']
+
+    @property
+    def slot_seconds(self):
+        return self._load()['slot_minutes'] * 60
+
+    @property
+    def end(self):
+        return self.start + len(self._intensity) * self.slot_seconds
+
+    def _integral(self, epoch):
+        """Intensity summed from the series start to epoch, in kg/kWh x slots."""
+        slots = (epoch - self.start) / self.slot_seconds
+        index = min(max(int(slots), 0), len(self._intensity) - 1)
+        return float(self._cumulative[index]) + (slots - index) * float(self._intensity[index])
+
+    def average_intensity(self, start_time, end_time):
+        """Mean kg CO2/kWh between two times (datetimes, ISO strings or epoch seconds)."""
+        self._load()
+        start, end = to_epoch(start_time), to_epoch(end_time)
+        if start < self.start or end > self.end:
+            raise ValueError(f"No carbon intensity data for {self.region} over that period")
+        if end <= start:
+            return float(self._intensity[min(int((start - self.start) / self.slot_seconds),
+                                             len(self._intensity) - 1)])
+        slots = (end - start) / self.slot_seconds
+        return (self._integral(end) - self._integral(start)) / slots
+
+    def session_emissions(self, start_time, power_kw, energy_kwh):
+        """kg CO2 for a constant-power session starting at start_time."""
+        start = to_epoch(start_time)
+        end = start + energy_kwh / power_kw * 3600
+        return energy_kwh * self.average_intensity(start, end)
+
+
+_series = {}
+
+
+def available_regions(directory=None):
+    """Region codes with data files, without loading any of them."""
+    directory = directory or CARBON_DATA_DIR
+    if not os.path.isdir(directory):
+        return []
+    return sorted(name[:-len('.json')] for name in os.listdir(directory) if name.endswith('.json'))
+
+
+def get_series(region, directory=None):
+    """Return the (cached, lazily loaded) series for a region."""
+    directory = directory or CARBON_DATA_DIR
+    key = (directory, region)
+    if key not in _series:
+        if region not in available_regions(directory):
+            raise ValueError(f"Unknown carbon intensity region: {region}")
+        _series[key] = CarbonIntensitySeries(region, directory)
+    return _series[key]
+
+
+def session_intensity(region, start_time, hours, directory=None):
+    """Average kg CO2/kWh over a charging session, or the national average without a region."""
+    if not region:
+        return GRID_CARBON_INTENSITY
+    end = to_epoch(start_time) + hours * 3600
+    return get_series(region, directory).average_intensity(start_time, end)
+
+
+def write_series(region, start, intensity, slot_minutes=DEFAULT_SLOT_MINUTES, directory=None):
+    """Write a region's intensity column (kg CO2/kWh) and its running sum."""
+    directory = directory or CARBON_DATA_DIR
+    intensity = np.asarray(intensity, dtype=np.float32)
+    os.makedirs(directory, exist_ok=True)
+    cumulative = np.concatenate(([0.0], np.cumsum(intensity, dtype=np.float64)))
+    np.save(os.path.join(directory, f"{region}.intensity.npy"), intensity)
+    np.save(os.path.join(directory, f"{region}.cumulative.npy"), cumulative)
+    with open(os.path.join(directory, f"{region}.json"), 'w', encoding='utf-8') as f:
+        json.dump({'start': to_epoch(start), 'slot_minutes': slot_minutes}, f)
+    _series.pop((directory, region), None)
+
+
+def build_from_csv(region, path, slot_minutes=DEFAULT_SLOT_MINUTES, directory=None):
+    """Convert a "timestamp,intensity" CSV in g CO2/kWh into region files.
+
+    Rows must be in time order; missing slots are filled with the previous value.
+    """
+    slot_seconds = slot_minutes * 60
+    start = None
+    values = []
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            try:
+                epoch, grams = to_epoch(row[0]), float(row[1])
+            except (IndexError, ValueError):
+                continue  # header or malformed line
+            if start is None:
+                start = epoch
+            slot = int(round((epoch - start) / slot_seconds))
+            while len(values) < slot:
+                values.append(values[-1])
+            if slot == len(values):
+                values.append(grams / 1000)
+    if start is None:
+        raise ValueError(f"No intensity rows in {path}")
+    write_series(region, start, values, slot_minutes, directory)
+    return len(values)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage carbon intensity history files.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help="Build a region file from a timestamp,g/kWh CSV")
+    build.add_argument('region')
+    build.add_argument('csv_path')
+    build.add_argument('--slot-minutes', type=int, default=DEFAULT_SLOT_MINUTES)
+    build.add_argument('--directory', default=None, help="Defaults to CARBON_DATA_DIR")
+    args = parser.parse_args(argv)
+
+    directory = args.directory or CARBON_DATA_DIR
+    slots = build_from_csv(args.region, args.csv_path, args.slot_minutes, directory)
+    print(f"Wrote {slots} slots for {args.region} to {directory}")
+
+
+if __name__ == '__main__':
+    main()
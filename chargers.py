@@ -0,0 +1,124 @@
+"""Charger types and the power a vehicle draws from them.
+
+Each type is one row of CHARGER_TYPES. The charger supplies phases x phase
+voltage x current x power factor. AC chargers run at the selected current,
+up to their rated current. DC chargers always offer their full current.
+The vehicle's acceptance limit caps that supply: the onboard charger on AC,
+the battery's DC limit on DC. The charger's efficiency is then lost on the
+way to the battery.
+
+power_table() evaluates any number of charger columns for every vehicle in
+one NumPy pass. effective_supply() folds one charger type into the voltage
+and power cap that the tariff, distribution and solver models take, so those
+models need no changes.
+"""
+import numpy as np
+
+# Phase voltage is 230 V; three-phase is 400 V between phases. DC voltage is
+# the nominal output, and max_current times it gives the rated power.
+CHARGER_TYPES = (
+    {'id': 'ac1', 'label': 'AC single-phase 230 V, up to 7.4 kW', 'kind': 'ac', 'phases': 1,
+     'voltage': 230.0, 'max_current': 32.0, 'power_factor': 0.99, 'efficiency': 0.90},
+    {'id': 'ac3', 'label': 'AC three-phase 400 V, up to 22 kW', 'kind': 'ac', 'phases': 3,
+     'voltage': 230.0, 'max_current': 32.0, 'power_factor': 0.99, 'efficiency': 0.92},
+    {'id': 'dc-50', 'label': '50 kW DC', 'kind': 'dc', 'phases': 1,
+     'voltage': 400.0, 'max_current': 125.0, 'power_factor': 1.0, 'efficiency': 0.95},
+    {'id': 'dc-100', 'label': '100 kW DC', 'kind': 'dc', 'phases': 1,
+     'voltage': 400.0, 'max_current': 250.0, 'power_factor': 1.0, 'efficiency': 0.95},
+    {'id': 'dc-150', 'label': '150 kW DC', 'kind': 'dc', 'phases': 1,
+     'voltage': 400.0, 'max_current': 375.0, 'power_factor': 1.0, 'efficiency': 0.95},
+    {'id': 'dc-350', 'label': '350 kW DC', 'kind': 'dc', 'phases': 1,
+     'voltage': 800.0, 'max_current': 437.5, 'power_factor': 1.0, 'efficiency': 0.95},
+)
+
+DEFAULT_CHARGER = 'ac1'
+
+_BY_ID = {charger['id']: charger for charger in CHARGER_TYPES}
+
+
+def get_charger(charger_id):
+    """Look up a charger type by ID; None or '' means DEFAULT_CHARGER."""
+    try:
+        return _BY_ID[charger_id or DEFAULT_CHARGER]
+    except KeyError:
+        raise ValueError(f"Unknown charger type: {charger_id}")
+
+
+def rated_power(charger):
+    """Power the charger can supply in kW, before any vehicle limit or losses."""
+    return (charger['phases'] * charger['voltage'] * charger['max_current'] * charger['power_factor']) / 1000
+
+
+def charger_currents(charger, amperages):
+    """Currents to compare on a charger: the chosen ones on AC, the full current on DC."""
+    if charger['kind'] == 'dc':
+        return (charger['max_current'],)
+    return tuple(min(amperage, charger['max_current']) for amperage in amperages)
+
+
+def acceptance_limit(charger, onboard_charger_kw=None, dc_max_kw=None):
+    """The vehicle's limit on a charger in kW, or None if it has none.
+
+    Raises:
+        ValueError: If the vehicle cannot charge on this kind of charger
+    """
+    limit = dc_max_kw if charger['kind'] == 'dc' else onboard_charger_kw
+    if limit is not None and limit <= 0:
+        raise ValueError(f"This vehicle cannot charge on {charger['label']}")
+    return limit
+
+
+def calculator_options(charger, onboard_charger_kw=None, dc_max_kw=None):
+    """Keyword arguments for calculate_charging_time on a charger type."""
+    limit = acceptance_limit(charger, onboard_charger_kw, dc_max_kw)
+    rated = rated_power(charger)
+    return {
+        'voltage': charger['voltage'],
+        'phases': charger['phases'],
+        'power_factor': charger['power_factor'],
+        'charger_efficiency': charger['efficiency'],
+        'max_power_kw': rated if limit is None else min(rated, limit),
+    }
+
+
+def effective_supply(charger, onboard_charger_kw=None, dc_max_kw=None):
+    """Single-phase voltage and power cap that give the same battery power as the charger.
+
+    Returns:
+        tuple: (voltage, max_power_kw) so that min(voltage * amperage / 1000,
+        max_power_kw) equals supply_power() for any current
+    """
+    options = calculator_options(charger, onboard_charger_kw, dc_max_kw)
+    voltage = options['phases'] * options['voltage'] * options['power_factor'] * options['charger_efficiency']
+    return voltage, options['max_power_kw'] * options['charger_efficiency']
+
+
+def power_table(columns, onboard_charger_kw, dc_max_kw):
+    """Battery power for every vehicle on every charger column (vehicles x columns).
+
+    Args:
+        columns (sequence): Dicts with a charger 'type' ID and an optional
+            'current'; DC columns and columns without one use the full current
+        onboard_charger_kw (array_like): Each vehicle's AC limit, 0 without AC charging
+        dc_max_kw (array_like): Each vehicle's DC limit, 0 without a DC inlet
+
+    Returns:
+        ndarray: kW reaching the battery, NaN where a vehicle cannot use a charger
+    """
+    types = [get_charger(column['type']) for column in columns]
+    table = {
+        field: np.array([charger[field] for charger in types], dtype=float)
+        for field in ('phases', 'voltage', 'max_current', 'power_factor', 'efficiency')
+    }
+    is_dc = np.array([charger['kind'] == 'dc' for charger in types])
+    current = np.array([column.get('current') or charger['max_current']
+                        for column, charger in zip(columns, types)], dtype=float)
+    current = np.where(is_dc, table['max_current'], np.minimum(current, table['max_current']))
+
+    limit = np.where(is_dc, np.asarray(dc_max_kw, dtype=float)[:, None],
+                     np.asarray(onboard_charger_kw, dtype=float)[:, None])
+    # Same steps as supply_power, one column per charger
+    supplied = table['phases'] * table['voltage'] * current * table['power_factor'] / 1000
+    power = np.minimum(supplied, limit) * table['efficiency']
+    return np.where(power > 0, power, np.nan)
+
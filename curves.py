@@ -0,0 +1,146 @@
+"""Non-linear charge curves (charging power versus state of charge).
+
+A curve gives the most power a pack accepts at each state of charge, either
+in kW or, for relative curves, as a fraction of the charger's power. When a
+curve is loaded, the cumulative time to charge from 0% to every point on a
+0.1% grid is tabulated, so any start/end query is two table lookups with
+linear interpolation instead of a numeric integration.
+
+The default 'linear' curve is the constant-power model used by
+calculate_charging_time.
+"""
+import json
+import os
+
+import numpy as np
+
+CURVES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'charge_curves.json')
+
+# Charger power levels tabulated up front: 230V at the standard amperages
+PRELOAD_POWER_KW = (1.38, 1.84, 2.3, 3.68)
+
+# State of charge grid used by the cumulative-time tables
+SOC_GRID = np.linspace(0, 100, 1001)
+
+# Bound on cached tables per curve, for absolute curves queried at many power levels
+MAX_TABLES = 64
+
+
+class ChargeCurve:
+    """Maximum accepted power as a piecewise-linear function of state of charge.
+
+    Args:
+        name (str): Curve identifier
+        soc (list): State of charge breakpoints, from 0 to 100
+        power (list): Accepted power at each breakpoint, in kW or as a
+            fraction of charger power if relative
+        relative (bool): Whether power is a fraction of the charger power
+        description (str): Human readable summary
+    """
+
+    def __init__(self, name, soc=None, power=None, relative=False, description=''):
+        self.name = name
+        self.description = description
+        self.relative = relative
+        self._tables = {}
+        if soc is None:
+            self.soc = self.power = None
+            return
+
+        self.soc = np.asarray(soc, dtype=float)
+        self.power = np.asarray(power, dtype=float)
+        if (len(self.soc) != len(self.power) or len(self.soc) < 2
+                or self.soc[0] != 0 or self.soc[-1] != 100 or np.any(np.diff(self.soc) <= 0)):
+            raise ValueError(f"Charge curve {name} must have increasing SoC points from 0 to 100")
+        if np.any(self.power <= 0):
+            raise ValueError(f"Charge curve {name} must have positive power")
+
+        for charger_kw in (None,) if relative else PRELOAD_POWER_KW:
+            self._table(charger_kw)
+
+    def __repr__(self):
+        # Curves are unique by name; a stable repr keeps shared cache keys equal across workers
+        return f"ChargeCurve({self.name!r})"
+
+    @property
+    def is_linear(self):
+        return self.soc is None
+
+    def accepted_power(self, soc, charger_kw):
+        """Power in kW actually drawn at each state of charge."""
+        if self.is_linear:
+            return np.full(np.shape(soc), float(charger_kw))
+        limit = np.interp(soc, self.soc, self.power)
+        return limit * charger_kw if self.relative else np.minimum(limit, charger_kw)
+
+    def _table(self, charger_kw):
+        """Cumulative hours per kWh of capacity from 0% to each SOC_GRID point.
+
+        Relative curves share a single table expressed per kW of charger
+        power, so it is keyed on None.
+        """
+        key = None if self.relative else charger_kw
+        table = self._tables.get(key)
+        if table is None:
+            if self.relative:
+                inverse = 1 / np.interp(SOC_GRID, self.soc, self.power)
+            else:
+                inverse = 1 / self.accepted_power(SOC_GRID, charger_kw)
+            # Trapezoidal integral of 1/P over each 0.1% step, in hours per kWh x 100
+            steps = (inverse[1:] + inverse[:-1]) / 2 * np.diff(SOC_GRID)
+            table = np.concatenate(([0.0], np.cumsum(steps)))
+            if len(self._tables) >= MAX_TABLES:
+                self._tables.clear()
+            self._tables[key] = table
+        return table
+
+    def charging_hours(self, battery_size, charger_kw, start_percentage, end_percentage):
+        """Hours to charge between two states of charge; accepts arrays."""
+        if self.is_linear:
+            return battery_size * (np.asarray(end_percentage) - start_percentage) / 100 / charger_kw
+        table = self._table(charger_kw)
+        integral = np.interp(end_percentage, SOC_GRID, table) - np.interp(start_percentage, SOC_GRID, table)
+        hours = battery_size * integral / 100
+        if self.relative:
+            hours = hours / charger_kw
+        return float(hours) if np.ndim(hours) == 0 else hours
+
+    def reachable_percentage(self, battery_size, charger_kw, start_percentage, hours):
+        """State of charge reached after charging for a number of hours; the inverse of charging_hours."""
+        if self.is_linear:
+            return float(min(start_percentage + hours * charger_kw / battery_size * 100, 100.0))
+        table = self._table(charger_kw)
+        integral = hours * 100 / battery_size
+        if self.relative:
+            integral = integral * charger_kw
+        # The table is strictly increasing, so it can be read backwards
+        return float(np.interp(np.interp(start_percentage, SOC_GRID, table) + integral, table, SOC_GRID))
+
+
+LINEAR = ChargeCurve('linear', description='Constant power from start to end')
+
+
+def load_curves(path=CURVES_PATH):
+    """Load charge curves from a JSON list, keyed by name, including 'linear'."""
+    curves = {LINEAR.name: LINEAR}
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            for spec in json.load(f):
+                curve = ChargeCurve(spec['name'], spec['soc'], spec['power'],
+                                    relative=spec.get('relative', False),
+                                    description=spec.get('description', ''))
+                curves[curve.name] = curve
+    return curves
+
+
+CURVES = load_curves()
+
+
+def get_curve(name):
+    """Look up a loaded curve by name; None or '' means the linear default."""
+    if not name:
+        return LINEAR
+    try:
+        return CURVES[name]
+    except KeyError:
+        raise ValueError(f"Unknown charge curve: {name}")
@@ -0,0 +1,216 @@
+"""Monte Carlo ranges for the charging time, cost and emissions estimates.
+
+The point calculations assume exact inputs. Here every sample perturbs the
+things that vary in practice: the state-of-charge readings, ambient
+temperature (which slows charging and raises consumption in the cold),
+charger efficiency losses and grid carbon intensity. Whole chunks of samples
+are drawn and evaluated as NumPy arrays, and the result is reported as
+percentiles.
+
+Samples are generated in fixed-size chunks, each with its own child of
+np.random.SeedSequence(seed), so the same seed gives the same samples
+whether the chunks run in this process or on the process pool.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from calculator import EV_EFFICIENCY, GRID_CARBON_INTENSITY, TVA_MULTIPLIER, validate_percentages
+from curves import get_curve
+
+# Spread of each perturbed input; override any of them per request
+DEFAULT_UNCERTAINTY = {
+    'soc_sd': 2.0,                    # percentage points of SoC reading error
+    'temperature_c': 10.0,            # mean ambient temperature (°C)
+    'temperature_sd': 5.0,
+    'charger_efficiency': 0.90,       # share of grid energy that reaches the battery
+    'charger_efficiency_sd': 0.03,
+    'intensity_sd': 0.20,             # relative spread of grid carbon intensity
+}
+
+# Below this temperature charging slows and consumption rises, per degree
+COLD_THRESHOLD_C = 15.0
+COLD_POWER_LOSS = 0.015
+COLD_CONSUMPTION_GAIN = 0.01
+
+PETROL_EMISSIONS_PER_KM = 0.120  # kg CO2/km, as in calculator.environmental_impact_values
+DIESEL_EMISSIONS_PER_KM = 0.110
+
+DEFAULT_SAMPLES = 10000
+MAX_SAMPLES = 1000000
+DEFAULT_SEED = 0
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+# Samples per chunk; fixed so results do not depend on the number of workers
+CHUNK_SAMPLES = 25000
+
+# Runs with at least this many samples are spread over the process pool
+PARALLEL_SAMPLES = int(os.environ.get('DISTRIBUTION_PARALLEL_SAMPLES', 200000))
+DISTRIBUTION_WORKERS = int(os.environ.get('DISTRIBUTION_WORKERS', min(os.cpu_count() or 1, 4)))
+
+_executor = None
+
+
+def get_executor():
+    """Process pool shared by all large runs in this process, created on first use."""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=DISTRIBUTION_WORKERS)
+    return _executor
+
+
+def simulate_chunk(seed_sequence, size, battery_size, voltage, amperages, start_percentage,
+                   end_percentage, cost_per_kwh, curve_name, efficiency, max_power_kw,
+                   carbon_intensity, uncertainty):
+    """Draw and evaluate one chunk of samples.
+
+    Returns:
+        dict: Column arrays keyed by output name; 'hours' has one column per amperage
+    """
+    rng = np.random.default_rng(seed_sequence)
+    soc_sd = uncertainty['soc_sd']
+    start = np.clip(start_percentage + rng.normal(0.0, soc_sd, size), 0, 100)
+    end = np.clip(end_percentage + rng.normal(0.0, soc_sd, size), 0, 100)
+    end = np.maximum(end, start)
+    temperature = rng.normal(uncertainty['temperature_c'], uncertainty['temperature_sd'], size)
+    charger_efficiency = np.clip(
+        rng.normal(uncertainty['charger_efficiency'], uncertainty['charger_efficiency_sd'], size), 0.5, 1.0
+    )
+    intensity = carbon_intensity * rng.lognormal(0.0, uncertainty['intensity_sd'], size)
+
+    cold = np.maximum(COLD_THRESHOLD_C - temperature, 0)
+    power_factor = charger_efficiency * np.maximum(1 - cold * COLD_POWER_LOSS, 0.5)
+    consumption = efficiency * (1 + cold * COLD_CONSUMPTION_GAIN)
+
+    energy_needed = battery_size * (end - start) / 100
+    grid_energy = energy_needed / charger_efficiency
+    ev_range = energy_needed / consumption
+    ev_emissions = grid_energy * intensity
+
+    curve = get_curve(curve_name)
+    hours = np.empty((size, len(amperages)))
+    for column, amperage in enumerate(amperages):
+        power_kw = (voltage * amperage) / 1000
+        if max_power_kw is not None:
+            power_kw = min(power_kw, max_power_kw)
+        hours[:, column] = curve.charging_hours(battery_size, power_kw, start, end) / power_factor
+
+    return {
+        'hours': hours,
+        'energy_needed': energy_needed,
+        'grid_energy': grid_energy,
+        'total_cost': grid_energy * cost_per_kwh * TVA_MULTIPLIER,
+        'ev_range': ev_range,
+        'ev_emissions': ev_emissions,
+        'petrol_savings': ev_range * PETROL_EMISSIONS_PER_KM - ev_emissions,
+        'diesel_savings': ev_range * DIESEL_EMISSIONS_PER_KM - ev_emissions,
+    }
+
+
+def simulate(battery_size, voltage, amperages, start_percentage, end_percentage, cost_per_kwh,
+             curve=None, efficiency=EV_EFFICIENCY, max_power_kw=None,
+             carbon_intensity=GRID_CARBON_INTENSITY, samples=DEFAULT_SAMPLES, seed=DEFAULT_SEED,
+             uncertainty=None, parallel=None):
+    """Sample perturbed inputs and return every sample's outputs.
+
+    Args:
+        curve (ChargeCurve): Charge curve; constant power by default
+        samples (int): Number of samples, up to MAX_SAMPLES
+        seed (int): Seed for np.random.SeedSequence
+        uncertainty (dict): Overrides for DEFAULT_UNCERTAINTY
+        parallel (bool): Use the process pool; by default only for runs of
+            PARALLEL_SAMPLES or more
+
+    Returns:
+        dict: Column arrays as returned by simulate_chunk, for all samples
+    """
+    validate_percentages(start_percentage, end_percentage)
+    samples = int(samples)
+    if not 1 <= samples <= MAX_SAMPLES:
+        raise ValueError(f"Samples must be between 1 and {MAX_SAMPLES}")
+    if (voltage * min(amperages)) <= 0:
+        raise ValueError("Voltage and amperage must be positive")
+    spread = dict(DEFAULT_UNCERTAINTY, **(uncertainty or {}))
+
+    sizes = [CHUNK_SAMPLES] * (samples // CHUNK_SAMPLES)
+    if samples % CHUNK_SAMPLES:
+        sizes.append(samples % CHUNK_SAMPLES)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    arguments = (battery_size, voltage, tuple(amperages), start_percentage, end_percentage,
+                 cost_per_kwh, curve.name if curve is not None else None, efficiency,
+                 max_power_kw, carbon_intensity, spread)
+
+    if parallel is None:
+        parallel = samples >= PARALLEL_SAMPLES and DISTRIBUTION_WORKERS > 1
+    if parallel and len(sizes) > 1:
+        futures = [get_executor().submit(simulate_chunk, chunk_seed, size, *arguments)
+                   for chunk_seed, size in zip(seeds, sizes)]
+        chunks = [future.result() for future in futures]
+    else:
+        chunks = [simulate_chunk(chunk_seed, size, *arguments) for chunk_seed, size in zip(seeds, sizes)]
+
+    if len(chunks) == 1:
+        return chunks[0]
+    return {name: np.concatenate([chunk[name] for chunk in chunks]) for name in chunks[0]}
+
+
+def summarize_distribution(columns, amperages, voltage, max_power_kw=None,
+                           percentiles=DEFAULT_PERCENTILES):
+    """Percentiles of each simulated output.
+
+    Returns:
+        dict: 'percentiles', a 'charge_times' list with the 'hours' percentiles
+        for each amperage, and percentiles of every other output keyed 'p5',
+        'p50', ... as floats
+    """
+    percentiles = tuple(float(p) for p in percentiles)
+    if not all(0 <= p <= 100 for p in percentiles):
+        raise ValueError("Percentiles must be between 0 and 100")
+    keys = [f"p{p:g}" for p in percentiles]
+
+    def describe(values):
+        return dict(zip(keys, np.percentile(values, percentiles, axis=0).T.tolist()))
+
+    result = {'percentiles': list(percentiles), 'samples': len(columns['energy_needed'])}
+    hours = np.percentile(columns['hours'], percentiles, axis=0)
+    result['charge_times'] = []
+    for column, amperage in enumerate(amperages):
+        power_kw = (voltage * amperage) / 1000
+        if max_power_kw is not None:
+            power_kw = min(power_kw, max_power_kw)
+        result['charge_times'].append({
+            'amperage': amperage,
+            'power_kw': power_kw,
+            'hours': dict(zip(keys, hours[:, column].tolist()))
+        })
+    for name, values in columns.items():
+        if name != 'hours':
+            result[name] = describe(values)
+    return result
+
+
+def calculate_distribution(battery_size, voltage, amperages, start_percentage, end_percentage,
+                           cost_per_kwh, curve=None, efficiency=EV_EFFICIENCY, max_power_kw=None,
+                           charger_efficiency=None, carbon_intensity=GRID_CARBON_INTENSITY,
+                           samples=DEFAULT_SAMPLES, seed=DEFAULT_SEED, uncertainty=None,
+                           percentiles=DEFAULT_PERCENTILES):
+    """Simulate and summarize in one call; see simulate() for the other arguments.
+
+    Args:
+        charger_efficiency (float): The charger type's efficiency when voltage
+            and max_power_kw already include its losses. They are taken back
+            out, and the sampled losses are centred on it instead, unless the
+            uncertainty overrides say otherwise.
+    """
+    if charger_efficiency is not None:
+        voltage = voltage / charger_efficiency
+        if max_power_kw is not None:
+            max_power_kw = max_power_kw / charger_efficiency
+        uncertainty = dict({'charger_efficiency': charger_efficiency}, **(uncertainty or {}))
+    columns = simulate(battery_size, voltage, amperages, start_percentage, end_percentage,
+                       cost_per_kwh, curve, efficiency, max_power_kw, carbon_intensity,
+                       samples, seed, uncertainty)
+    result = summarize_distribution(columns, amperages, voltage, max_power_kw, percentiles)
+    result['seed'] = seed
+    return result
@@ -0,0 +1,24 @@
+"""gunicorn settings, loaded automatically from the working directory."""
+import os
+
+import cache
+import metrics
+
+CALC_CACHE_FILE = os.environ.get('CALC_CACHE_FILE') or None
+CALC_CACHE_SNAPSHOT = os.environ.get('CALC_CACHE_SNAPSHOT') or None
+
+
+def on_starting(server):
+    # Per-worker metric files from a previous run would inflate the totals
+    metrics.clear_directory()
+    # Results from a previous run may come from older code; the first worker
+    # recreates the shared cache, warmed from the snapshot if there is one
+    cache.remove_cache_file(CALC_CACHE_FILE)
+
+
+def on_exit(server):
+    if CALC_CACHE_FILE and CALC_CACHE_SNAPSHOT:
+        shared = cache.SharedCache.from_file(CALC_CACHE_FILE)
+        if shared is not None:
+            saved = shared.save_snapshot(CALC_CACHE_SNAPSHOT)
+            server.log.info("Saved %d calculation cache entries to %s", saved, CALC_CACHE_SNAPSHOT)
@@ -0,0 +1,257 @@
+"""SQLite store of calculated and actual charging sessions.
+
+Requests never wait for the database: record() puts the session on an
+in-process queue and a background thread writes queued sessions in batches,
+one transaction per batch. The same transaction adds each batch to the
+daily and monthly rollup tables, so reports read a handful of pre-summed
+rows instead of scanning every session.
+
+The database runs in WAL mode with a busy timeout, so every gunicorn worker
+can keep its own writer thread on the same file; SQLite serializes the
+batch transactions and readers are never blocked.
+"""
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+SESSION_DB = os.environ.get('SESSION_DB') or None
+
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 0.5  # seconds a partial batch may wait
+MAX_QUEUE = 10000
+BUSY_TIMEOUT = 30  # seconds to wait for another worker's write
+
+KINDS = ('calculated', 'actual')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    started_at REAL NOT NULL,
+    kind TEXT NOT NULL,
+    vehicle_id TEXT NOT NULL DEFAULT '',
+    site TEXT NOT NULL DEFAULT '',
+    battery_size REAL,
+    start_percentage REAL,
+    end_percentage REAL,
+    energy_kwh REAL NOT NULL,
+    cost REAL NOT NULL,
+    co2_kg REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_vehicle ON sessions (vehicle_id, started_at);
+CREATE INDEX IF NOT EXISTS sessions_site ON sessions (site, started_at);
+CREATE INDEX IF NOT EXISTS sessions_time ON sessions (started_at);
+
+CREATE TABLE IF NOT EXISTS daily_rollups (
+    period TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    vehicle_id TEXT NOT NULL,
+    site TEXT NOT NULL,
+    sessions INTEGER NOT NULL,
+    energy_kwh REAL NOT NULL,
+    cost REAL NOT NULL,
+    co2_kg REAL NOT NULL,
+    PRIMARY KEY (period, kind, vehicle_id, site)
+);
+CREATE TABLE IF NOT EXISTS monthly_rollups (
+    period TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    vehicle_id TEXT NOT NULL,
+    site TEXT NOT NULL,
+    sessions INTEGER NOT NULL,
+    energy_kwh REAL NOT NULL,
+    cost REAL NOT NULL,
+    co2_kg REAL NOT NULL,
+    PRIMARY KEY (period, kind, vehicle_id, site)
+);
+'''
+
+INSERT_SESSION = '''
+INSERT INTO sessions (started_at, kind, vehicle_id, site, battery_size, start_percentage,
+                      end_percentage, energy_kwh, cost, co2_kg)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+UPSERT_ROLLUP = '''
+INSERT INTO {table} (period, kind, vehicle_id, site, sessions, energy_kwh, cost, co2_kg)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (period, kind, vehicle_id, site) DO UPDATE SET
+    sessions = sessions + excluded.sessions,
+    energy_kwh = energy_kwh + excluded.energy_kwh,
+    cost = cost + excluded.cost,
+    co2_kg = co2_kg + excluded.co2_kg
+'''
+
+ROLLUP_TABLES = {'day': 'daily_rollups', 'month': 'monthly_rollups'}
+
+
+def connect(path):
+    connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None,
+                                 check_same_thread=False)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    connection.row_factory = sqlite3.Row
+    return connection
+
+
+class SessionStore:
+    """Write-behind SQLite store with daily and monthly rollups.
+
+    Args:
+        path (str): Database file, created if missing
+        batch_size (int): Most sessions written per transaction
+        flush_interval (float): Seconds a partial batch waits for more sessions
+        max_queue (int): Sessions held in memory before new ones are dropped
+    """
+
+    def __init__(self, path, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL, max_queue=MAX_QUEUE):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+        self._queue = queue.Queue(max_queue)
+        self._writer_pid = None
+        self._start_lock = threading.Lock()
+        self._local = threading.local()
+        connection = connect(path)
+        with connection:
+            connection.executescript(SCHEMA)
+        connection.close()
+
+    def record(self, kind, energy_kwh, cost, co2_kg, started_at=None, vehicle_id=None, site=None,
+               battery_size=None, start_percentage=None, end_percentage=None):
+        """Queue one session for writing; returns False if the queue is full.
+
+        Args:
+            kind (str): 'calculated' or 'actual'
+            energy_kwh (float): Energy charged
+            cost (float): Cost including TVA
+            co2_kg (float): Grid emissions for the energy
+            started_at (datetime or float): Session start, now by default
+        """
+        if kind not in KINDS:
+            raise ValueError(f"Session kind must be one of {', '.join(KINDS)}")
+        if started_at is None:
+            started_at = time.time()
+        elif isinstance(started_at, datetime):
+            started_at = started_at.timestamp()
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait((float(started_at), kind, vehicle_id or '', site or '', battery_size,
+                                    start_percentage, end_percentage, float(energy_kwh), float(cost),
+                                    float(co2_kg)))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def _ensure_writer(self):
+        """Start this process's writer thread (again after a fork)."""
+        pid = os.getpid()
+        if self._writer_pid == pid:
+            return
+        with self._start_lock:
+            if self._writer_pid != pid:
+                threading.Thread(target=self._run, name='session-writer', daemon=True).start()
+                self._writer_pid = pid
+
+    def _run(self):
+        connection = connect(self.path)
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            try:
+                self._write(connection, batch)
+            except sqlite3.Error:
+                self.dropped += len(batch)  # keep the writer alive for later batches
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, connection, batch):
+        daily = {}
+        monthly = {}
+        for row in batch:
+            started = datetime.fromtimestamp(row[0], timezone.utc)
+            for totals, period in ((daily, started.strftime('%Y-%m-%d')), (monthly, started.strftime('%Y-%m'))):
+                key = (period, row[1], row[2], row[3])
+                sessions, energy, cost, co2 = totals.get(key, (0, 0.0, 0.0, 0.0))
+                totals[key] = (sessions + 1, energy + row[7], cost + row[8], co2 + row[9])
+
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany(INSERT_SESSION, batch)
+            for table, totals in (('daily_rollups', daily), ('monthly_rollups', monthly)):
+                connection.executemany(UPSERT_ROLLUP.format(table=table),
+                                       [key + values for key, values in totals.items()])
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        self.written += len(batch)
+
+    def flush(self):
+        """Block until every queued session has been written."""
+        if self._writer_pid == os.getpid():
+            self._queue.join()
+
+    def _reader(self):
+        if getattr(self._local, 'connection', None) is None:
+            self._local.connection = connect(self.path)
+        return self._local.connection
+
+    def sessions(self, vehicle_id=None, site=None, since=None, until=None, limit=100):
+        """Most recent sessions first, filtered by vehicle, site and epoch range."""
+        query, arguments = self._filters(vehicle_id, site, 'started_at', since, until)
+        rows = self._reader().execute(
+            f'SELECT * FROM sessions{query} ORDER BY started_at DESC LIMIT ?', arguments + [int(limit)]
+        )
+        return [dict(row) for row in rows]
+
+    def rollups(self, period='day', vehicle_id=None, site=None, since=None, until=None, kind=None):
+        """Totals per day ('YYYY-MM-DD') or month ('YYYY-MM') from the rollup tables.
+
+        since and until are inclusive period strings in the same format.
+        """
+        if period not in ROLLUP_TABLES:
+            raise ValueError("Period must be 'day' or 'month'")
+        query, arguments = self._filters(vehicle_id, site, 'period', since, until, kind)
+        rows = self._reader().execute(
+            'SELECT period, SUM(sessions) AS sessions, SUM(energy_kwh) AS energy_kwh, '
+            f'SUM(cost) AS cost, SUM(co2_kg) AS co2_kg FROM {ROLLUP_TABLES[period]}{query} '
+            'GROUP BY period ORDER BY period',
+            arguments
+        )
+        return [dict(row) for row in rows]
+
+    @staticmethod
+    def _filters(vehicle_id, site, time_column, since, until, kind=None):
+        clauses, arguments = [], []
+        for column, value in (('vehicle_id', vehicle_id), ('site', site), ('kind', kind)):
+            if value is not None:
+                clauses.append(f'{column} = ?')
+                arguments.append(value)
+        if since is not None:
+            clauses.append(f'{time_column} >= ?')
+            arguments.append(since)
+        if until is not None:
+            clauses.append(f'{time_column} <= ?')
+            arguments.append(until)
+        return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), arguments
+
+    def stats(self):
+        return {'queued': self._queue.qsize(), 'written': self.written, 'dropped': self.dropped}
+
+
+STORE = SessionStore(SESSION_DB) if SESSION_DB else None
+if STORE is not None:
+    atexit.register(STORE.flush)
@@ -0,0 +1,212 @@
+"""Inverse charging queries for a deadline and a budget.
+
+Instead of asking how long a charge takes, these answer:
+
+- minimum_current: the lowest current that reaches the target by the deadline
+- latest_start: the latest time charging can start and still make it
+- reachable_percentage: how full the battery gets by the deadline
+
+Power and time follow calculate_charging_time's model. With a linear or a
+relative charge curve, time is inversely proportional to power, so the
+required current has a closed form. Absolute curves use bisection over whole
+amps. A budget (€ including TVA) is checked against a flat price, or against
+a TimeOfUseTariff, whose cost is piecewise linear in the start time. The
+grid energy is priced, so a charger's losses are paid for. Each query costs
+a few table lookups, so it can follow a slider as it moves.
+
+Times are hours from the start of the tariff series (midnight of the
+plug-in day for daily profiles), with the deadline on the same scale.
+"""
+import math
+
+from calculator import TVA_MULTIPLIER, validate_percentages
+from curves import LINEAR
+from scheduler import DEFAULT_VOLTAGE, MAX_CURRENT, MIN_CURRENT
+
+
+def charger_power(voltage, amperage, max_power_kw=None):
+    """Charging power in kW, capped by the vehicle's onboard charger."""
+    power_kw = voltage * amperage / 1000
+    if max_power_kw is not None:
+        power_kw = min(power_kw, max_power_kw)
+    return power_kw
+
+
+def _session(battery_size, start_percentage, end_percentage, power_kw, curve):
+    """Energy and hours for a session; the tariff sees the average power."""
+    energy_kwh = battery_size * (end_percentage - start_percentage) / 100
+    hours = curve.charging_hours(battery_size, power_kw, start_percentage, end_percentage)
+    return float(energy_kwh), float(hours)
+
+
+def _session_cost(energy_kwh, hours, start_hour, cost_per_kwh, tariff, charger_efficiency=1.0):
+    """Cost of the grid energy for a session that stores energy_kwh in the battery."""
+    grid_kwh = energy_kwh / charger_efficiency
+    if tariff is None:
+        return grid_kwh * cost_per_kwh * TVA_MULTIPLIER
+    if energy_kwh <= 0:
+        return 0.0
+    return tariff.session_cost(start_hour, grid_kwh / hours, grid_kwh)
+
+
+def minimum_current(battery_size, start_percentage, end_percentage, plug_in_hour, deadline_hour,
+                    voltage=DEFAULT_VOLTAGE, curve=None, max_power_kw=None, cost_per_kwh=0.0,
+                    tariff=None, budget=None, max_current=MAX_CURRENT, charger_efficiency=1.0):
+    """Lowest whole-amp current that reaches the target by the deadline within budget.
+
+    With a time-of-use tariff the session may start later than plug-in, at
+    its cheapest start; a higher current can then be cheaper because it
+    fits into a cheaper window.
+
+    Args:
+        battery_size (float): Battery capacity in kWh
+        start_percentage (float): State of charge at plug-in
+        end_percentage (float): Target state of charge
+        plug_in_hour (float): When the car is plugged in
+        deadline_hour (float): When the car must be charged
+        voltage (float): Charger voltage
+        curve (ChargeCurve): Charge curve, linear by default
+        max_power_kw (float): Optional vehicle onboard charger limit
+        cost_per_kwh (float): Flat price per kWh before TVA, when there is no tariff
+        tariff (TimeOfUseTariff): Optional time-of-use prices
+        budget (float): Optional most the session may cost, including TVA
+        max_current (float): Highest current the charger offers
+        charger_efficiency (float): Share of the grid energy stored in the
+            battery, when voltage and max_power_kw already include the losses
+
+    Returns:
+        dict: 'feasible', 'limit' (what rules out a lower current, or what
+        makes the target unreachable: 'minimum_current', 'deadline' or
+        'budget'), and when feasible 'amperage', 'power_kw', 'hours',
+        'start_hour' and 'cost'
+    """
+    validate_percentages(start_percentage, end_percentage)
+    curve = curve or LINEAR
+    available = deadline_hour - plug_in_hour
+    if available <= 0:
+        raise ValueError("Deadline must be after plug-in")
+
+    # Lowest current that meets the deadline
+    if curve.is_linear or curve.relative:
+        hours_per_kw = curve.charging_hours(battery_size, 1.0, start_percentage, end_percentage)
+        needed_kw = hours_per_kw / available
+        if max_power_kw is not None and needed_kw > max_power_kw + 1e-9:
+            return {'feasible': False, 'limit': 'deadline'}
+        amperage = max(MIN_CURRENT, math.ceil(needed_kw * 1000 / voltage - 1e-9))
+    else:
+        def fast_enough(amps):
+            power_kw = charger_power(voltage, amps, max_power_kw)
+            return _session(battery_size, start_percentage, end_percentage, power_kw, curve)[1] <= available + 1e-9
+
+        low, high = MIN_CURRENT, int(max_current)
+        if not fast_enough(high):
+            return {'feasible': False, 'limit': 'deadline'}
+        while low < high:
+            middle = (low + high) // 2
+            if fast_enough(middle):
+                high = middle
+            else:
+                low = middle + 1
+        amperage = low
+    if amperage > max_current:
+        return {'feasible': False, 'limit': 'deadline'}
+    limit = 'deadline' if amperage > MIN_CURRENT else 'minimum_current'
+
+    # Raise the current until the session also fits the budget
+    while amperage <= max_current:
+        power_kw = charger_power(voltage, amperage, max_power_kw)
+        energy_kwh, hours = _session(battery_size, start_percentage, end_percentage, power_kw, curve)
+        start_hour = plug_in_hour
+        if tariff is not None and energy_kwh > 0:
+            grid_kwh = energy_kwh / charger_efficiency
+            start_hour, cost = tariff.cheapest_start(grid_kwh / hours, grid_kwh, plug_in_hour, deadline_hour)
+        else:
+            cost = _session_cost(energy_kwh, hours, start_hour, cost_per_kwh, tariff, charger_efficiency)
+        if budget is None or cost <= budget + 1e-9:
+            return {'feasible': True, 'limit': limit, 'amperage': amperage, 'power_kw': power_kw,
+                    'hours': hours, 'start_hour': start_hour, 'cost': cost}
+        if tariff is None or (max_power_kw is not None and power_kw >= max_power_kw):
+            break  # the cost can no longer change
+        amperage += 1
+        limit = 'budget'
+    return {'feasible': False, 'limit': 'budget'}
+
+
+def latest_start(battery_size, start_percentage, end_percentage, amperage, plug_in_hour, deadline_hour,
+                 voltage=DEFAULT_VOLTAGE, curve=None, max_power_kw=None, cost_per_kwh=0.0,
+                 tariff=None, budget=None, charger_efficiency=1.0):
+    """Latest time charging can start and still reach the target by the deadline within budget.
+
+    Args are as for minimum_current(), with the charging 'amperage'.
+
+    Returns:
+        dict: 'feasible', 'limit' ('deadline' or 'budget') and when feasible
+        'start_hour', 'end_hour', 'hours' and 'cost'
+    """
+    validate_percentages(start_percentage, end_percentage)
+    curve = curve or LINEAR
+    power_kw = charger_power(voltage, amperage, max_power_kw)
+    energy_kwh, hours = _session(battery_size, start_percentage, end_percentage, power_kw, curve)
+    start_hour = deadline_hour - hours
+    if start_hour < plug_in_hour - 1e-9:
+        return {'feasible': False, 'limit': 'deadline'}
+    limit = 'deadline'
+
+    if tariff is not None and energy_kwh > 0:
+        grid_kwh = energy_kwh / charger_efficiency
+        if budget is None:
+            cost = tariff.session_cost(start_hour, grid_kwh / hours, grid_kwh)
+        else:
+            found = tariff.latest_affordable_start(grid_kwh / hours, grid_kwh, budget,
+                                                   plug_in_hour, deadline_hour)
+            if found is None:
+                return {'feasible': False, 'limit': 'budget'}
+            if found[0] < start_hour - 1e-9:
+                limit = 'budget'
+            start_hour, cost = found
+    else:
+        cost = _session_cost(energy_kwh, hours, start_hour, cost_per_kwh, tariff, charger_efficiency)
+        if budget is not None and cost > budget + 1e-9:
+            return {'feasible': False, 'limit': 'budget'}
+    return {'feasible': True, 'limit': limit, 'start_hour': start_hour, 'end_hour': start_hour + hours,
+            'hours': hours, 'cost': cost}
+
+
+def reachable_percentage(battery_size, start_percentage, amperage, plug_in_hour, deadline_hour,
+                         voltage=DEFAULT_VOLTAGE, curve=None, max_power_kw=None, cost_per_kwh=0.0,
+                         tariff=None, budget=None, charger_efficiency=1.0):
+    """Highest state of charge reached by the deadline within budget, charging from plug-in.
+
+    Args are as for minimum_current(), with the charging 'amperage'.
+
+    Returns:
+        dict: 'end_percentage', 'limit' ('deadline', 'budget' or 'full'),
+        'energy_kwh', 'hours' and 'cost'
+    """
+    if not 0 <= start_percentage <= 100:
+        raise ValueError("Percentages must be between 0 and 100")
+    curve = curve or LINEAR
+    power_kw = charger_power(voltage, amperage, max_power_kw)
+    available = max(deadline_hour - plug_in_hour, 0.0)
+    end_percentage = curve.reachable_percentage(battery_size, power_kw, start_percentage, available)
+    limit = 'full' if end_percentage >= 100 - 1e-9 else 'deadline'
+
+    if budget is not None:
+        if tariff is None:
+            # The budget buys grid energy; the charger's losses never reach the battery
+            affordable_kwh = budget / (cost_per_kwh * TVA_MULTIPLIER) if cost_per_kwh > 0 else math.inf
+            budget_percentage = start_percentage + affordable_kwh * charger_efficiency / battery_size * 100
+        else:
+            # Price the curve's average power up to the deadline-limited end, then
+            # shorten the session at that power until it fits the budget
+            energy_kwh, hours = _session(battery_size, start_percentage, end_percentage, power_kw, curve)
+            average_kw = energy_kwh / hours if hours > 0 else power_kw
+            budget_hours = tariff.affordable_hours(plug_in_hour, average_kw / charger_efficiency, budget)
+            budget_percentage = start_percentage + budget_hours * average_kw / battery_size * 100
+        if budget_percentage < end_percentage - 1e-9:
+            end_percentage = budget_percentage
+            limit = 'budget'
+
+    energy_kwh, hours = _session(battery_size, start_percentage, end_percentage, power_kw, curve)
+    return {'end_percentage': float(end_percentage), 'limit': limit, 'energy_kwh': energy_kwh, 'hours': hours,
+            'cost': _session_cost(energy_kwh, hours, plug_in_hour, cost_per_kwh, tariff, charger_efficiency)}
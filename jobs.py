@@ -0,0 +1,221 @@
+"""Background jobs for heavy requests, with admission control.
+
+Endpoints decide whether a request is heavy (a large Monte Carlo run, a big
+site schedule). Cheap requests, including every form submission, run inline
+as before. Heavy ones are submitted here and the endpoint answers 202 with a
+job ID straight away, so a sync gunicorn worker is never tied up by one.
+
+Each worker process runs jobs on a small thread pool and accepts only a
+bounded number of pending jobs. When that is full, submit() raises QueueFull
+and the endpoint answers 429 with a Retry-After estimate instead of queueing
+without limit.
+
+Job status and results are JSON files in a directory shared by every worker
+on the host, so a client can poll whichever worker it reaches. Finished
+records older than the TTL are removed as new jobs arrive. Each record names the process
+running it. A worker that is restarted takes its queue with it, so an
+unfinished record whose process has gone is reported as failed.
+"""
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+DEFAULT_JOB_DIR = os.path.join(tempfile.gettempdir(), 'ev-charge-jobs')
+DEFAULT_WORKERS = 1  # threads per gunicorn worker
+DEFAULT_QUEUE_LIMIT = 4  # queued and running jobs per gunicorn worker
+DEFAULT_TTL = 3600  # seconds results are kept
+
+# Assumed job length until one has finished, for Retry-After
+DEFAULT_RUN_SECONDS = 1.0
+
+STATUSES = ('queued', 'running', 'done', 'failed')
+JOB_ID_PATTERN = re.compile(r'[0-9a-f]{32}')
+
+JOBS_SUBMITTED = metrics.REGISTRY.counter('ev_jobs_submitted_total', "Heavy requests accepted as background jobs")
+JOBS_REJECTED = metrics.REGISTRY.counter('ev_jobs_rejected_total', "Heavy requests rejected with 429")
+JOBS_FINISHED = {
+    status: metrics.REGISTRY.counter('ev_jobs_finished_total', "Background jobs finished", status=status)
+    for status in ('done', 'failed')
+}
+JOB_WAIT = metrics.REGISTRY.histogram('ev_job_wait_seconds', "Time jobs spend queued before running")
+JOB_RUN = metrics.REGISTRY.histogram('ev_job_run_seconds', "Time jobs spend running")
+
+
+def process_alive(pid):
+    """Whether a process with this ID is still running on the host."""
+    if pid is None:
+        return True  # records written before the pid was kept
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # it exists but belongs to another user
+    return True
+
+
+class QueueFull(Exception):
+    """Raised when a worker already has its limit of pending jobs.
+
+    Attributes:
+        retry_after (int): Seconds the client should wait before retrying
+    """
+
+    def __init__(self, retry_after):
+        super().__init__("Too many heavy requests are queued, please retry later")
+        self.retry_after = retry_after
+
+
+class JobQueue:
+    """Bounded background executor with results stored as files.
+
+    Args:
+        directory (str): Where job files are kept, shared by all workers
+        workers (int): Jobs run at once in each process
+        max_pending (int): Queued plus running jobs allowed in each process
+        ttl (float): Seconds finished job files are kept
+    """
+
+    def __init__(self, directory=DEFAULT_JOB_DIR, workers=DEFAULT_WORKERS, max_pending=DEFAULT_QUEUE_LIMIT,
+                 ttl=DEFAULT_TTL):
+        self.directory = directory
+        self.workers = workers
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.pending = 0
+        self.run_seconds = DEFAULT_RUN_SECONDS
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _path(self, job_id):
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def _write(self, record):
+        """Replace a job's file atomically, so readers never see half a record."""
+        temporary = f"{self._path(record['id'])}.{os.getpid()}.tmp"
+        with open(temporary, 'w') as f:
+            json.dump(record, f)
+        os.replace(temporary, self._path(record['id']))
+
+    def retry_after(self):
+        """Seconds until this process is likely to have room for another job."""
+        return max(1, math.ceil(self.run_seconds * self.pending / self.workers))
+
+    def submit(self, kind, function, *args):
+        """Queue function(*args) and return the new job's ID.
+
+        Raises:
+            QueueFull: If this process already has max_pending jobs
+        """
+        with self._lock:
+            if self._pid != os.getpid():  # threads do not survive a fork
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='job')
+                self._pid = os.getpid()
+                self.pending = 0
+            if self.pending >= self.max_pending:
+                JOBS_REJECTED.inc()
+                raise QueueFull(self.retry_after())
+            self.pending += 1
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self.remove_expired()
+            record = {'id': uuid.uuid4().hex, 'kind': kind, 'status': 'queued', 'submitted_at': time.time(),
+                      'pid': os.getpid()}
+            self._write(record)
+            self._executor.submit(self._run, record, function, args)
+        except Exception:
+            with self._lock:
+                self.pending -= 1  # the job never reached the executor
+            raise
+        JOBS_SUBMITTED.inc()
+        return record['id']
+
+    def _run(self, record, function, args):
+        started = time.time()
+        JOB_WAIT.observe(started - record['submitted_at'])
+        try:
+            self._write(dict(record, status='running', started_at=started))
+            try:
+                record = dict(record, status='done', started_at=started, result=function(*args))
+            except Exception as exc:  # reported to the client instead of a 500
+                record = dict(record, status='failed', started_at=started, error=str(exc))
+        finally:  # free the slot even if the running record could not be written
+            finished = time.time()
+            JOB_RUN.observe(finished - started)
+            with self._lock:
+                self.pending -= 1
+                # Moving average of job length for Retry-After
+                self.run_seconds = 0.8 * self.run_seconds + 0.2 * (finished - started)
+        record['finished_at'] = finished
+        try:
+            self._write(record)
+        except (TypeError, ValueError) as exc:
+            record = dict(record, status='failed', error=f"Result could not be stored: {exc}")
+            record.pop('result', None)
+            self._write(record)
+        JOBS_FINISHED[record['status']].inc()
+
+    def get(self, job_id):
+        """A job's record, or None if it is unknown or has expired.
+
+        Unfinished jobs of a process that has exited are marked failed.
+        """
+        if not JOB_ID_PATTERN.fullmatch(job_id):
+            return None
+        try:
+            with open(self._path(job_id)) as f:
+                record = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if record['status'] in ('queued', 'running') and not process_alive(record.get('pid')):
+            record = dict(record, status='failed', finished_at=time.time(),
+                          error="The worker running this job restarted, please submit it again")
+            self._write(record)
+        return record
+
+    def remove_expired(self):
+        """Delete finished job files, and leftover temporary files, older than the TTL.
+
+        Queued and running jobs are kept however long they wait. Those of a
+        process that has exited are marked failed by get() and removed then.
+        """
+        cutoff = time.time() - self.ttl
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) >= cutoff:
+                    continue
+                if name.endswith('.json'):
+                    record = self.get(name[:-len('.json')])
+                    if record is not None and record['status'] not in ('done', 'failed'):
+                        continue
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # removed by another worker
+
+    def stats(self):
+        """Jobs in each state across all workers, plus this process's queue."""
+        counts = dict.fromkeys(STATUSES, 0)
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith('.json'):
+                    record = self.get(name[:-len('.json')])
+                    if record is not None:
+                        counts[record['status']] += 1
+        return {
+            'jobs': counts,
+            'pending': self.pending,
+            'max_pending': self.max_pending,
+            'workers': self.workers,
+            'average_run_seconds': self.run_seconds,
+        }
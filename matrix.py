@@ -0,0 +1,231 @@
+"""Vehicle x charger comparison matrix.
+
+Every catalog vehicle is compared on every charger in CHARGERS in one
+batched NumPy pass. Each column is a charger type from chargers.py at a
+given current. The power reaching the battery comes from power_table():
+the charger's supply, capped by the vehicle's onboard AC charger or DC limit,
+less the charger's losses. Charging time comes from each vehicle's charge
+curve, evaluated once per curve because the state-of-charge window is shared.
+Sorting, filtering and paging then work on index arrays, so a page of a
+200 x 20 matrix never touches the other rows.
+"""
+import csv
+import io
+
+import numpy as np
+
+from calculator import GRID_CARBON_INTENSITY, TVA_MULTIPLIER, validate_percentages
+from chargers import charger_currents, get_charger, power_table
+from curves import get_curve
+
+
+def charger_column(column_id, label, charger_type, current=None):
+    """A matrix column for a charger type, with its kind and rated power for display."""
+    charger = get_charger(charger_type)
+    current = charger_currents(charger, (current or charger['max_current'],))[0]
+    power_kw = charger['phases'] * charger['voltage'] * current * charger['power_factor'] / 1000
+    return {'id': column_id, 'label': label, 'type': charger_type, 'current': current,
+            'kind': charger['kind'], 'power_kw': round(power_kw, 2)}
+
+
+# Chargers compared: AC single-phase 230 V and three-phase 400 V at common currents, and DC
+CHARGERS = (
+    charger_column('ac1-6', '6A 1-phase', 'ac1', 6),
+    charger_column('ac1-10', '10A 1-phase', 'ac1', 10),
+    charger_column('ac1-16', '16A 1-phase', 'ac1', 16),
+    charger_column('ac1-32', '32A 1-phase', 'ac1', 32),
+    charger_column('ac3-6', '6A 3-phase', 'ac3', 6),
+    charger_column('ac3-10', '10A 3-phase', 'ac3', 10),
+    charger_column('ac3-16', '16A 3-phase', 'ac3', 16),
+    charger_column('ac3-32', '32A 3-phase', 'ac3', 32),
+    charger_column('dc-50', '50 kW DC', 'dc-50'),
+    charger_column('dc-100', '100 kW DC', 'dc-100'),
+    charger_column('dc-150', '150 kW DC', 'dc-150'),
+    charger_column('dc-350', '350 kW DC', 'dc-350'),
+)
+
+SORT_KEYS = ('name', 'usable_kwh', 'energy_kwh', 'range_km')
+
+# Vehicles x chargers values that can be sorted on for one charger column
+CELL_KEYS = ('hours', 'cost', 'emissions_kg')
+DEFAULT_PER_PAGE = 25
+MAX_PER_PAGE = 200
+
+
+def hours_per_kw(curve_names, start_percentage, end_percentage):
+    """For each vehicle, charging hours per kWh of capacity at 1 kW of charger power.
+
+    Only valid for linear and relative curves, where time scales with 1/power.
+    """
+    factors = {}
+    for name in set(curve_names):
+        curve = get_curve(name)
+        if curve.is_linear or curve.relative:
+            factors[name] = curve.charging_hours(1.0, 1.0, start_percentage, end_percentage)
+        else:
+            factors[name] = np.nan
+    return np.array([factors[name] for name in curve_names])
+
+
+def compute_matrix(catalog, start_percentage, end_percentage, cost_per_kwh, dc_cost_per_kwh=None,
+                   carbon_intensity=GRID_CARBON_INTENSITY, chargers=CHARGERS):
+    """Charging time and cost for every catalog vehicle on every charger.
+
+    Args:
+        catalog (VehicleCatalog): Vehicles to compare
+        start_percentage (float): Starting battery percentage
+        end_percentage (float): Target battery percentage
+        cost_per_kwh (float): AC electricity cost per kWh before TVA
+        dc_cost_per_kwh (float): DC charging cost per kWh before TVA, the AC cost if None
+        carbon_intensity (float): Grid kg CO2/kWh
+        chargers (sequence): Charger descriptions, as in CHARGERS
+
+    Returns:
+        dict: 'chargers', per-vehicle columns ('ids', 'names', 'usable_kwh',
+        'energy_kwh', 'range_km') and vehicles x chargers 'power_kw',
+        'hours', 'cost' and 'emissions_kg' arrays (NaN where a vehicle
+        cannot use a charger). Cost and emissions are for the grid energy,
+        so they include each charger's losses.
+    """
+    validate_percentages(start_percentage, end_percentage)
+    if dc_cost_per_kwh is None:
+        dc_cost_per_kwh = cost_per_kwh
+    usable = catalog.usable_kwh
+    power = power_table(chargers, catalog.onboard_charger_kw, catalog.dc_max_kw)
+
+    hours = usable[:, None] * hours_per_kw(catalog.charge_curves, start_percentage, end_percentage)[:, None] / power
+    # Absolute curves depend on the power itself, so evaluate them cell by cell
+    for row in np.flatnonzero(np.isnan(hours).all(axis=1) & ~np.isnan(power).all(axis=1)):
+        curve = get_curve(catalog.charge_curves[row])
+        for column in np.flatnonzero(~np.isnan(power[row])):
+            hours[row, column] = curve.charging_hours(usable[row], power[row, column],
+                                                      start_percentage, end_percentage)
+
+    energy = usable * (end_percentage - start_percentage) / 100
+    price = np.array([dc_cost_per_kwh if charger['kind'] == 'dc' else cost_per_kwh for charger in chargers])
+    # The grid energy is paid for and emitted, including each charger's losses
+    charger_efficiency = np.array([get_charger(charger['type'])['efficiency'] for charger in chargers])
+    grid_energy = energy[:, None] / charger_efficiency
+    cost = grid_energy * price * TVA_MULTIPLIER
+    return {
+        'chargers': list(chargers),
+        'ids': list(catalog.ids),
+        'names': [f"{make} {model} {trim}".strip()
+                  for make, model, trim in zip(catalog.makes, catalog.models, catalog.trims)],
+        'makes': list(catalog.makes),
+        'usable_kwh': usable,
+        'energy_kwh': energy,
+        'range_km': energy / catalog.efficiency_kwh_per_km,
+        'power_kw': power,
+        'hours': hours,
+        'cost': np.where(np.isnan(power), np.nan, cost),
+        'emissions_kg': np.where(np.isnan(power), np.nan, grid_energy * carbon_intensity),
+    }
+
+
+def select_rows(matrix, query=None, make=None, min_range_km=None, dc_only=False, sort='name',
+                descending=False):
+    """Row indexes matching the filters, in sort order.
+
+    Args:
+        query (str): Case-insensitive text that must appear in the vehicle name or ID
+        make (str): Exact make
+        min_range_km (float): Smallest range added by the charge
+        dc_only (bool): Only vehicles with DC fast charging
+        sort (str): One of SORT_KEYS, or one of CELL_KEYS for a charger, as 'hours:<charger id>'
+        descending (bool): Reverse the order; rows without a value always come last
+
+    Returns:
+        ndarray: Indexes into the matrix rows
+    """
+    rows = len(matrix['ids'])
+    keep = np.ones(rows, dtype=bool)
+    if query:
+        needle = query.lower()
+        keep &= np.array([needle in name.lower() or needle in vehicle_id
+                          for name, vehicle_id in zip(matrix['names'], matrix['ids'])], dtype=bool)
+    if make:
+        keep &= np.array([vehicle_make.lower() == make.lower() for vehicle_make in matrix['makes']], dtype=bool)
+    if min_range_km is not None:
+        keep &= matrix['range_km'] >= min_range_km
+    if dc_only:
+        dc_columns = [index for index, charger in enumerate(matrix['chargers']) if charger['kind'] == 'dc']
+        keep &= ~np.isnan(matrix['power_kw'][:, dc_columns]).all(axis=1)
+
+    if sort == 'name':
+        values = np.array([name.lower() for name in matrix['names']], dtype=object)
+        order = sorted(range(rows), key=values.__getitem__, reverse=descending)
+        return np.array([row for row in order if keep[row]], dtype=np.int64)
+
+    if ':' in sort:
+        column_name, charger_id = sort.split(':', 1)
+        columns = [charger['id'] for charger in matrix['chargers']]
+        if column_name not in CELL_KEYS or charger_id not in columns:
+            raise ValueError(f"Unknown sort column: {sort}")
+        values = matrix[column_name][:, columns.index(charger_id)]
+    elif sort in SORT_KEYS:
+        values = matrix[sort]
+    else:
+        raise ValueError(f"Unknown sort column: {sort}")
+
+    values = np.where(keep, values, np.nan)
+    order = np.argsort(-values if descending else values, kind='stable')  # NaN sorts last
+    return order[keep[order]]
+
+
+def page(matrix, indexes, number=1, per_page=DEFAULT_PER_PAGE):
+    """One page of rows as dicts, plus paging details.
+
+    Returns:
+        dict: 'rows' (each with the per-vehicle values and a 'cells' list of
+        power_kw/hours/cost/emissions_kg per charger, None where unavailable), 'page',
+        'pages', 'per_page' and 'total'
+    """
+    per_page = max(1, min(int(per_page), MAX_PER_PAGE))
+    total = len(indexes)
+    pages = max(1, -(-total // per_page))
+    number = max(1, min(int(number), pages))
+    selected = indexes[(number - 1) * per_page:number * per_page]
+
+    def values(array):
+        return [[None if np.isnan(value) else value for value in row] for row in array[selected].tolist()]
+
+    power, hours, cost = values(matrix['power_kw']), values(matrix['hours']), values(matrix['cost'])
+    emissions = values(matrix['emissions_kg'])
+    rows = []
+    for position, row in enumerate(selected.tolist()):
+        rows.append({
+            'id': matrix['ids'][row],
+            'name': matrix['names'][row],
+            'usable_kwh': float(matrix['usable_kwh'][row]),
+            'energy_kwh': float(matrix['energy_kwh'][row]),
+            'range_km': float(matrix['range_km'][row]),
+            'cells': [
+                {'power_kw': p, 'hours': h, 'cost': c, 'emissions_kg': e}
+                for p, h, c, e in zip(power[position], hours[position], cost[position], emissions[position])
+            ],
+        })
+    return {'rows': rows, 'page': number, 'pages': pages, 'per_page': per_page, 'total': total}
+
+
+def write_csv(matrix, indexes):
+    """Yield a CSV header and one line per selected row, with hours, cost and emissions per charger."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    charger_ids = [charger['id'] for charger in matrix['chargers']]
+    writer.writerow(['id', 'name', 'usable_kwh', 'energy_kwh', 'range_km']
+                    + [f"hours:{charger_id}" for charger_id in charger_ids]
+                    + [f"cost:{charger_id}" for charger_id in charger_ids]
+                    + [f"emissions_kg:{charger_id}" for charger_id in charger_ids])
+    for row in indexes.tolist():
+        writer.writerow(
+            [matrix['ids'][row], matrix['names'][row]]
+            + [round(float(matrix[name][row]), 4)
+               for name in ('usable_kwh', 'energy_kwh', 'range_km')]
+            + ['' if np.isnan(value) else round(value, 4) for value in matrix['hours'][row].tolist()]
+            + ['' if np.isnan(value) else round(value, 2) for value in matrix['cost'][row].tolist()]
+            + ['' if np.isnan(value) else round(value, 4) for value in matrix['emissions_kg'][row].tolist()]
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
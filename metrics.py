@@ -0,0 +1,295 @@
+"""Low-overhead counters and histograms exported in Prometheus text format.
+
+Every metric owns a fixed range of float64 slots in one per-process buffer.
+With METRICS_DIR set, the buffer is a memory-mapped file named after the
+process ID, and /metrics sums the files of every process in the directory,
+so totals are correct no matter which gunicorn worker serves the scrape.
+Files of exited workers are kept so counters never go backwards; clear the
+directory when the server starts (gunicorn.conf.py does this).
+
+Set METRICS_ENABLED=0 to turn instrumentation off: metrics become no-op
+objects and timed() returns the undecorated function.
+"""
+import functools
+import mmap
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+import numpy as np
+
+METRICS_DIR = os.environ.get('METRICS_DIR') or None
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1').lower() not in ('0', 'false', 'no', 'off')
+
+# Latency buckets in seconds, from 50µs up to 10s
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+FILE_SUFFIX = '.metrics'
+
+
+def format_value(value):
+    value = float(value)
+    if value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+class Counter:
+    """Monotonically increasing count."""
+
+    kind = 'counter'
+
+    def __init__(self, registry, name, labels, slot):
+        self._registry = registry
+        self.name = name
+        self.labels = labels
+        self.slot = slot
+        self.size = 1
+
+    def inc(self, amount=1):
+        self._registry.add(self.slot, amount)
+
+    def samples(self, values):
+        yield self.name, self.labels, values[self.slot]
+
+
+class Histogram:
+    """Distribution of observed values over fixed buckets.
+
+    Slots hold the per-bucket counts (the last one is +Inf), then the sum
+    and the count; buckets are made cumulative when exported.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, registry, name, labels, slot, buckets):
+        self._registry = registry
+        self.name = name
+        self.labels = labels
+        self.slot = slot
+        self.buckets = tuple(buckets)
+        self.size = len(self.buckets) + 3
+
+    def observe(self, value):
+        self._registry.observe(self.slot, bisect_left(self.buckets, value), len(self.buckets) + 1, value)
+
+    def time(self):
+        """Context manager that observes the seconds spent inside it."""
+        return _Timer(self)
+
+    def samples(self, values):
+        cumulative = 0.0
+        for index, bound in enumerate(self.buckets + (float('inf'),)):
+            cumulative += values[self.slot + index]
+            le = '+Inf' if index == len(self.buckets) else format_value(bound)
+            yield self.name + '_bucket', self.labels + (('le', le),), cumulative
+        yield self.name + '_sum', self.labels, values[self.slot + len(self.buckets) + 1]
+        yield self.name + '_count', self.labels, values[self.slot + len(self.buckets) + 2]
+
+
+class _Timer:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class StageTimer:
+    """Observe the time between successive mark() calls.
+
+    Args:
+        histograms (dict): Histogram for each stage name
+    """
+
+    __slots__ = ('histograms', 'last')
+
+    def __init__(self, histograms):
+        self.histograms = histograms
+        self.last = time.perf_counter()
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.histograms[stage].observe(now - self.last)
+        self.last = now
+
+
+class _NullMetric:
+    """Stands in for every metric type when instrumentation is disabled."""
+
+    def inc(self, amount=1):
+        pass
+
+    def observe(self, value):
+        pass
+
+    def mark(self, stage):
+        pass
+
+    def time(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+NULL_METRIC = _NullMetric()
+
+
+class MetricsRegistry:
+    """Allocates metric slots and renders them as Prometheus text.
+
+    All metrics must be registered before the first observation, so that
+    every process built from the same code has the same slot layout.
+
+    Args:
+        directory (str): Where per-process buffers are shared, or None to keep
+            them in memory (single-process servers and tests)
+        enabled (bool): False makes every metric a no-op
+    """
+
+    def __init__(self, directory=None, enabled=True):
+        self.directory = directory
+        self.enabled = enabled
+        self.metrics = []
+        self.help = {}
+        self._size = 0
+        self._values = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, help_text, labels, *args):
+        if not self.enabled:
+            return NULL_METRIC
+        if self._values is not None:
+            raise RuntimeError(f"Metric {name} registered after the first observation")
+        metric = cls(self, name, tuple(labels.items()), self._size, *args)
+        self._size += metric.size
+        self.metrics.append(metric)
+        self.help.setdefault(name, (cls.kind, help_text))
+        return metric
+
+    def counter(self, name, help_text, **labels):
+        return self._register(Counter, name, help_text, labels)
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS, **labels):
+        return self._register(Histogram, name, help_text, labels, buckets)
+
+    def stage_timer(self, histograms):
+        """Start a StageTimer, or return a no-op when disabled."""
+        return StageTimer(histograms) if self.enabled else NULL_METRIC
+
+    def timed(self, histogram, function):
+        """Wrap function so each call's duration is observed by histogram."""
+        if not self.enabled:
+            return function
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+        return wrapper
+
+    def _path(self, pid):
+        return os.path.join(self.directory, f"{pid}{FILE_SUFFIX}")
+
+    def _buffer(self):
+        """This process's slots, (re)opened after a fork."""
+        pid = os.getpid()
+        if self._pid != pid:
+            size = max(self._size, 1)
+            if self.directory is None:
+                self._values = memoryview(array('d', bytes(size * 8)))
+            else:
+                os.makedirs(self.directory, exist_ok=True)
+                with open(self._path(pid), 'w+b') as f:
+                    f.truncate(size * 8)
+                    self._values = memoryview(mmap.mmap(f.fileno(), size * 8)).cast('d')
+            self._pid = pid
+        return self._values
+
+    def add(self, slot, amount):
+        with self._lock:
+            self._buffer()[slot] += amount
+
+    def observe(self, slot, bucket, sum_offset, value):
+        with self._lock:
+            values = self._buffer()
+            values[slot + bucket] += 1
+            values[slot + sum_offset] += value
+            values[slot + sum_offset + 1] += 1
+
+    def collect(self):
+        """Slot values summed over every process sharing the directory."""
+        with self._lock:
+            own = np.array(self._buffer(), dtype=np.float64)
+        if self.directory is None:
+            return own
+        total = np.zeros(len(own))
+        for name in os.listdir(self.directory):
+            if not name.endswith(FILE_SUFFIX):
+                continue
+            values = np.fromfile(os.path.join(self.directory, name), dtype=np.float64)
+            if len(values) == len(total):  # skip files written by a different layout
+                total += values
+        return total
+
+    def render(self):
+        """Prometheus text exposition format for all registered metrics."""
+        values = self.collect()
+        lines = []
+        for name, (kind, help_text) in self.help.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for metric in self.metrics:
+                if metric.name == name:
+                    for sample, labels, value in metric.samples(values):
+                        lines.append(f"{sample}{format_labels(labels)} {format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+def render_samples(samples):
+    """Prometheus text for values counted outside the registry.
+
+    Args:
+        samples (iterable): (name, kind, help text, value) tuples
+    """
+    lines = []
+    for name, kind, help_text, value in samples:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"{name} {format_value(value)}")
+    return '\n'.join(lines) + '\n'
+
+
+def clear_directory(directory=METRICS_DIR):
+    """Remove per-process files left by a previous server run."""
+    if not directory or not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        if name.endswith(FILE_SUFFIX):
+            os.remove(os.path.join(directory, name))
+
+
+REGISTRY = MetricsRegistry(METRICS_DIR, METRICS_ENABLED)
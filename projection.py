@@ -0,0 +1,205 @@
+"""Year-long projection of daily charging energy, cost and emissions.
+
+Every day of the year is one element of a NumPy array: kilometres driven
+follow a weekday pattern, consumption rises in winter, and the electricity
+price follows a list of dated tariff changes. Each day's driving is assumed
+to be recharged that day.
+
+AnnualProjection keeps the intermediate daily arrays and monthly totals. It
+tracks which of them depend on which inputs, so after update() only the
+affected ones are recomputed. For example, a tariff change leaves the
+driving, energy and emissions totals untouched.
+"""
+import threading
+from datetime import date
+
+import numpy as np
+
+from calculator import EV_EFFICIENCY, GRID_CARBON_INTENSITY, TVA_MULTIPLIER
+
+DAYS = 365
+
+# Winter consumption is this much higher than the yearly average, peaking mid-January
+DEFAULT_SEASONAL_AMPLITUDE = 0.15
+COLDEST_DAY_OF_YEAR = 14
+
+DEFAULT_WEEKDAY_KM = (40, 40, 40, 40, 40, 20, 20)  # Monday first
+
+INPUTS = ('start_date', 'weekday_km', 'efficiency', 'seasonal_amplitude', 'tariff', 'carbon_intensity')
+
+# Each derived value and what it is computed from, in evaluation order
+DEPENDENCIES = {
+    'calendar': ('start_date',),
+    'km': ('calendar', 'weekday_km'),
+    'consumption': ('calendar', 'efficiency', 'seasonal_amplitude'),
+    'energy': ('km', 'consumption'),
+    'price': ('calendar', 'tariff'),
+    'cost': ('energy', 'price'),
+    'emissions': ('energy', 'carbon_intensity'),
+    'km_totals': ('km',),
+    'energy_totals': ('energy',),
+    'cost_totals': ('cost',),
+    'emissions_totals': ('emissions',),
+}
+
+
+def normalize_weekday_km(weekday_km):
+    """Accept one daily distance or seven (Monday first)."""
+    if np.ndim(weekday_km) == 0:
+        weekday_km = (weekday_km,) * 7
+    weekday_km = tuple(float(km) for km in weekday_km)
+    if len(weekday_km) != 7:
+        raise ValueError("Daily distance must be one value or seven, Monday first")
+    if min(weekday_km) < 0:
+        raise ValueError("Daily distance cannot be negative")
+    return weekday_km
+
+
+def normalize_tariff(tariff, start_date):
+    """Accept a single price or (effective date, price) changes, sorted by date.
+
+    The earliest price also applies before its effective date.
+    """
+    if np.ndim(tariff) == 0:
+        return ((start_date, float(tariff)),)
+    changes = sorted((to_date(effective), float(price)) for effective, price in tariff)
+    if not changes:
+        raise ValueError("Tariff needs at least one price")
+    return tuple(changes)
+
+
+def to_date(value):
+    return value if isinstance(value, date) else date.fromisoformat(str(value))
+
+
+class AnnualProjection:
+    """Incrementally updated 365-day charging projection.
+
+    Args:
+        weekday_km (float or sequence): Daily distance, or seven of them from Monday
+        tariff (float or sequence): Price per kWh before TVA, or a list of
+            (effective date, price) changes
+        efficiency (float): Average consumption in kWh/km
+        start_date (date): First day of the projection; defaults to today
+        seasonal_amplitude (float): Extra winter consumption as a fraction
+        carbon_intensity (float): Grid kg CO2/kWh
+    """
+
+    def __init__(self, weekday_km=DEFAULT_WEEKDAY_KM, tariff=0.16428, efficiency=EV_EFFICIENCY,
+                 start_date=None, seasonal_amplitude=DEFAULT_SEASONAL_AMPLITUDE,
+                 carbon_intensity=GRID_CARBON_INTENSITY):
+        self.lock = threading.Lock()
+        self.inputs = {}
+        self.values = {}
+        self.dirty = set(DEPENDENCIES)
+        self.recomputed = []
+        self.update(start_date=start_date or date.today(), weekday_km=weekday_km, tariff=tariff,
+                    efficiency=efficiency, seasonal_amplitude=seasonal_amplitude,
+                    carbon_intensity=carbon_intensity)
+
+    def update(self, **changes):
+        """Change inputs and mark everything that depends on them for recomputation."""
+        unknown = set(changes) - set(INPUTS)
+        if unknown:
+            raise ValueError(f"Unknown projection input: {sorted(unknown)[0]}")
+        if 'start_date' in changes:
+            changes['start_date'] = to_date(changes['start_date'])
+        start_date = changes.get('start_date', self.inputs.get('start_date'))
+        if 'weekday_km' in changes:
+            changes['weekday_km'] = normalize_weekday_km(changes['weekday_km'])
+        if 'tariff' in changes:
+            changes['tariff'] = normalize_tariff(changes['tariff'], start_date)
+        for name in ('efficiency', 'seasonal_amplitude', 'carbon_intensity'):
+            if name in changes:
+                changes[name] = float(changes[name])
+        if changes.get('efficiency', 1) <= 0:
+            raise ValueError("Efficiency must be positive")
+
+        changed = {name for name, value in changes.items() if self.inputs.get(name) != value}
+        self.inputs.update(changes)
+        for node, sources in DEPENDENCIES.items():  # dict order is evaluation order
+            if changed.intersection(sources) or self.dirty.intersection(sources):
+                self.dirty.add(node)
+                changed.add(node)
+
+    def _calendar(self):
+        dates = np.datetime64(self.inputs['start_date'], 'D') + np.arange(DAYS)
+        months = dates.astype('datetime64[M]')
+        month_starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+        return {
+            'dates': dates,
+            'weekday': (dates.astype(np.int64) - 4) % 7,  # 1970-01-01 was a Thursday
+            'day_of_year': (dates - dates.astype('datetime64[Y]')).astype(np.int64),
+            'month_starts': month_starts,
+            'months': [str(month) for month in months[month_starts]],
+        }
+
+    def _km(self):
+        return np.asarray(self.inputs['weekday_km'])[self.values['calendar']['weekday']]
+
+    def _consumption(self):
+        day_of_year = self.values['calendar']['day_of_year']
+        season = np.cos(2 * np.pi * (day_of_year - COLDEST_DAY_OF_YEAR) / 365)
+        return self.inputs['efficiency'] * (1 + self.inputs['seasonal_amplitude'] * season)
+
+    def _energy(self):
+        return self.values['km'] * self.values['consumption']
+
+    def _price(self):
+        effective = np.array([np.datetime64(day, 'D') for day, _ in self.inputs['tariff']])
+        prices = np.array([price for _, price in self.inputs['tariff']])
+        index = np.searchsorted(effective, self.values['calendar']['dates'], side='right') - 1
+        return prices[np.maximum(index, 0)]
+
+    def _cost(self):
+        return self.values['energy'] * self.values['price'] * TVA_MULTIPLIER
+
+    def _emissions(self):
+        return self.values['energy'] * self.inputs['carbon_intensity']
+
+    def _totals(self, daily):
+        monthly = np.add.reduceat(daily, self.values['calendar']['month_starts'])
+        return {'annual': float(daily.sum()), 'monthly': monthly.tolist()}
+
+    def _km_totals(self):
+        totals = self._totals(self.values['km'])
+        totals['sessions'] = int(np.count_nonzero(self.values['km']))
+        return totals
+
+    def _energy_totals(self):
+        return self._totals(self.values['energy'])
+
+    def _cost_totals(self):
+        return self._totals(self.values['cost'])
+
+    def _emissions_totals(self):
+        return self._totals(self.values['emissions'])
+
+    def refresh(self):
+        """Recompute the dirty values and return their names."""
+        self.recomputed = [node for node in DEPENDENCIES if node in self.dirty]
+        for node in self.recomputed:
+            self.values[node] = getattr(self, f"_{node}")()
+        self.dirty.clear()
+        return self.recomputed
+
+    def summary(self):
+        """Annual and monthly km, energy (kWh), cost (€ incl. TVA) and emissions (kg CO2)."""
+        self.refresh()
+        totals = {
+            'km': self.values['km_totals'],
+            'energy_kwh': self.values['energy_totals'],
+            'cost': self.values['cost_totals'],
+            'emissions_kg': self.values['emissions_totals'],
+        }
+        sessions = totals['km']['sessions']
+        return {
+            'start_date': self.inputs['start_date'].isoformat(),
+            'annual': {name: values['annual'] for name, values in totals.items()},
+            'sessions': sessions,
+            'average_session_cost': totals['cost']['annual'] / sessions if sessions else 0.0,
+            'monthly': [
+                dict({'month': month}, **{name: values['monthly'][index] for name, values in totals.items()})
+                for index, month in enumerate(self.values['calendar']['months'])
+            ],
+        }
@@ -0,0 +1,234 @@
+"""Time-of-use tariffs and cheapest charging window search.
+
+A tariff is a series of prices (€/kWh before TVA) in fixed-length slots.
+Times are given in hours from the start of the series. The running sum of
+prices is precomputed once, so the cost of any constant-power session is
+O(1) and searching every possible start time is O(n) in the number of slots.
+"""
+import numpy as np
+
+from calculator import TVA_MULTIPLIER
+
+
+class TimeOfUseTariff:
+    """Piecewise-constant electricity prices.
+
+    Args:
+        prices (array_like): Price per kWh before TVA for each slot
+        slot_minutes (float): Length of each slot, e.g. 15 or 30
+    """
+
+    def __init__(self, prices, slot_minutes=30):
+        self.prices = np.asarray(prices, dtype=float)
+        if self.prices.ndim != 1 or not len(self.prices):
+            raise ValueError("Tariff needs at least one price")
+        if slot_minutes <= 0:
+            raise ValueError("Slot length must be positive")
+        self.slot_minutes = slot_minutes
+        self.slot_hours = slot_minutes / 60
+        self.horizon_hours = len(self.prices) * self.slot_hours
+        # Running sum of prices; _cumulative[k] is the sum over slots before k
+        self._cumulative = np.concatenate(([0.0], np.cumsum(self.prices)))
+
+    @classmethod
+    def from_daily_profile(cls, prices, slot_minutes=None, days=2):
+        """Repeat a midnight-to-midnight price profile over several days.
+
+        The slot length defaults to 24 hours divided by the number of prices,
+        so 24, 48 and 96 prices give hourly, half-hourly and 15-minute slots.
+        """
+        prices = np.asarray(prices, dtype=float)
+        if not len(prices):
+            raise ValueError("Tariff needs at least one price")
+        if slot_minutes is None:
+            slot_minutes = 24 * 60 / len(prices)
+        if abs(len(prices) * slot_minutes - 24 * 60) > 1e-9:
+            raise ValueError("A daily profile must cover exactly 24 hours")
+        return cls(np.tile(prices, days), slot_minutes)
+
+    def _price_integral(self, hours):
+        """Sum of prices from the series start to each time, in price x slots."""
+        slots = np.asarray(hours, dtype=float) / self.slot_hours
+        index = np.clip(np.floor(slots).astype(np.int64), 0, len(self.prices) - 1)
+        return self._cumulative[index] + (slots - index) * self.prices[index]
+
+    def _check_window(self, start_hour, end_hour):
+        if np.any(np.asarray(start_hour) < 0) or np.any(np.asarray(end_hour) > self.horizon_hours + 1e-9):
+            raise ValueError("Charging session falls outside the tariff period")
+
+    def session_cost(self, start_hour, power_kw, energy_kwh):
+        """Cost including TVA of charging energy_kwh at power_kw from start_hour.
+
+        start_hour may be an array to price many start times at once.
+        """
+        end_hour = np.asarray(start_hour, dtype=float) + energy_kwh / power_kw
+        self._check_window(start_hour, end_hour)
+        price_slots = self._price_integral(end_hour) - self._price_integral(start_hour)
+        cost = power_kw * self.slot_hours * price_slots * TVA_MULTIPLIER
+        return float(cost) if np.ndim(cost) == 0 else cost
+
+    def cheapest_start(self, power_kw, energy_kwh, earliest_hour=0.0, deadline_hour=None):
+        """Find the start time with the lowest session cost.
+
+        Session cost is piecewise linear in the start time, with breakpoints
+        where the session starts or ends on a slot boundary, so only those
+        starts (plus the window edges) need to be priced.
+
+        Returns:
+            tuple: (start_hour, cost including TVA)
+
+        Raises:
+            ValueError: If the session cannot finish before the deadline
+        """
+        if deadline_hour is None:
+            deadline_hour = self.horizon_hours
+        duration = energy_kwh / power_kw
+        latest_start = deadline_hour - duration
+        if latest_start < earliest_hour - 1e-9:
+            raise ValueError("Charging cannot finish before the deadline")
+        latest_start = max(latest_start, earliest_hour)
+
+        boundaries = np.arange(len(self.prices) + 1) * self.slot_hours
+        starts = np.concatenate((boundaries, boundaries - duration, [earliest_hour, latest_start]))
+        starts = starts[(starts >= earliest_hour) & (starts <= latest_start)]
+
+        costs = self.session_cost(starts, power_kw, energy_kwh)
+        best = int(np.argmin(costs))
+        return float(starts[best]), float(costs[best])
+
+    def latest_affordable_start(self, power_kw, energy_kwh, budget, earliest_hour=0.0, deadline_hour=None):
+        """Latest start that finishes by the deadline for at most budget (including TVA).
+
+        Cost is linear between the breakpoints used by cheapest_start(), so the
+        crossing point is found exactly by interpolation.
+
+        Returns:
+            tuple: (start_hour, cost including TVA), or None if nothing is affordable
+        """
+        if deadline_hour is None:
+            deadline_hour = self.horizon_hours
+        duration = energy_kwh / power_kw
+        latest_start = deadline_hour - duration
+        if latest_start < earliest_hour - 1e-9:
+            return None
+        latest_start = max(latest_start, earliest_hour)
+
+        boundaries = np.arange(len(self.prices) + 1) * self.slot_hours
+        starts = np.unique(np.concatenate((boundaries, boundaries - duration, [earliest_hour, latest_start])))
+        starts = starts[(starts >= earliest_hour) & (starts <= latest_start)]
+        costs = self.session_cost(starts, power_kw, energy_kwh)
+        affordable = np.flatnonzero(costs <= budget + 1e-12)
+        if not len(affordable):
+            return None
+        last = int(affordable[-1])
+        if last == len(starts) - 1:
+            return float(starts[last]), float(costs[last])
+        # The next breakpoint is over budget; the budget is reached in between
+        fraction = (budget - costs[last]) / (costs[last + 1] - costs[last])
+        start = starts[last] + fraction * (starts[last + 1] - starts[last])
+        return float(start), float(budget)
+
+    def affordable_hours(self, start_hour, power_kw, budget):
+        """Hours of charging at power_kw from start_hour before the cost reaches budget.
+
+        Limited by the end of the tariff period.
+        """
+        self._check_window(start_hour, start_hour)
+        target = self._price_integral(start_hour) + budget / (power_kw * self.slot_hours * TVA_MULTIPLIER)
+        boundaries = np.arange(len(self.prices) + 1) * self.slot_hours
+        later = boundaries > start_hour
+        times = np.concatenate(([start_hour], boundaries[later]))
+        integrals = np.concatenate(([self._price_integral(start_hour)], self._cumulative[later]))
+        # Latest time whose running cost is within budget; later prices may be negative
+        within = np.flatnonzero(integrals <= target + 1e-12)
+        if not len(within):
+            return 0.0  # even the first moment is over budget
+        last = int(within[-1])
+        if last == len(times) - 1:
+            return float(times[last] - start_hour)
+        fraction = (target - integrals[last]) / (integrals[last + 1] - integrals[last])
+        return float(times[last] + fraction * (times[last + 1] - times[last]) - start_hour)
+
+
+def format_clock(hours):
+    """Format hours from midnight as a 24h "HH:MM" clock time."""
+    minutes = int(round(hours * 60)) % (24 * 60)
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def parse_clock(value):
+    """Parse "HH:MM" into hours from midnight."""
+    hours, _, minutes = str(value).partition(':')
+    hours, minutes = int(hours), int(minutes or 0)
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError("Times must be HH:MM")
+    return hours + minutes / 60
+
+
+def overnight_window(plug_in, ready_by):
+    """Return (start, deadline) hours for a plug-in and ready-by clock time.
+
+    A ready-by time at or before the plug-in time is taken to be the next day.
+    """
+    start, deadline = parse_clock(plug_in), parse_clock(ready_by)
+    if deadline <= start:
+        deadline += 24
+    return start, deadline
+
+
+def time_of_use_summary(prices, plug_in, ready_by, battery_size, voltage, amperages,
+                        start_percentage, end_percentage, slot_minutes=None, curve=None,
+                        max_power_kw=None, charger_efficiency=None):
+    """Cost of charging straight away versus the cheapest start, per amperage.
+
+    Session length follows calculate_charging_time: the power is capped at
+    max_power_kw and a non-linear curve slows the session down. The tariff
+    sees the session's average power, and prices the grid energy.
+
+    Args:
+        prices (list): Daily price profile from midnight, €/kWh before TVA
+        plug_in (str): Plug-in time "HH:MM"
+        ready_by (str): Time the car must be charged by, "HH:MM"
+        slot_minutes (float): Length of each price slot, inferred if None
+        curve (ChargeCurve): Optional non-linear charge curve
+        max_power_kw (float): Optional vehicle acceptance limit
+        charger_efficiency (float): Share of the grid energy stored in the
+            battery, when voltage and max_power_kw already include the losses
+
+    Returns:
+        list: One dict per amperage with 'amperage', 'immediate_cost',
+        'cheapest_start' ("HH:MM" or None if the deadline cannot be met),
+        'cheapest_start_hour', 'cheapest_cost' and 'savings'
+    """
+    tariff = TimeOfUseTariff.from_daily_profile(prices, slot_minutes)
+    start, deadline = overnight_window(plug_in, ready_by)
+    energy_needed = battery_size * (end_percentage - start_percentage) / 100
+    grid_energy = energy_needed / (charger_efficiency or 1.0)
+
+    rows = []
+    for amperage in amperages:
+        power_kw = (voltage * amperage) / 1000
+        if max_power_kw is not None:
+            power_kw = min(power_kw, max_power_kw)
+        if curve is not None and not curve.is_linear:
+            hours = curve.charging_hours(battery_size, power_kw, start_percentage, end_percentage)
+        else:
+            hours = energy_needed / power_kw
+        grid_kw = grid_energy / hours if hours > 0 else power_kw
+        row = {'amperage': amperage, 'immediate_cost': None, 'cheapest_start': None,
+               'cheapest_start_hour': None, 'cheapest_cost': None, 'savings': None}
+        try:
+            best_start, best_cost = tariff.cheapest_start(grid_kw, grid_energy, start, deadline)
+        except ValueError:
+            rows.append(row)
+            continue
+        immediate_cost = tariff.session_cost(start, grid_kw, grid_energy)
+        row.update({
+            'immediate_cost': immediate_cost,
+            'cheapest_start': format_clock(best_start),
+            'cheapest_start_hour': best_start % 24,
+            'cheapest_cost': best_cost,
+            'savings': immediate_cost - best_cost
+        })
+        rows.append(row)
+    return rows
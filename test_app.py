@@ -1,5 +1,13 @@
+import gzip
+import os
+import re
+import shutil
+import tempfile
 import unittest
-from app import calculate_charging_time, calculate_costs, calculate_environmental_impact
+from unittest import mock
+
+import history
+from app import app, calculate_charging_time, calculate_costs, calculate_environmental_impact
 
 class TestCalculateChargingTime(unittest.TestCase):
     def test_standard_charging_scenario(self):
@@ -179,5 +187,205 @@ class TestEnvironmentalImpact(unittest.TestCase):
         self.assertEqual(impact['diesel_pm_saved'], '0.1')   # (13.4 * 4.5) / 1000
 
 
+class TestHomePage(unittest.TestCase):
+    """Test the rendered calculator page"""
+
+    def setUp(self):
+        self.client = app.test_client()
+
+    def test_default_page_is_reused(self):
+        """Test that repeated GETs return the same cached page"""
+        first = self.client.get('/')
+        second = self.client.get('/')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.data, second.data)
+        self.assertNotIn(b'Charging Time Estimates', first.data)
+
+    def test_default_page_caching_headers(self):
+        """Test ETag revalidation, compression and the fingerprinted stylesheet"""
+        first = self.client.get('/')
+        revalidated = self.client.get('/', headers={'If-None-Match': first.headers['ETag']})
+        compressed = self.client.get('/', headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(compressed.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(compressed.data), first.data)
+        stylesheet = re.search(r'href="(/static/styles\.[0-9a-f]+\.css)"', first.get_data(as_text=True))
+        self.assertIsNotNone(stylesheet)
+        self.assertIn('immutable', self.client.get(stylesheet.group(1)).headers['Cache-Control'])
+
+    def test_submitted_form_renders_partials(self):
+        """Test that results, cost summary and environmental blocks render"""
+        response = self.client.post('/', data={
+            'battery_size': '26.8',
+            'voltage': '230',
+            'cost_per_kwh': '0.16428',
+            'start_percentage': '20',
+            'end_percentage': '80'
+        })
+        page = response.get_data(as_text=True)
+
+        self.assertIn('<td>6h 59m</td>', page)  # 10A row
+        self.assertIn('Total cost: €3.17', page)
+        self.assertIn('EV CO2 emissions: 3.54 kg', page)
+        self.assertNotIn('Likely Ranges', page)
+
+    def test_form_shows_ranges_when_requested(self):
+        """Test that the distribution checkbox adds the ranges table"""
+        response = self.client.post('/', data={
+            'battery_size': '26.8',
+            'voltage': '230',
+            'cost_per_kwh': '0.16428',
+            'start_percentage': '20',
+            'end_percentage': '80',
+            'distribution': '1'
+        })
+
+        self.assertIn('Likely Ranges', response.get_data(as_text=True))
+
+    def test_invalid_form_renders_error(self):
+        """Test that invalid input shows the error row instead of the cached page"""
+        self.client.get('/')
+        response = self.client.post('/', data={
+            'battery_size': '26.8',
+            'voltage': '230',
+            'cost_per_kwh': '0.16428',
+            'start_percentage': '80',
+            'end_percentage': '20'
+        })
+
+        self.assertIn(b'Error: Please enter valid numbers', response.data)
+
+    def test_metrics_count_requests_and_stages(self):
+        """Test that /metrics reports form submissions, errors and stage timings"""
+        before = self.client.get('/metrics').get_data(as_text=True)
+        self.client.post('/', data={'battery_size': 'abc'})
+        after = self.client.get('/metrics').get_data(as_text=True)
+
+        def sample(text, name):
+            line = next(line for line in text.splitlines() if line.startswith(name + ' '))
+            return float(line.split()[-1])
+
+        self.assertEqual(sample(after, 'ev_home_requests_total{method="POST"}')
+                         - sample(before, 'ev_home_requests_total{method="POST"}'), 1)
+        self.assertEqual(sample(after, 'ev_home_errors_total') - sample(before, 'ev_home_errors_total'), 1)
+        self.assertIn('ev_home_stage_seconds_bucket{stage="render",le="+Inf"}', after)
+        self.assertIn('ev_calculation_seconds_count{function="calculate_costs"}', after)
+        self.assertIn('# TYPE ev_calc_cache_hits_total counter', after)
+        self.assertIn('ev_calc_cache_evictions_total ', after)
+
+
+class TestCalculateApi(unittest.TestCase):
+    """Test the JSON calculation endpoint"""
+
+    def setUp(self):
+        self.client = app.test_client()
+        self.payload = {
+            'battery_size': 26.8,
+            'voltage': 230,
+            'start_percentage': 20,
+            'end_percentage': 80,
+            'cost_per_kwh': 0.16428
+        }
+
+    def test_returns_raw_numbers(self):
+        """Test that the API returns unformatted values"""
+        result = self.client.post('/api/v1/calculate', json=self.payload).get_json()
+
+        self.assertAlmostEqual(result['energy_needed'], 16.08)
+        self.assertAlmostEqual(result['total_cost'], 3.16994688)
+        self.assertAlmostEqual(result['environmental']['ev_emissions'], 3.5376)
+        self.assertEqual([t['power_kw'] for t in result['charge_times']], [1.38, 1.84, 2.3, 3.68])
+
+    def test_normalized_inputs_share_cache_entry(self):
+        """Test that equivalent string and number inputs hit the cache"""
+        payload = dict(self.payload, battery_size=31.5)
+        first = self.client.post('/api/v1/calculate', json=payload)
+        second = self.client.get('/api/v1/calculate', query_string=dict(payload, battery_size='31.50'))
+
+        self.assertEqual(first.headers['X-Cache'], 'MISS')
+        self.assertEqual(second.headers['X-Cache'], 'HIT')
+        self.assertEqual(first.get_json(), second.get_json())
+
+    def test_invalid_input_returns_400(self):
+        """Test that validation errors are reported as JSON"""
+        response = self.client.post('/api/v1/calculate', json=dict(self.payload, end_percentage=10))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('End percentage', response.get_json()['error'])
+
+    def test_distribution_is_reproducible(self):
+        """Test that the distribution endpoint returns seeded percentiles"""
+        payload = dict(self.payload, samples=500, seed=11, percentiles='10,90')
+        first = self.client.post('/api/v1/distribution', json=payload).get_json()
+        second = self.client.get('/api/v1/distribution', query_string=payload).get_json()
+
+        self.assertEqual(first, second)
+        self.assertEqual(first['seed'], 11)
+        self.assertEqual(set(first['total_cost']), {'p10', 'p90'})
+        self.assertEqual(len(first['charge_times']), 4)
+
+    def test_projection_updates_incrementally(self):
+        """Test that a projection token lets later changes reuse earlier totals"""
+        first = self.client.post('/api/v1/projection', json={
+            'weekday_km': '40', 'tariff': '0.2', 'start_date': '2025-01-01'
+        }).get_json()
+        second = self.client.post('/api/v1/projection', json={
+            'token': first['token'], 'tariff': 0.25
+        }).get_json()
+
+        self.assertAlmostEqual(first['annual']['km'], 14600)
+        self.assertEqual(second['token'], first['token'])
+        self.assertEqual(second['recomputed'], ['price', 'cost', 'cost_totals'])
+        self.assertAlmostEqual(second['annual']['cost'], first['annual']['cost'] * 1.25)
+
+    def test_solar_plan(self):
+        """Test that the solar endpoint returns a per-slot plan"""
+        response = self.client.post('/api/v1/solar', json={
+            'pv_kw': [0, 0, 3, 3, 0, 0], 'base_load_kw': 0.5, 'battery_size': 50,
+            'start_percentage': 50, 'end_percentage': 50.5, 'deadline_slot': 6, 'cost_per_kwh': 0.2
+        })
+        plan = response.get_json()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(plan['current']), 6)
+        self.assertEqual(plan['current'][:2], [0, 0])
+        self.assertAlmostEqual(plan['grid_kwh'], 0)
+        self.assertTrue(plan['met'])
+
+    def test_session_history(self):
+        """Test that calculations and actual sessions are stored and rolled up"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        store = history.SessionStore(os.path.join(directory, 'sessions.db'), flush_interval=0.01)
+        with mock.patch('history.STORE', store):
+            self.client.post('/api/v1/calculate', json=dict(self.payload, site='home'))
+            recorded = self.client.post('/api/v1/sessions', json={
+                'energy_kwh': 20, 'cost_per_kwh': 0.2, 'site': 'home', 'started_at': '2025-01-05T20:00:00'
+            })
+            store.flush()
+            sessions = self.client.get('/api/v1/sessions', query_string={'site': 'home'}).get_json()['sessions']
+            monthly = self.client.get('/api/v1/sessions/rollups',
+                                      query_string={'period': 'month', 'kind': 'actual'}).get_json()
+
+        self.assertEqual(recorded.status_code, 202)
+        self.assertEqual(sorted(session['kind'] for session in sessions), ['actual', 'calculated'])
+        self.assertEqual(monthly['rollups'], [
+            {'period': '2025-01', 'sessions': 1, 'energy_kwh': 20.0, 'cost': 4.8, 'co2_kg': 4.4}
+        ])
+
+    def test_session_history_disabled(self):
+        """Test that the history endpoints report when no database is configured"""
+        with mock.patch('history.STORE', None):
+            self.assertEqual(self.client.get('/api/v1/sessions').status_code, 404)
+
+    def test_distribution_rejects_too_many_samples(self):
+        """Test that oversized runs are refused"""
+        response = self.client.post('/api/v1/distribution', json=dict(self.payload, samples=10**9))
+
+        self.assertEqual(response.status_code, 400)
+
+
 if __name__ == '__main__':
     unittest.main()
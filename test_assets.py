@@ -0,0 +1,92 @@
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+from flask import Flask, request
+
+import assets
+
+
+class TestStaticAssets(unittest.TestCase):
+    """Test fingerprinted, pre-compressed static files"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+        with open(os.path.join(self.folder, 'site.css'), 'w') as f:
+            f.write('body { color: green; }\n' * 100)
+        self.static = assets.StaticAssets(self.folder)
+        self.app = Flask(__name__)
+
+    def serve(self, filename, **headers):
+        with self.app.test_request_context(headers=headers):
+            return self.static.response(request, filename)
+
+    def test_fingerprinted_url_changes_with_content(self):
+        """Test that the URL carries a content hash"""
+        url = self.static.url('site.css')
+        self.assertRegex(url, r'^/static/site\.[0-9a-f]{12}\.css$')
+
+        with open(os.path.join(self.folder, 'site.css'), 'a') as f:
+            f.write('p { margin: 0; }\n')
+        self.assertNotEqual(assets.StaticAssets(self.folder).url('site.css'), url)
+        self.assertEqual(self.static.url('missing.css'), '/static/missing.css')
+
+    def test_cache_headers(self):
+        """Test immutable caching for fingerprinted URLs and revalidation otherwise"""
+        fingerprinted = self.serve(self.static.url('site.css')[len('/static/'):])
+        plain = self.serve('site.css')
+
+        self.assertIn('immutable', fingerprinted.headers['Cache-Control'])
+        self.assertEqual(plain.headers['Cache-Control'], 'no-cache')
+        self.assertIsNotNone(plain.headers.get('Last-Modified'))
+        self.assertIsNone(self.serve('missing.css'))
+
+    def test_conditional_requests(self):
+        """Test that matching ETag and Last-Modified give 304"""
+        first = self.serve('site.css')
+
+        self.assertEqual(self.serve('site.css', **{'If-None-Match': first.headers['ETag']}).status_code, 304)
+        self.assertEqual(
+            self.serve('site.css', **{'If-Modified-Since': first.headers['Last-Modified']}).status_code, 304
+        )
+
+    def test_file_modified_uses_newest_input(self):
+        """Test that the newest file, including files in folders, sets Last-Modified"""
+        page = os.path.join(self.folder, 'page.py')
+        data = os.path.join(self.folder, 'data')
+        os.makedirs(data)
+        with open(page, 'w') as f:
+            f.write('')
+        with open(os.path.join(data, 'curves.json'), 'w') as f:
+            f.write('{}')
+        os.utime(page, (1000000000, 1000000000))
+        os.utime(os.path.join(self.folder, 'site.css'), (1000000000, 1000000000))
+        os.utime(os.path.join(data, 'curves.json'), (1700000000, 1700000000))
+
+        self.assertEqual(assets.file_modified(page).timestamp(), 1000000000)
+        self.assertEqual(assets.file_modified(page, data, os.path.join(self.folder, 'missing')).timestamp(),
+                         1700000000)
+
+    def test_gzip_variant(self):
+        """Test that gzip is served pre-compressed with its own ETag"""
+        plain = self.serve('site.css')
+        compressed = self.serve('site.css', **{'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(compressed.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(compressed.get_data()), plain.get_data())
+        self.assertNotEqual(compressed.headers['ETag'], plain.headers['ETag'])
+
+    @unittest.skipIf(assets.brotli is None, "brotli is not installed")
+    def test_brotli_preferred(self):
+        """Test that brotli wins when the client accepts it"""
+        response = self.serve('site.css', **{'Accept-Encoding': 'gzip, br'})
+
+        self.assertEqual(response.headers['Content-Encoding'], 'br')
+        self.assertEqual(assets.brotli.decompress(response.get_data()), self.serve('site.css').get_data())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+
+import numpy as np
+
+from batch import calculate_batch, format_charging_times, format_durations
+from calculator import (calculate_charging_time, calculate_costs, calculate_environmental_impact,
+                        environmental_impact_values)
+from chargers import get_charger
+from curves import CURVES, ChargeCurve
+
+
+class TestCalculateBatch(unittest.TestCase):
+    """Test the vectorized engine against the scalar functions"""
+
+    def test_matches_scalar_functions(self):
+        """Test that every row matches the scalar results exactly"""
+        rng = np.random.default_rng(42)
+        rows = 500
+        battery = np.round(rng.uniform(10, 120, rows), 1)
+        start = rng.integers(0, 99, rows).astype(float)
+        end = np.minimum(start + rng.integers(1, 100, rows), 100)
+        amperage = rng.choice([6, 8, 10, 16], rows)
+        cost = rng.uniform(0.05, 0.5, rows)
+
+        result = calculate_batch(battery, 230, amperage, start, end, cost)
+        formatted = format_charging_times(amperage, result)
+
+        for i in range(rows):
+            expected = calculate_charging_time(battery[i], 230, int(amperage[i]), start[i], end[i])
+            energy, total_cost, cost_for_full = calculate_costs(battery[i], start[i], end[i], cost[i])
+            impact = calculate_environmental_impact(energy)
+
+            self.assertEqual(formatted[i], expected)
+            self.assertEqual(result['energy_needed'][i], energy)
+            self.assertEqual(f"€{result['total_cost'][i]:.2f}", total_cost)
+            self.assertEqual(f"€{result['cost_for_full'][i]:.2f}", cost_for_full)
+            self.assertEqual(f"{result['ev_range'][i]:.1f}", impact['ev_range'])
+
+    def test_matches_scalar_functions_with_curve_and_charger(self):
+        """Test that charge curves and the charger model match the scalar results exactly"""
+        rng = np.random.default_rng(7)
+        rows = 200
+        battery = np.round(rng.uniform(10, 120, rows), 1)
+        start = rng.integers(0, 99, rows).astype(float)
+        end = np.minimum(start + rng.integers(1, 100, rows), 100)
+        amperage = rng.choice([6, 10, 16, 32], rows)
+        onboard = rng.choice([7.4, 11.0], rows)
+        cost = rng.uniform(0.05, 0.5, rows)
+        absolute = ChargeCurve('test_absolute', [0, 80, 100], [11, 11, 3])
+
+        for curve in (CURVES['standard_taper'], absolute):
+            for charger_id in ('ac1', 'ac3'):
+                charger = get_charger(charger_id)
+                options = {key: charger[key] for key in ('voltage', 'phases', 'power_factor')}
+                options['charger_efficiency'] = charger['efficiency']
+                result = calculate_batch(battery, amperage=amperage, start_percentage=start, end_percentage=end,
+                                         cost_per_kwh=cost, max_power_kw=onboard, curve=curve, **options)
+                formatted = format_charging_times(amperage, result)
+
+                for i in range(rows):
+                    expected = calculate_charging_time(battery[i], amperage=int(amperage[i]),
+                                                       start_percentage=start[i], end_percentage=end[i],
+                                                       curve=curve, max_power_kw=onboard[i], **options)
+                    energy, total_cost, cost_for_full = calculate_costs(battery[i], start[i], end[i], cost[i],
+                                                                        charger['efficiency'])
+                    impact = environmental_impact_values(energy, charger_efficiency=charger['efficiency'])
+
+                    self.assertEqual(formatted[i], expected)
+                    self.assertEqual(f"€{result['total_cost'][i]:.2f}", total_cost)
+                    self.assertEqual(f"€{result['cost_for_full'][i]:.2f}", cost_for_full)
+                    self.assertEqual(result['ev_emissions'][i], impact['ev_emissions'])
+
+    def test_broadcasts_scalars_against_arrays(self):
+        """Test one car across the standard amperages"""
+        result = calculate_batch(26.8, 230, [6, 8, 10, 16], 20, 80)
+
+        self.assertEqual(format_durations(result['hours']), ["11h 39m", "8h 44m", "6h 59m", "4h 22m"])
+        self.assertEqual(result['power_kw'].tolist(), [1.38, 1.84, 2.3, 3.68])
+
+    def test_invalid_rows_raise(self):
+        """Test that the scalar validation rules apply to every row"""
+        with self.assertRaisesRegex(ValueError, "Row 1: End percentage"):
+            calculate_batch(26.8, 230, 10, [20, 80], [80, 20])
+
+        with self.assertRaisesRegex(ValueError, "Row 0: Percentages must be between"):
+            calculate_batch(26.8, 230, 10, [-10, 80], [80, 20])
+
+
+if __name__ == '__main__':
+    unittest.main()
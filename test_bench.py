@@ -0,0 +1,45 @@
+import unittest
+
+from bench import compare, median_of, percentile, summarize
+
+
+class TestBenchmarkReporting(unittest.TestCase):
+    """Test the benchmark summary and regression check"""
+
+    def test_percentiles(self):
+        """Test nearest-rank percentiles of request latencies"""
+        latencies = [i / 1000 for i in range(1, 101)]
+        summary = summarize(latencies, 2.0)
+        self.assertEqual(summary['requests'], 100)
+        self.assertEqual(summary['rps'], 50.0)
+        self.assertEqual(summary['p50_ms'], 51.0)
+        self.assertEqual(summary['p99_ms'], 100.0)
+        self.assertEqual(percentile([], 0.5), 0.0)
+
+    def test_regression_beyond_threshold(self):
+        """Test that slower throughput and latency are reported past the threshold"""
+        baseline = {'client_get': {'rps': 1000.0, 'p95_ms': 1.0, 'p50_ms': 0.5}}
+        results = {'client_get': {'rps': 700.0, 'p95_ms': 1.5, 'p50_ms': 5.0}}
+        regressions = compare(results, baseline, 0.2)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(regressions[0].startswith('client_get.rps'))
+
+    def test_within_threshold_or_improved(self):
+        """Test that small changes, improvements and new benchmarks pass"""
+        baseline = {'calculate_costs': {'ops_per_sec': 1000.0}}
+        results = {
+            'calculate_costs': {'ops_per_sec': 900.0},
+            'client_post': {'rps': 1.0, 'p95_ms': 100.0}
+        }
+        self.assertEqual(compare(results, baseline, 0.2), [])
+        self.assertEqual(compare({'calculate_costs': {'ops_per_sec': 5000.0}}, baseline, 0.2), [])
+
+    def test_rounds_keep_median(self):
+        """Test that every metric keeps its median round, whichever direction is better"""
+        runs = iter([{'rps': 900.0, 'p95_ms': 3.0}, {'rps': 100.0, 'p95_ms': 1.0},
+                     {'rps': 500.0, 'p95_ms': 2.0}])
+        self.assertEqual(median_of(3, lambda: next(runs)), {'rps': 500.0, 'p95_ms': 2.0})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import io
+import json
+import unittest
+
+from app import app
+from bulk import calculate_rows, read_csv_rows, stream_results
+from calculator import calculate_charging_time, calculate_costs
+
+MANIFEST = (
+    "vehicle_id,battery_kwh,start_pct,end_pct,tariff\n"
+    "v1,26.8,20,80,0.16428\n"
+    "v2,not-a-number,20,80,0.16428\n"
+    "v3,26.8,80,20,0.16428\n"
+    "v4,58,10,90,0.2\n"
+)
+
+
+class TestCalculateRows(unittest.TestCase):
+    """Test chunked row processing"""
+
+    def test_results_match_calculator(self):
+        """Test that valid rows match the scalar calculator"""
+        results = list(calculate_rows(read_csv_rows(io.StringIO(MANIFEST)), chunk_size=2))
+        expected = calculate_charging_time(26.8, 230, 16, 20, 80)
+        energy, total_cost, _ = calculate_costs(26.8, 20, 80, 0.16428)
+
+        self.assertEqual([r['line'] for r in results], [1, 2, 3, 4])
+        self.assertEqual(results[0]['duration'], expected['duration'])
+        self.assertEqual(results[0]['energy_kwh'], energy)
+        self.assertEqual(f"€{results[0]['cost']:.2f}", total_cost)
+        self.assertEqual(results[3]['vehicle_id'], 'v4')
+        self.assertIsNone(results[3]['error'])
+
+    def test_bad_rows_do_not_abort(self):
+        """Test that invalid rows produce per-row errors"""
+        results = list(calculate_rows(read_csv_rows(io.StringIO(MANIFEST))))
+
+        self.assertEqual(results[1]['error'], "Please enter valid numbers")
+        self.assertEqual(results[2]['error'], "End percentage must be greater than start percentage")
+
+    def test_each_quantity_must_be_positive(self):
+        """Test that negative values are rejected even when their product is positive"""
+        manifest = (
+            "vehicle_id,battery_kwh,start_pct,end_pct,tariff,voltage,amperage\n"
+            "a,-26.8,20,80,0.2,230,16\n"
+            "b,26.8,20,80,0.2,-230,-16\n"
+        )
+        results = list(calculate_rows(read_csv_rows(io.StringIO(manifest))))
+
+        self.assertEqual(results[0]['error'], "Battery size must be positive")
+        self.assertEqual(results[1]['error'], "Voltage and amperage must be positive")
+
+    def test_non_finite_values_are_row_errors(self):
+        """Test that nan and inf are rejected instead of producing NaN results"""
+        manifest = (
+            "vehicle_id,battery_kwh,start_pct,end_pct,tariff,voltage,amperage\n"
+            "a,nan,20,80,0.2,230,16\n"
+            "b,26.8,20,80,inf,230,16\n"
+            "c,26.8,20,80,0.2,230,-Infinity\n"
+            "d,26.8,20,80,0.2,230,16\n"
+        )
+        output = ''.join(stream_results(io.StringIO(manifest)))
+
+        self.assertNotIn('NaN', output)
+        results = [json.loads(line) for line in output.splitlines()]
+        self.assertEqual([result['error'] for result in results[:3]], ["Please enter valid numbers"] * 3)
+        self.assertIsNone(results[3]['error'])
+
+    def test_ndjson_to_csv(self):
+        """Test NDJSON input with CSV output, including a malformed line"""
+        lines = io.StringIO(
+            json.dumps({'vehicle_id': 'a', 'battery_kwh': 40, 'start_pct': 10, 'end_pct': 90, 'tariff': 0.2})
+            + "\n{broken\n"
+        )
+        output = ''.join(stream_results(lines, 'ndjson', 'csv')).splitlines()
+
+        self.assertEqual(output[0].split(',')[:2], ['line', 'vehicle_id'])
+        self.assertTrue(output[1].startswith('1,a,3.68,32.0,'))
+        self.assertIn('Invalid JSON', output[2])
+
+
+class TestBulkEndpoint(unittest.TestCase):
+    """Test the streaming bulk endpoint"""
+
+    def test_csv_upload_streams_ndjson(self):
+        """Test a raw CSV body returns one JSON line per row"""
+        client = app.test_client()
+        response = client.post('/api/v1/bulk', data=MANIFEST, content_type='text/csv')
+        rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0]['duration'], "4h 22m")
+        self.assertIsNotNone(rows[1]['error'])
+
+    def test_invalid_utf8_is_a_row_error(self):
+        """Test that a bad byte fails its own row and the stream carries on"""
+        client = app.test_client()
+        body = MANIFEST.encode().replace(b'v4,', b'v\xff4,')
+        response = client.post('/api/v1/bulk', data=body, content_type='text/csv')
+        rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0]['duration'], "4h 22m")
+        self.assertEqual(rows[3]['error'], "Row is not valid UTF-8")
+
+
+if __name__ == '__main__':
+    unittest.main()
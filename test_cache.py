@@ -0,0 +1,126 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from cache import LRUCache, SharedCache
+
+
+def fill_shared(path, worker, count):
+    cache = SharedCache(path, maxsize=64, slot_bytes=1024)
+    for index in range(count):
+        cache.get_or_compute(('key', index), lambda: {'index': index, 'worker': worker})
+
+
+class TestLRUCache(unittest.TestCase):
+    """Test the bounded result cache"""
+
+    def test_hit_and_miss_counters(self):
+        """Test that repeated keys are served from the cache"""
+        cache = LRUCache(maxsize=4)
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return 'value'
+
+        self.assertEqual(cache.get_or_compute('a', compute), ('value', False))
+        self.assertEqual(cache.get_or_compute('a', compute), ('value', True))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_least_recently_used_is_evicted(self):
+        """Test that the size bound evicts the oldest unused entry"""
+        cache = LRUCache(maxsize=2)
+        cache.get_or_compute('a', lambda: 1)
+        cache.get_or_compute('b', lambda: 2)
+        cache.get_or_compute('a', lambda: 1)  # 'a' is now most recent
+        cache.get_or_compute('c', lambda: 3)
+
+        self.assertEqual(cache.get_or_compute('a', lambda: 'new')[1], True)
+        self.assertEqual(cache.get_or_compute('b', lambda: 'new'), ('new', False))
+        self.assertEqual(cache.stats()['evictions'], 2)
+
+    def test_entries_expire_after_ttl(self):
+        """Test that entries older than the TTL are recomputed"""
+        cache = LRUCache(maxsize=4, ttl=10)
+        with mock.patch('cache.time.monotonic', return_value=100.0):
+            cache.get_or_compute('a', lambda: 'old')
+        with mock.patch('cache.time.monotonic', return_value=105.0):
+            self.assertEqual(cache.get_or_compute('a', lambda: 'new'), ('old', True))
+        with mock.patch('cache.time.monotonic', return_value=111.0):
+            self.assertEqual(cache.get_or_compute('a', lambda: 'new'), ('new', False))
+
+
+class TestSharedCache(unittest.TestCase):
+    """Test the memory-mapped cache shared by worker processes"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, 'calc.cache')
+
+    def test_hits_evictions_and_oversize(self):
+        """Test LRU eviction and that values larger than a slot are not stored"""
+        cache = SharedCache(self.path, maxsize=2, slot_bytes=256)
+        cache.get_or_compute('a', lambda: 1)
+        cache.get_or_compute('b', lambda: 2)
+        self.assertEqual(cache.get_or_compute('a', lambda: 'new'), (1, True))  # 'a' is now most recent
+        cache.get_or_compute('c', lambda: 3)
+
+        self.assertEqual(cache.get_or_compute('a', lambda: 'new'), (1, True))
+        self.assertEqual(cache.get_or_compute('b', lambda: 'new'), ('new', False))
+        self.assertEqual(cache.get_or_compute('big', lambda: 'x' * 1000), ('x' * 1000, False))
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['evictions'], stats['oversize']), (2, 5, 2, 1))
+        self.assertEqual(stats['size'], 2)
+
+    def test_entries_expire_after_ttl(self):
+        """Test that entries older than the TTL are recomputed"""
+        cache = SharedCache(self.path, maxsize=4, ttl=10)
+        with mock.patch('cache.time.time', return_value=100.0):
+            cache.get_or_compute('a', lambda: 'old')
+        with mock.patch('cache.time.time', return_value=105.0):
+            self.assertEqual(cache.get_or_compute('a', lambda: 'new'), ('old', True))
+        with mock.patch('cache.time.time', return_value=111.0):
+            self.assertEqual(cache.get_or_compute('a', lambda: 'new'), ('new', False))
+
+    def test_shared_between_processes(self):
+        """Test that entries and counters written by other processes are visible"""
+        workers = [multiprocessing.Process(target=fill_shared, args=(self.path, worker, 40))
+                   for worker in range(3)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(30)
+            self.assertEqual(worker.exitcode, 0)
+
+        cache = SharedCache(self.path, maxsize=64, slot_bytes=1024)
+        value, hit = cache.get_or_compute(('key', 7), lambda: None)
+        self.assertTrue(hit)
+        self.assertEqual(value['index'], 7)
+        stats = cache.stats()
+        self.assertEqual(stats['hits'] + stats['misses'], 121)
+        self.assertEqual(stats['size'], 40)
+
+    def test_snapshot_warms_new_file(self):
+        """Test that a new cache file is filled from the last snapshot"""
+        snapshot = os.path.join(self.directory, 'calc.snapshot')
+        cache = SharedCache(self.path, maxsize=4, snapshot=snapshot)
+        for key in 'abc':
+            cache.get_or_compute(key, lambda: key.upper())
+        self.assertEqual(cache.save_snapshot(), 3)
+        os.remove(self.path)
+
+        warmed = SharedCache(self.path, maxsize=2, snapshot=snapshot)
+        self.assertEqual(warmed.get_or_compute('c', lambda: 'new'), ('C', True))
+        self.assertEqual(warmed.get_or_compute('b', lambda: 'new'), ('B', True))
+        self.assertEqual(warmed.get_or_compute('a', lambda: 'new'), ('new', False))
+        self.assertEqual(SharedCache.from_file(self.path).maxsize, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import carbon
+from app import app
+from calculator import GRID_CARBON_INTENSITY, calculate_environmental_impact
+
+START = '2024-01-01T00:00:00Z'
+
+
+class TestCarbonIntensitySeries(unittest.TestCase):
+    """Test memory-mapped intensity history"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        # One week of half-hourly data: 0.1 kg/kWh at night (00-06), 0.3 otherwise
+        day = np.where(np.arange(48) < 12, 0.1, 0.3)
+        carbon.write_series('TEST', START, np.tile(day, 7), directory=self.directory)
+        self.series = carbon.get_series('TEST', self.directory)
+
+    def test_series_loads_lazily_as_memmap(self):
+        """Test that nothing is read until the first query"""
+        series = carbon.CarbonIntensitySeries('TEST', self.directory)
+        self.assertIsNone(series._cumulative)
+
+        series.average_intensity('2024-01-02T00:00:00Z', '2024-01-02T03:00:00Z')
+        self.assertIsInstance(series._cumulative, np.memmap)
+
+    def test_window_average(self):
+        """Test averages within and across slots of different intensity"""
+        self.assertAlmostEqual(self.series.average_intensity('2024-01-02T01:00:00Z', '2024-01-02T04:00:00Z'), 0.1, places=6)
+        # 05:00-07:00 is half night, half day
+        self.assertAlmostEqual(self.series.average_intensity('2024-01-02T05:00:00Z', '2024-01-02T07:00:00Z'), 0.2, places=6)
+        # 05:15-06:15: 45 minutes at 0.1 and 15 minutes at 0.3
+        self.assertAlmostEqual(self.series.average_intensity('2024-01-02T05:15:00Z', '2024-01-02T06:15:00Z'), 0.15, places=6)
+
+    def test_session_emissions(self):
+        """Test emissions for a constant-power session"""
+        # 16.08 kWh at 3.68 kW from 00:00 runs 4.37 hours, all at night
+        emissions = self.series.session_emissions('2024-01-03T00:00:00', 3.68, 16.08)
+        self.assertAlmostEqual(emissions, 16.08 * 0.1, places=5)
+
+    def test_outside_data_raises(self):
+        """Test that windows beyond the stored period are rejected"""
+        with self.assertRaises(ValueError):
+            self.series.average_intensity('2023-12-31T23:00:00Z', '2024-01-01T01:00:00Z')
+        with self.assertRaises(ValueError):
+            carbon.get_series('NOPE', self.directory)
+
+    def test_build_from_csv(self):
+        """Test CSV conversion from g/kWh with a gap"""
+        path = os.path.join(self.directory, 'history.csv')
+        with open(path, 'w') as f:
+            f.write("timestamp,intensity\n2024-01-01T00:00:00Z,200\n2024-01-01T00:30:00Z,300\n2024-01-01T01:30:00Z,100\n")
+
+        self.assertEqual(carbon.build_from_csv('CSV', path, directory=self.directory), 4)
+        series = carbon.get_series('CSV', self.directory)
+        self.assertAlmostEqual(series.average_intensity('2024-01-01T00:00:00Z', '2024-01-01T02:00:00Z'), 0.225, places=6)
+
+        # Without --directory the CLI writes to, and reports, CARBON_DATA_DIR
+        with mock.patch.object(carbon, 'CARBON_DATA_DIR', self.directory), \
+                mock.patch('builtins.print') as printed:
+            carbon.main(['build', 'CLI', path])
+        printed.assert_called_once_with(f"Wrote 4 slots for CLI to {self.directory}")
+
+    def test_default_intensity_without_region(self):
+        """Test that no region keeps the national average"""
+        self.assertEqual(carbon.session_intensity(None, START, 2), GRID_CARBON_INTENSITY)
+        self.assertEqual(calculate_environmental_impact(16.08, carbon_intensity=0.1)['ev_emissions'], '1.61 kg')
+
+    def test_api_uses_charging_window(self):
+        """Test the API with a region and charge start"""
+        with mock.patch.object(carbon, 'CARBON_DATA_DIR', self.directory):
+            result = app.test_client().post('/api/v1/calculate', json={
+                'battery_size': 26.8, 'start_percentage': 20, 'end_percentage': 80, 'cost_per_kwh': 0.2,
+                'carbon_region': 'TEST', 'charge_start': '2024-01-03T00:00:00Z'
+            }).get_json()
+
+        self.assertAlmostEqual(result['environmental']['grid_intensity'], 0.1, places=6)
+        self.assertAlmostEqual(result['environmental']['ev_emissions'], 1.608 / 0.90, places=5)  # ac1 losses
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+import unittest
+
+import numpy as np
+
+from app import app
+from calculator import calculate_summary, charging_time_values, supply_power
+from chargers import (CHARGER_TYPES, calculator_options, charger_currents, effective_supply, get_charger,
+                      power_table)
+from distribution import calculate_distribution
+
+
+class TestChargerModel(unittest.TestCase):
+    """Test the per-phase AC and DC charger power model"""
+
+    def test_supply_power(self):
+        """Test phases, power factor, the acceptance cap and losses"""
+        self.assertEqual(supply_power(230, 16), 3.68)  # the single-phase default has no losses
+        self.assertAlmostEqual(supply_power(230, 16, 3, 0.99, 0.92), 3 * 230 * 16 * 0.99 / 1000 * 0.92)
+        self.assertAlmostEqual(supply_power(230, 32, 3, 0.99, 0.92, max_power_kw=11), 11 * 0.92)
+
+    def test_table_matches_single_calculation(self):
+        """Test that the batched table equals the calculator for every type, current and limit"""
+        onboard = np.array([0, 3.7, 7.4, 11, 22])
+        dc_max = np.array([0, 50, 120, 230, 0])
+        columns = [{'type': charger['id'], 'current': current}
+                   for charger in CHARGER_TYPES for current in (6, 16, 32)]
+        table = power_table(columns, onboard, dc_max)
+
+        self.assertEqual(table.shape, (5, len(columns)))
+        for row in range(len(onboard)):
+            for column, cell in enumerate(columns):
+                charger = get_charger(cell['type'])
+                try:
+                    options = calculator_options(charger, onboard[row], dc_max[row])
+                except ValueError:
+                    self.assertTrue(np.isnan(table[row, column]))
+                    continue
+                current = charger_currents(charger, (cell['current'],))[0]
+                expected = charging_time_values(60, amperage=current, start_percentage=20, end_percentage=80,
+                                                **options)
+                self.assertAlmostEqual(table[row, column], expected['power_kw'])
+                voltage, cap = effective_supply(charger, onboard[row], dc_max[row])
+                self.assertAlmostEqual(min(voltage * current / 1000, cap), expected['power_kw'])
+
+    def test_dc_uses_vehicle_limit(self):
+        """Test that DC chargers run at full current, limited by the vehicle"""
+        charger = get_charger('dc-150')
+
+        self.assertEqual(charger_currents(charger, (6, 16)), (375.0,))
+        self.assertAlmostEqual(power_table([{'type': 'dc-150'}], [11], [100])[0, 0], 100 * 0.95)
+        with self.assertRaises(ValueError):
+            calculator_options(charger, 11, 0)
+        with self.assertRaises(ValueError):
+            get_charger('dc-9000')
+
+    def test_losses_are_counted_once(self):
+        """Test that costs pay for the grid energy and the distribution does not add losses twice"""
+        charger = get_charger('ac3')
+        voltage, max_power_kw = effective_supply(charger, 11)
+        summary = calculate_summary(60, voltage, (16,), 20, 80, 0.2, max_power_kw=max_power_kw,
+                                    charger_efficiency=0.92)
+        self.assertAlmostEqual(summary['grid_energy'], 36 / 0.92)
+        self.assertAlmostEqual(summary['total_cost'], 36 / 0.92 * 0.2 * 1.2)
+
+        # Without spread, every sample is the single calculation
+        steady = {'soc_sd': 0.0, 'temperature_c': 20.0, 'temperature_sd': 0.0, 'charger_efficiency_sd': 0.0}
+        ranges = calculate_distribution(60, voltage, (16,), 20, 80, 0.2, max_power_kw=max_power_kw,
+                                        charger_efficiency=0.92, samples=100, uncertainty=steady)
+        self.assertAlmostEqual(ranges['charge_times'][0]['hours']['p50'], summary['charge_times'][0]['hours'])
+        self.assertAlmostEqual(ranges['total_cost']['p50'], summary['total_cost'])
+
+    def test_emissions_match_distribution(self):
+        """Test that point emissions and cost sit at the distribution's median on a charger type"""
+        client = app.test_client()
+        payload = {'battery_size': 60, 'start_percentage': 20, 'end_percentage': 80, 'cost_per_kwh': 0.2,
+                   'charger': 'ac1'}
+        point = client.post('/api/v1/calculate', json=payload).get_json()
+        ranges = client.post('/api/v1/distribution', json=dict(payload, samples=20000, seed=1)).get_json()
+
+        self.assertAlmostEqual(point['environmental']['ev_emissions'], 36 / 0.90 * 0.220)
+        for name, value in (('ev_emissions', point['environmental']['ev_emissions']),
+                            ('total_cost', point['total_cost'])):
+            self.assertAlmostEqual(ranges[name]['p50'], value, delta=0.02 * value)
+
+    def test_api_and_form_use_charger(self):
+        """Test the charger field on the JSON API and the form"""
+        client = app.test_client()
+        result = client.post('/api/v1/calculate', json={
+            'vehicle_id': 'kia-ev6-77', 'start_percentage': 20, 'end_percentage': 80,
+            'cost_per_kwh': 0.2, 'charger': 'ac3'
+        }).get_json()
+        powers = [time['power_kw'] for time in result['charge_times']]
+        self.assertAlmostEqual(powers[-1], 3 * 230 * 16 * 0.99 / 1000 * 0.92)
+
+        self.assertEqual(client.post('/api/v1/calculate', json={
+            'battery_size': 60, 'start_percentage': 20, 'end_percentage': 80, 'cost_per_kwh': 0.2,
+            'charger': 'nope'
+        }).status_code, 400)
+
+        # Without a charger or a voltage, the API uses the form's default charger
+        payload = {'battery_size': 60, 'start_percentage': 20, 'end_percentage': 80, 'cost_per_kwh': 0.2}
+        default = client.post('/api/v1/calculate', json=payload).get_json()
+        self.assertEqual(default, client.post('/api/v1/calculate', json=dict(payload, charger='ac1')).get_json())
+        self.assertAlmostEqual(default['charge_times'][-1]['power_kw'], 230 * 16 * 0.99 / 1000 * 0.90)
+        page = client.post('/', data={key: str(value) for key, value in payload.items()}).data.decode()
+        self.assertIn(f"€{default['total_cost']:.2f}", page)
+
+        page = client.post('/', data={
+            'battery_size': '60', 'start_percentage': '20', 'end_percentage': '80',
+            'cost_per_kwh': '0.2', 'charger': 'dc-50'
+        }).data.decode()
+        self.assertIn('On 50 kW DC', page)
+        self.assertIn('<td>125.0A</td>', page)
+        self.assertIn('<td>47.5kW</td>', page)
+
+    def test_form_defaults_to_single_phase_charger(self):
+        """Test that the form without a voltage shows ac1 power and costs with its losses"""
+        page = app.test_client().post('/', data={
+            'battery_size': '26.8', 'start_percentage': '20', 'end_percentage': '80', 'cost_per_kwh': '0.2'
+        }).data.decode()
+        energy = 26.8 * 0.6
+
+        self.assertIn('On AC single-phase 230 V, up to 7.4 kW, after 10% charger losses', page)
+        self.assertIn(f"<td>{230 * 10 * 0.99 * 0.90 / 1000:.2f}kW</td>", page)
+        self.assertIn(f"Energy drawn from the grid: {energy / 0.90:.1f} kWh, including 10% charger losses", page)
+        self.assertIn(f"Total cost of the grid energy: €{energy / 0.90 * 0.2 * 1.2:.2f}", page)
+        self.assertIn(f"Cost for full 100% charge: €{26.8 / 0.90 * 0.2 * 1.2:.2f}", page)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+
+import numpy as np
+
+from app import app
+from calculator import calculate_charging_time
+from curves import CURVES, LINEAR, ChargeCurve, get_curve
+
+
+def integrate(curve, battery_size, charger_kw, start, end, steps=200000):
+    """Reference charging time by midpoint integration of 1/P"""
+    soc = np.linspace(start, end, steps + 1)
+    mid = (soc[1:] + soc[:-1]) / 2
+    power = curve.accepted_power(mid, charger_kw)
+    return float(np.sum(battery_size * np.diff(soc) / 100 / power))
+
+
+class TestChargeCurve(unittest.TestCase):
+    """Test table-based charge curve integration"""
+
+    def test_linear_default_matches_existing_model(self):
+        """Test that the default curve leaves calculate_charging_time unchanged"""
+        self.assertEqual(
+            calculate_charging_time(26.8, 230, 10, 20, 80, LINEAR),
+            calculate_charging_time(26.8, 230, 10, 20, 80)
+        )
+        self.assertIs(get_curve(None), LINEAR)
+
+    def test_table_lookup_matches_integration(self):
+        """Test table lookups against direct numeric integration"""
+        curve = CURVES['standard_taper']
+        for start, end in ((20, 80), (80, 100), (33.3, 97.1), (0, 100)):
+            self.assertAlmostEqual(
+                curve.charging_hours(26.8, 3.68, start, end),
+                integrate(curve, 26.8, 3.68, start, end),
+                places=3
+            )
+
+    def test_absolute_curve_caps_charger_power(self):
+        """Test a kW curve that only limits power above the charger level"""
+        curve = ChargeCurve('test', [0, 80, 100], [11, 11, 2])
+        # Below 80% the 3.68 kW charger is the limit
+        self.assertAlmostEqual(curve.charging_hours(50, 3.68, 20, 80), 50 * 0.6 / 3.68, places=6)
+        self.assertAlmostEqual(curve.charging_hours(50, 3.68, 80, 100), integrate(curve, 50, 3.68, 80, 100), places=3)
+
+    def test_taper_slows_top_of_charge(self):
+        """Test that 80-100% takes longer than 20-40% with a taper"""
+        result = calculate_charging_time(26.8, 230, 16, 80, 100, CURVES['standard_taper'])
+        linear = calculate_charging_time(26.8, 230, 16, 80, 100)
+
+        self.assertEqual(linear['duration'], "1h 27m")
+        self.assertEqual(result['duration'], "3h 24m")
+
+    def test_invalid_curve_rejected(self):
+        """Test curve validation"""
+        with self.assertRaises(ValueError):
+            ChargeCurve('bad', [0, 50], [1, 1])
+        with self.assertRaises(ValueError):
+            get_curve('no-such-curve')
+
+    def test_api_accepts_charge_curve(self):
+        """Test that the JSON API applies the selected curve"""
+        response = app.test_client().post('/api/v1/calculate', json={
+            'battery_size': 26.8, 'voltage': 230, 'start_percentage': 80, 'end_percentage': 100,
+            'cost_per_kwh': 0.2, 'amperages': [16], 'charge_curve': 'standard_taper'
+        })
+
+        self.assertAlmostEqual(response.get_json()['charge_times'][0]['hours'],
+                               CURVES['standard_taper'].charging_hours(26.8, 3.68, 80, 100))
+
+
+if __name__ == '__main__':
+    unittest.main()
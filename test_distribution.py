@@ -0,0 +1,68 @@
+import unittest
+
+import numpy as np
+
+from calculator import charging_time_values, cost_values
+from distribution import calculate_distribution, simulate
+
+
+class TestDistribution(unittest.TestCase):
+    """Test the Monte Carlo ranges"""
+
+    def test_same_seed_same_result(self):
+        """Test that results are reproducible and depend on the seed"""
+        first = calculate_distribution(26.8, 230, (10,), 20, 80, 0.16428, samples=2000, seed=7)
+        second = calculate_distribution(26.8, 230, (10,), 20, 80, 0.16428, samples=2000, seed=7)
+        other = calculate_distribution(26.8, 230, (10,), 20, 80, 0.16428, samples=2000, seed=8)
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first['total_cost'], other['total_cost'])
+
+    def test_pool_matches_single_process(self):
+        """Test that chunks give identical samples on the process pool"""
+        args = (26.8, 230, (6, 16), 20, 80, 0.16428)
+        serial = simulate(*args, samples=60000, seed=3, parallel=False)
+        pooled = simulate(*args, samples=60000, seed=3, parallel=True)
+
+        np.testing.assert_array_equal(serial['hours'], pooled['hours'])
+        np.testing.assert_array_equal(serial['total_cost'], pooled['total_cost'])
+
+    def test_ranges_surround_point_estimate(self):
+        """Test that percentiles are ordered and bracket the exact-input answer"""
+        result = calculate_distribution(26.8, 230, (6, 16), 20, 80, 0.16428, samples=20000)
+        _, total_cost, _ = cost_values(26.8, 20, 80, 0.16428)
+        exact_hours = charging_time_values(26.8, 230, 16, 20, 80)['hours']
+
+        self.assertEqual(result['samples'], 20000)
+        self.assertEqual(list(result['total_cost']), ['p5', 'p25', 'p50', 'p75', 'p95'])
+        self.assertLess(result['total_cost']['p5'], result['total_cost']['p95'])
+        self.assertLess(result['energy_needed']['p5'], 16.08)
+        self.assertGreater(result['energy_needed']['p95'], 16.08)
+        # Charger losses mean the typical session costs more than the lossless estimate
+        self.assertGreater(result['total_cost']['p50'], total_cost)
+        slow, fast = result['charge_times']
+        self.assertEqual(slow['amperage'], 6)
+        self.assertGreater(slow['hours']['p50'], fast['hours']['p50'])
+        self.assertGreater(fast['hours']['p50'], exact_hours)
+
+    def test_uncertainty_overrides(self):
+        """Test that removing all uncertainty collapses the range"""
+        exact = {'soc_sd': 0, 'temperature_c': 20, 'temperature_sd': 0,
+                 'charger_efficiency': 1.0, 'charger_efficiency_sd': 0, 'intensity_sd': 0}
+        result = calculate_distribution(26.8, 230, (10,), 20, 80, 0.16428, samples=100,
+                                        uncertainty=exact)
+
+        self.assertAlmostEqual(result['energy_needed']['p5'], result['energy_needed']['p95'])
+        self.assertAlmostEqual(result['energy_needed']['p50'], 16.08)
+        self.assertAlmostEqual(result['ev_emissions']['p50'], 3.5376)
+
+    def test_invalid_inputs(self):
+        """Test that bad percentages and sample counts are rejected"""
+        with self.assertRaises(ValueError):
+            calculate_distribution(26.8, 230, (10,), 80, 20, 0.16428)
+        with self.assertRaises(ValueError):
+            calculate_distribution(26.8, 230, (10,), 20, 80, 0.16428, samples=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timezone
+from unittest import mock
+
+from app import app
+from history import SessionStore
+
+
+def record_many(path, worker, count):
+    store = SessionStore(path, batch_size=50, flush_interval=0.01)
+    for index in range(count):
+        store.record('actual', 1.0, 0.2, 0.1, vehicle_id=f'car-{worker}', site='depot',
+                     started_at=datetime(2025, 3, 1 + index % 2, tzinfo=timezone.utc))
+    store.flush()
+
+
+class TestSessionStore(unittest.TestCase):
+    """Test the write-behind session history"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, 'sessions.db')
+        self.store = SessionStore(self.path, flush_interval=0.01)
+
+    def test_sessions_are_written_in_background(self):
+        """Test that queued sessions become queryable after a flush"""
+        self.store.record('calculated', 16.08, 3.17, 3.54, vehicle_id='leaf', site='home',
+                          battery_size=26.8, start_percentage=20, end_percentage=80)
+        self.store.record('actual', 10.0, 2.0, 2.2, vehicle_id='zoe')
+        self.store.flush()
+
+        self.assertEqual(self.store.stats(), {'queued': 0, 'written': 2, 'dropped': 0})
+        leaf = self.store.sessions(vehicle_id='leaf')
+        self.assertEqual(len(leaf), 1)
+        self.assertEqual(leaf[0]['site'], 'home')
+        self.assertAlmostEqual(leaf[0]['energy_kwh'], 16.08)
+        self.assertEqual(len(self.store.sessions()), 2)
+
+    def test_rollups_match_raw_sessions(self):
+        """Test that daily and monthly rollups are kept up to date"""
+        for day, energy in ((1, 10.0), (1, 5.0), (2, 7.0)):
+            self.store.record('actual', energy, energy * 0.2, energy * 0.22, vehicle_id='leaf',
+                              started_at=datetime(2025, 1, day, 12, tzinfo=timezone.utc))
+        self.store.record('actual', 3.0, 0.6, 0.66, vehicle_id='leaf',
+                          started_at=datetime(2025, 2, 1, tzinfo=timezone.utc))
+        self.store.flush()
+
+        daily = self.store.rollups('day', vehicle_id='leaf', until='2025-01-31')
+        self.assertEqual([row['period'] for row in daily], ['2025-01-01', '2025-01-02'])
+        self.assertEqual(daily[0]['sessions'], 2)
+        self.assertAlmostEqual(daily[0]['energy_kwh'], 15.0)
+        monthly = self.store.rollups('month')
+        self.assertEqual([(row['period'], row['sessions']) for row in monthly], [('2025-01', 3), ('2025-02', 1)])
+        self.assertAlmostEqual(monthly[0]['cost'], 4.4)
+        with self.assertRaises(ValueError):
+            self.store.rollups('week')
+
+    def test_concurrent_processes(self):
+        """Test that several worker processes can write to one database"""
+        workers = [multiprocessing.Process(target=record_many, args=(self.path, worker, 200))
+                   for worker in range(3)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(30)
+            self.assertEqual(worker.exitcode, 0)
+
+        self.assertEqual(len(self.store.sessions(site='depot', limit=1000)), 600)
+        self.assertEqual(sum(row['sessions'] for row in self.store.rollups('day', site='depot')), 600)
+        self.assertEqual(self.store.rollups('month', vehicle_id='car-1')[0]['sessions'], 200)
+
+    def test_endpoint_limit_is_clamped(self):
+        """Test that a zero or negative limit returns one session, not every session"""
+        for index in range(3):
+            self.store.record('actual', 1.0, 0.2, 0.1, vehicle_id=f'car-{index}')
+        self.store.flush()
+
+        with mock.patch('history.STORE', self.store):
+            client = app.test_client()
+            for limit in (-1, 0):
+                sessions = client.get(f'/api/v1/sessions?limit={limit}').get_json()['sessions']
+                self.assertEqual(len(sessions), 1)
+
+    def test_unknown_kind_rejected(self):
+        """Test that only calculated and actual sessions are accepted"""
+        with self.assertRaises(ValueError):
+            self.store.record('planned', 1.0, 0.2, 0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
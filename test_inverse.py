@@ -0,0 +1,154 @@
+import unittest
+
+import numpy as np
+
+from app import app
+from calculator import charging_time_values
+from curves import ChargeCurve, get_curve
+from inverse import latest_start, minimum_current, reachable_percentage
+from tariffs import TimeOfUseTariff
+
+# Cheap until 07:00, then day, evening peak and late evening prices
+OVERNIGHT_PRICES = [0.1] * 7 + [0.35] * 10 + [0.4] * 4 + [0.3] * 3
+
+
+class TestInverseQueries(unittest.TestCase):
+    """Test solving for current, start time and reachable charge"""
+
+    def setUp(self):
+        self.curve = get_curve('standard_taper')
+        self.tariff = TimeOfUseTariff.from_daily_profile(OVERNIGHT_PRICES)
+
+    def test_minimum_current_is_tight(self):
+        """Test that the answer meets the deadline and one amp less does not"""
+        for curve in (None, self.curve):
+            for available in (11, 14, 20):
+                result = minimum_current(40, 10, 95, 18, 18 + available, curve=curve, max_power_kw=11)
+                amps = result['amperage']
+                self.assertTrue(result['feasible'])
+                self.assertLessEqual(charging_time_values(40, 230, amps, 10, 95, curve, 11)['hours'],
+                                     available + 1e-9)
+                if amps > 6:
+                    self.assertGreater(charging_time_values(40, 230, amps - 1, 10, 95, curve, 11)['hours'],
+                                       available)
+
+    def test_absolute_curve_uses_bisection(self):
+        """Test the bisection over whole amps for curves with absolute limits"""
+        curve = ChargeCurve('absolute', [0, 50, 100], [3.0, 3.0, 1.5])
+        result = minimum_current(40, 10, 90, 0, 14, curve=curve)
+        amps = result['amperage']
+
+        self.assertLessEqual(curve.charging_hours(40, amps * 0.23, 10, 90), 14)
+        self.assertGreater(curve.charging_hours(40, (amps - 1) * 0.23, 10, 90), 14)
+        self.assertEqual(minimum_current(40, 10, 90, 0, 5, curve=curve),
+                         {'feasible': False, 'limit': 'deadline'})
+
+    def test_infeasible_limits(self):
+        """Test that the binding constraint is reported"""
+        self.assertEqual(minimum_current(60, 20, 80, 18, 20)['limit'], 'deadline')
+        self.assertEqual(minimum_current(60, 20, 80, 18, 31, max_power_kw=2)['limit'], 'deadline')
+        self.assertEqual(minimum_current(60, 20, 80, 18, 31, cost_per_kwh=0.2, budget=5)['limit'], 'budget')
+        self.assertEqual(minimum_current(10, 20, 80, 18, 31)['limit'], 'minimum_current')
+
+    def test_tariff_budget_raises_current(self):
+        """Test that a higher current can be cheaper by fitting the cheap window"""
+        slow = minimum_current(60, 20, 70, 18, 31, tariff=self.tariff)
+        cheap = minimum_current(60, 20, 70, 18, 31, tariff=self.tariff, budget=slow['cost'] - 0.5)
+
+        self.assertTrue(cheap['feasible'])
+        self.assertEqual(cheap['limit'], 'budget')
+        self.assertGreater(cheap['amperage'], slow['amperage'])
+        self.assertLessEqual(cheap['cost'], slow['cost'] - 0.5)
+
+    def test_latest_start(self):
+        """Test the latest start with a flat price and with a tariff budget"""
+        flat = latest_start(60, 20, 80, 16, 18, 31, cost_per_kwh=0.2)
+        self.assertAlmostEqual(flat['end_hour'], 31)
+        self.assertAlmostEqual(flat['start_hour'], 31 - 36 / 3.68)
+
+        # Prices rise from 05:00, so the budget forces an earlier start; brute force agrees
+        tariff = TimeOfUseTariff.from_daily_profile([0.1] * 5 + [0.5] * 2 + OVERNIGHT_PRICES[7:])
+        budget = latest_start(60, 20, 50, 16, 18, 31, tariff=tariff)['cost'] - 0.5
+        result = latest_start(60, 20, 50, 16, 18, 31, tariff=tariff, budget=budget)
+        starts = np.linspace(18, 31 - 18 / 3.68, 20001)
+        expected = starts[tariff.session_cost(starts, 3.68, 18) <= budget].max()
+        self.assertEqual(result['limit'], 'budget')
+        self.assertAlmostEqual(result['start_hour'], expected, places=2)
+        self.assertAlmostEqual(result['cost'], budget)
+
+    def test_reachable_percentage(self):
+        """Test the charge reached by the deadline and within a budget"""
+        self.assertAlmostEqual(reachable_percentage(60, 20, 16, 18, 23)['end_percentage'], 20 + 5 * 3.68 / 60 * 100)
+        self.assertEqual(reachable_percentage(60, 20, 16, 0, 24)['limit'], 'full')
+
+        tapered = reachable_percentage(60, 20, 16, 18, 28, curve=self.curve)
+        self.assertAlmostEqual(self.curve.charging_hours(60, 3.68, 20, tapered['end_percentage']), 10, places=3)
+
+        flat = reachable_percentage(60, 20, 16, 18, 31, cost_per_kwh=0.2, budget=6)
+        self.assertEqual(flat['limit'], 'budget')
+        self.assertAlmostEqual(flat['cost'], 6)
+        priced = reachable_percentage(60, 20, 16, 18, 31, tariff=self.tariff, budget=6)
+        self.assertAlmostEqual(priced['cost'], 6)
+
+    def test_solve_endpoint(self):
+        """Test that the API answers all three questions"""
+        response = app.test_client().post('/api/v1/solve', json={
+            'battery_size': 60, 'voltage': 230, 'start_percentage': 20, 'end_percentage': 80, 'cost_per_kwh': 0.2,
+            'plug_in': '18:00', 'ready_by': '07:00', 'budget': 10
+        })
+        result = response.get_json()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(result['minimum_current']['amperage'], 13)
+        self.assertEqual(result['latest_start']['start'], '21:13')
+        self.assertEqual(result['reachable']['limit'], 'budget')
+        self.assertEqual(app.test_client().post('/api/v1/solve', json={'battery_size': 60}).status_code, 400)
+
+    def test_solve_endpoint_uses_charger_currents(self):
+        """Test that a charger type sets the solver's currents"""
+        client = app.test_client()
+        payload = {'vehicle_id': 'nissan-leaf-40', 'start_percentage': 20, 'end_percentage': 80,
+                   'cost_per_kwh': 0.2, 'plug_in': '10:00', 'ready_by': '11:00'}
+        dc = client.post('/api/v1/solve', json=dict(payload, charger='dc-150', amperage=16)).get_json()
+        self.assertAlmostEqual(dc['latest_start']['hours'], 39 * 0.6 / 47.5)  # full current, vehicle limit
+
+        # Eight hours need more than the old 16 A limit, but fit in the charger's 32 A
+        payload.update(vehicle_id='kia-ev6-77', charger='ac1', plug_in='18:00', ready_by='02:00')
+        ac = client.post('/api/v1/solve', json=dict(payload, amperage=63)).get_json()
+        self.assertTrue(ac['minimum_current']['feasible'])
+        self.assertGreater(ac['minimum_current']['amperage'], 16)
+        rated = client.post('/api/v1/solve', json=dict(payload, amperage=32)).get_json()
+        self.assertEqual(ac['latest_start'], rated['latest_start'])
+
+    def test_solve_endpoint_prices_charger_losses(self):
+        """Test that the solver pays for the grid energy, as /api/v1/calculate does"""
+        client = app.test_client()
+        payload = {'battery_size': 60, 'start_percentage': 20, 'end_percentage': 80, 'cost_per_kwh': 0.2,
+                   'charger': 'ac1', 'plug_in': '18:00', 'ready_by': '07:00'}
+        total_cost = client.post('/api/v1/calculate', json=payload).get_json()['total_cost']
+        self.assertAlmostEqual(total_cost, 36 / 0.90 * 0.2 * 1.2)
+
+        result = client.post('/api/v1/solve', json=dict(payload, budget=9)).get_json()
+        self.assertFalse(result['latest_start']['feasible'])
+        self.assertEqual(result['latest_start']['limit'], 'budget')
+        self.assertFalse(result['minimum_current']['feasible'])
+        self.assertAlmostEqual(result['reachable']['cost'], 9)  # stops where the budget runs out
+        self.assertLess(result['reachable']['end_percentage'], 80)
+
+        result = client.post('/api/v1/solve', json=dict(payload, budget=10)).get_json()
+        self.assertAlmostEqual(result['latest_start']['cost'], total_cost)
+        self.assertAlmostEqual(result['minimum_current']['cost'], total_cost)
+
+    def test_negative_budget(self):
+        """Test that a negative budget is a 400 and affords no charging"""
+        self.assertEqual(self.tariff.affordable_hours(18, 3.68, -1), 0.0)
+        response = app.test_client().post('/api/v1/solve', json={
+            'battery_size': 60, 'start_percentage': 20, 'end_percentage': 80, 'cost_per_kwh': 0.2,
+            'tou_prices': ','.join(str(price) for price in OVERNIGHT_PRICES), 'budget': -1
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()['error'], "Budget must not be negative")
+
+
+if __name__ == '__main__':
+    unittest.main()
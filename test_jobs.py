@@ -0,0 +1,194 @@
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import app
+from jobs import JobQueue, QueueFull
+
+
+def wait_for(queue, job_id, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        record = queue.get(job_id)
+        if record['status'] in ('done', 'failed'):
+            return record
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+class TestJobQueue(unittest.TestCase):
+    """Test the bounded background executor"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.release = threading.Event()
+        self.queues = []
+        self.addCleanup(self.finish_jobs)
+
+    def finish_jobs(self):
+        # Let waiting jobs write their results before the directory is removed
+        self.release.set()
+        for queue in self.queues:
+            queue._executor.shutdown(wait=True)
+
+    def make_queue(self, **options):
+        queue = JobQueue(self.directory, **options)
+        self.queues.append(queue)
+        return queue
+
+    def test_result_and_failure(self):
+        """Test that results and errors are stored for polling"""
+        queue = self.make_queue(workers=2)
+        done = wait_for(queue, queue.submit('sum', sum, [1, 2, 3]))
+        failed = wait_for(queue, queue.submit('divide', lambda: 1 / 0))
+
+        self.assertEqual((done['status'], done['result'], done['kind']), ('done', 6, 'sum'))
+        self.assertLessEqual(done['submitted_at'], done['started_at'])
+        self.assertLessEqual(done['started_at'], done['finished_at'])
+        self.assertEqual(failed['status'], 'failed')
+        self.assertIn('division by zero', failed['error'])
+        self.assertEqual(queue.pending, 0)
+
+    def test_full_queue_is_rejected(self):
+        """Test that submissions past the limit raise QueueFull until a job finishes"""
+        queue = self.make_queue(workers=1, max_pending=2)
+        running = queue.submit('wait', self.release.wait)
+        queue.submit('wait', self.release.wait)
+
+        with self.assertRaises(QueueFull) as raised:
+            queue.submit('wait', self.release.wait)
+        self.assertGreaterEqual(raised.exception.retry_after, 1)
+        self.assertEqual(queue.stats()['jobs']['queued'] + queue.stats()['jobs']['running'], 2)
+
+        self.release.set()
+        self.assertEqual(wait_for(queue, running)['status'], 'done')
+        wait_for(queue, queue.submit('sum', sum, [1]))
+        self.assertEqual(queue.stats()['jobs']['done'], 3)
+
+    def test_unknown_and_expired_jobs(self):
+        """Test that malformed, unknown and expired job IDs are not found"""
+        queue = self.make_queue(ttl=60)
+        job_id = queue.submit('sum', sum, [1])
+        wait_for(queue, job_id)
+
+        self.assertIsNone(queue.get('../jobs'))
+        self.assertIsNone(queue.get('0' * 32))
+        with mock.patch('jobs.time.time', return_value=time.time() + 120):
+            queue.remove_expired()
+        self.assertIsNone(queue.get(job_id))
+
+    def test_unfinished_jobs_do_not_expire(self):
+        """Test that queued and running jobs are kept past the TTL"""
+        queue = self.make_queue(workers=1, ttl=60)
+        running = queue.submit('wait', self.release.wait)
+        queued = queue.submit('wait', self.release.wait)
+        while queue.get(running)['status'] != 'running':
+            time.sleep(0.01)
+
+        with mock.patch('jobs.time.time', return_value=time.time() + 120):
+            queue.remove_expired()
+        self.assertEqual(queue.get(running)['status'], 'running')
+        self.assertEqual(queue.get(queued)['status'], 'queued')
+
+    def test_write_errors_release_the_slot(self):
+        """Test that a job whose record cannot be written does not keep its slot"""
+        queue = self.make_queue(max_pending=1)
+        with mock.patch.object(queue, '_write', side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                queue.submit('sum', sum, [1])
+        self.assertEqual(queue.pending, 0)
+
+        # The queued record is written, the running one is not
+        write = queue._write
+        calls = []
+
+        def write_queued_only(record):
+            calls.append(record['status'])
+            if record['status'] != 'queued':
+                raise OSError("disk full")
+            write(record)
+
+        with mock.patch.object(queue, '_write', side_effect=write_queued_only):
+            queue.submit('sum', sum, [1])
+            queue._executor.shutdown(wait=True)
+        self.assertEqual(calls, ['queued', 'running'])
+        self.assertEqual(queue.pending, 0)
+
+    def test_jobs_of_exited_worker_fail(self):
+        """Test that unfinished jobs whose process has gone are reported as failed"""
+        queue = self.make_queue()
+        job_id = queue.submit('wait', self.release.wait)
+        while queue.get(job_id)['status'] != 'running':  # so the job thread has nothing left to write
+            time.sleep(0.01)
+
+        with mock.patch('jobs.os.kill', side_effect=ProcessLookupError):
+            record = queue.get(job_id)
+            self.assertEqual(record['status'], 'failed')
+            self.assertIn('restarted', record['error'])
+            self.assertEqual(queue.stats()['jobs']['failed'], 1)
+        self.assertEqual(queue.get(job_id)['status'], 'failed')
+
+
+class TestJobEndpoints(unittest.TestCase):
+    """Test that heavy API requests are answered with jobs to poll"""
+
+    def setUp(self):
+        self.client = app.app.test_client()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.queue = JobQueue(self.directory, workers=1, max_pending=1)
+        # Runs after each test's own cleanups, so its jobs finish before the directory goes
+        self.addCleanup(lambda: self.queue._executor and self.queue._executor.shutdown(wait=True))
+        patcher = mock.patch('app.job_queue', self.queue)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.payload = {'battery_size': 60, 'start_percentage': 20, 'end_percentage': 80, 'cost_per_kwh': 0.2,
+                        'samples': 2000}
+
+    def test_distribution_job_matches_inline_result(self):
+        """Test that a job polled to completion returns the inline result"""
+        inline = self.client.post('/api/v1/distribution', json=self.payload).get_json()
+        response = self.client.post('/api/v1/distribution', json=dict(self.payload, **{'async': True}))
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.headers['Location'], f"/api/v1/jobs/{response.get_json()['job_id']}")
+        self.assertIn('Retry-After', response.headers)
+
+        wait_for(self.queue, response.get_json()['job_id'])
+        polled = self.client.get(response.headers['Location'])
+        self.assertEqual(polled.status_code, 200)
+        self.assertEqual(polled.get_json()['result'], inline)
+        self.assertEqual(self.client.get('/api/v1/jobs/' + '0' * 32).status_code, 404)
+
+    def test_large_schedule_runs_as_job(self):
+        """Test the schedule threshold, and that bad input is still rejected inline"""
+        vehicles = [{'id': 'van', 'battery_kwh': 60, 'start_pct': 20, 'target_pct': 80, 'departure_slot': 40}]
+        payload = {'site_limit_amps': 32, 'vehicles': vehicles}
+        inline = self.client.post('/api/v1/schedule', json=payload)
+        self.assertEqual(inline.status_code, 200)
+
+        with mock.patch.dict(app.app.config, JOB_SCHEDULE_CELLS=96):
+            response = self.client.post('/api/v1/schedule', json=payload)
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(wait_for(self.queue, response.get_json()['job_id'])['result'], inline.get_json())
+            self.assertEqual(self.client.post('/api/v1/schedule', json={'vehicles': vehicles}).status_code, 400)
+
+    def test_full_queue_answers_429(self):
+        """Test that heavy requests past the limit are refused while the fast path still answers"""
+        release = threading.Event()
+        self.addCleanup(release.set)
+        self.queue.submit('wait', release.wait)
+
+        response = self.client.post('/api/v1/distribution', json=dict(self.payload, **{'async': 1}))
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response.headers['Retry-After']), 1)
+        self.assertEqual(self.client.post('/api/v1/distribution', json=self.payload).status_code, 200)
+        self.assertEqual(self.client.get('/api/v1/jobs').get_json()['pending'], 1)
+        self.assertIn('ev_jobs_queued', self.client.get('/metrics').get_data(as_text=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
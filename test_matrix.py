@@ -0,0 +1,142 @@
+import unittest
+
+import numpy as np
+
+from app import app
+from calculator import charging_time_values
+from curves import ChargeCurve, get_curve
+from matrix import CHARGERS, compute_matrix, page, select_rows, write_csv
+from vehicles import CATALOG, VehicleCatalog
+
+
+def make_row(vehicle_id, make, model, usable_kwh, charger, dc, curve='linear'):
+    return {'id': vehicle_id, 'make': make, 'model': model, 'trim': '', 'usable_kwh': usable_kwh,
+            'efficiency_kwh_per_km': 0.16, 'onboard_charger_kw': charger, 'charge_curve': curve,
+            'dc_max_kw': dc}
+
+
+class TestComparisonMatrix(unittest.TestCase):
+    """Test the batched vehicle x charger matrix"""
+
+    def setUp(self):
+        self.catalog = VehicleCatalog([
+            make_row('zoe', 'Renault', 'Zoe', 41, 22, 0),
+            make_row('leaf', 'Nissan', 'Leaf', 39, 6.6, 50),
+            make_row('ev6', 'Kia', 'EV6', 77, 11, 230),
+        ])
+        self.matrix = compute_matrix(self.catalog, 20, 80, 0.2, dc_cost_per_kwh=0.5)
+        self.columns = [charger['id'] for charger in CHARGERS]
+
+    def test_power_capped_by_vehicle(self):
+        """Test that onboard AC and DC limits cap the charger power before losses"""
+        power = self.matrix['power_kw']
+
+        self.assertAlmostEqual(power[1, self.columns.index('ac3-32')], 6.6 * 0.92)
+        self.assertAlmostEqual(power[2, self.columns.index('ac3-16')], 3 * 230 * 16 * 0.99 / 1000 * 0.92)
+        self.assertAlmostEqual(power[0, self.columns.index('ac3-32')], 3 * 230 * 32 * 0.99 / 1000 * 0.92)
+        self.assertAlmostEqual(power[2, self.columns.index('dc-350')], 230 * 0.95)
+        # The Zoe has no DC inlet
+        dc = [index for index, charger in enumerate(CHARGERS) if charger['kind'] == 'dc']
+        self.assertTrue(np.isnan(power[0, dc]).all())
+        self.assertTrue(np.isnan(self.matrix['hours'][0, dc]).all())
+        self.assertTrue(np.isnan(self.matrix['cost'][0, dc]).all())
+
+    def test_cost_uses_ac_and_dc_prices(self):
+        """Test that DC columns use the DC price and AC columns the home price, for the grid energy"""
+        cost = self.matrix['cost'][2]
+        energy = 77 * 0.6
+
+        self.assertAlmostEqual(cost[self.columns.index('ac1-16')], energy / 0.90 * 0.2 * 1.2)
+        self.assertAlmostEqual(cost[self.columns.index('dc-150')], energy / 0.95 * 0.5 * 1.2)
+
+        # Emissions are per charger too, so lossier chargers emit more
+        emissions = self.matrix['emissions_kg'][2]
+        self.assertAlmostEqual(emissions[self.columns.index('ac1-16')], energy / 0.90 * 0.220)
+        self.assertAlmostEqual(emissions[self.columns.index('dc-150')], energy / 0.95 * 0.220)
+        self.assertEqual(select_rows(self.matrix, sort='emissions_kg:ac1-16')[0],
+                         select_rows(self.matrix, sort='energy_kwh')[0])
+        self.assertAlmostEqual(self.matrix['range_km'][2], energy / 0.16)
+
+    def test_matches_single_calculation_for_catalog(self):
+        """Test that every catalog cell equals the one-vehicle calculation"""
+        result = compute_matrix(CATALOG, 10, 90, 0.2)
+
+        for row, curve_name in enumerate(CATALOG.charge_curves):
+            curve = get_curve(curve_name)
+            for column, power in enumerate(result['power_kw'][row]):
+                if np.isnan(power):
+                    continue
+                expected = charging_time_values(CATALOG.usable_kwh[row], 1000, power, 10, 90, curve)
+                self.assertAlmostEqual(result['hours'][row, column], expected['hours'])
+
+    def test_absolute_curve_evaluated_per_cell(self):
+        """Test that curves with absolute power limits are evaluated at each power"""
+        from curves import CURVES
+        CURVES['test_absolute'] = ChargeCurve('test_absolute', [0, 80, 100], [100, 100, 20])
+        self.addCleanup(CURVES.pop, 'test_absolute')
+        catalog = VehicleCatalog([make_row('abs', 'Test', 'Car', 60, 11, 150, curve='test_absolute')])
+
+        result = compute_matrix(catalog, 20, 90, 0.2)
+        curve = CURVES['test_absolute']
+        for column, power in enumerate(result['power_kw'][0]):
+            self.assertAlmostEqual(result['hours'][0, column], curve.charging_hours(60, power, 20, 90))
+
+    def test_filter_and_sort(self):
+        """Test filters and sort order, with missing values last"""
+        dc_50 = 'hours:dc-50'
+
+        self.assertEqual(select_rows(self.matrix, sort=dc_50).tolist(), [1, 2, 0])
+        self.assertEqual(select_rows(self.matrix, sort=dc_50, descending=True).tolist(), [2, 1, 0])
+        self.assertEqual(select_rows(self.matrix, sort='name').tolist(), [2, 1, 0])
+        self.assertEqual(select_rows(self.matrix, dc_only=True).tolist(), [2, 1])
+        self.assertEqual(select_rows(self.matrix, query='LEA').tolist(), [1])
+        self.assertEqual(select_rows(self.matrix, make='renault').tolist(), [0])
+        self.assertEqual(select_rows(self.matrix, min_range_km=150, sort='usable_kwh').tolist(), [0, 2])
+        with self.assertRaises(ValueError):
+            select_rows(self.matrix, sort='hours:dc-999')
+
+    def test_pagination(self):
+        """Test that pages hold per_page rows and clamp out-of-range numbers"""
+        indexes = select_rows(self.matrix)
+        first = page(self.matrix, indexes, 1, 2)
+        last = page(self.matrix, indexes, 9, 2)
+
+        self.assertEqual((first['total'], first['pages']), (3, 2))
+        self.assertEqual([row['id'] for row in first['rows']], ['ev6', 'leaf'])
+        self.assertEqual(last['page'], 2)
+        self.assertEqual([row['id'] for row in last['rows']], ['zoe'])
+        self.assertIsNone(last['rows'][0]['cells'][-1]['hours'])
+
+    def test_csv_has_every_row(self):
+        """Test that the CSV export streams a header and one line per row"""
+        lines = ''.join(write_csv(self.matrix, select_rows(self.matrix))).splitlines()
+
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[0].startswith('id,name,'))
+        self.assertTrue(lines[3].startswith('zoe,Renault Zoe,'))
+        self.assertTrue(lines[3].endswith(','))
+
+    def test_api_and_page(self):
+        """Test the JSON endpoint and the HTML page"""
+        client = app.test_client()
+        response = client.get('/api/v1/matrix?sort=hours:dc-50&per_page=10&page=2&dc_only=1')
+        result = response.get_json()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(result['page'], 2)
+        self.assertEqual(len(result['rows']), 10)
+        self.assertEqual(len(result['chargers']), len(CHARGERS))
+        self.assertEqual(len(result['rows'][0]['cells']), len(CHARGERS))
+
+        csv_response = client.get('/api/v1/matrix?format=csv')
+        self.assertEqual(csv_response.mimetype, 'text/csv')
+        self.assertEqual(len(csv_response.data.decode().splitlines()), len(CATALOG) + 1)
+
+        self.assertEqual(client.get('/api/v1/matrix?sort=bogus').status_code, 400)
+        html = client.get('/matrix?q=tesla').data.decode()
+        self.assertIn('Tesla Model 3', html)
+        self.assertNotIn('Nissan Leaf', html)
+
+
+if __name__ == '__main__':
+    unittest.main()
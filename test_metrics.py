@@ -0,0 +1,73 @@
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from metrics import NULL_METRIC, MetricsRegistry
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    """Test counters, histograms and the Prometheus output"""
+
+    def test_counter_and_histogram_output(self):
+        """Test that samples are rendered with cumulative buckets"""
+        registry = MetricsRegistry()
+        requests = registry.counter('requests_total', "Requests", method='GET')
+        latency = registry.histogram('latency_seconds', "Latency", buckets=(0.1, 1.0))
+        requests.inc()
+        requests.inc()
+        for value in (0.05, 0.5, 2.0):
+            latency.observe(value)
+
+        text = registry.render()
+        self.assertIn('# TYPE requests_total counter', text)
+        self.assertIn('requests_total{method="GET"} 2\n', text)
+        self.assertIn('latency_seconds_bucket{le="0.1"} 1\n', text)
+        self.assertIn('latency_seconds_bucket{le="1"} 2\n', text)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 3\n', text)
+        self.assertIn('latency_seconds_sum 2.55\n', text)
+        self.assertIn('latency_seconds_count 3\n', text)
+
+    def test_processes_are_summed(self):
+        """Test that per-process files in a shared directory are aggregated"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        workers = []
+        for pid in (101, 102):
+            registry = MetricsRegistry(directory)
+            counter = registry.counter('requests_total', "Requests")
+            with mock.patch('metrics.os.getpid', return_value=pid):
+                counter.inc(pid - 100)
+            workers.append(registry)
+
+        with mock.patch('metrics.os.getpid', return_value=101):
+            self.assertIn('requests_total 3\n', workers[0].render())
+
+    def test_disabled_registry_is_a_no_op(self):
+        """Test that disabling instrumentation skips wrapping entirely"""
+        registry = MetricsRegistry(enabled=False)
+        histogram = registry.histogram('latency_seconds', "Latency")
+
+        def calculate():
+            return 42
+
+        self.assertIs(histogram, NULL_METRIC)
+        self.assertIs(registry.timed(histogram, calculate), calculate)
+        registry.stage_timer({}).mark('parse')
+
+    def test_timed_function(self):
+        """Test that timed() observes each call, including ones that raise"""
+        registry = MetricsRegistry()
+        histogram = registry.histogram('calc_seconds', "Calc")
+
+        def fail():
+            raise ValueError("bad input")
+
+        with self.assertRaises(ValueError):
+            registry.timed(histogram, fail)()
+        registry.timed(histogram, lambda: None)()
+        self.assertIn('calc_seconds_count 2\n', registry.render())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+from datetime import date
+
+from projection import AnnualProjection
+
+
+class TestAnnualProjection(unittest.TestCase):
+    """Test the year-long charging projection"""
+
+    def setUp(self):
+        self.projection = AnnualProjection(weekday_km=(40, 40, 40, 40, 40, 20, 20), tariff=0.2,
+                                           efficiency=0.2, start_date=date(2025, 1, 1),
+                                           seasonal_amplitude=0)
+
+    def test_annual_totals(self):
+        """Test that the weekday pattern and tariff add up over the year"""
+        summary = self.projection.summary()
+
+        # 2025 has 261 weekdays and 104 weekend days
+        self.assertAlmostEqual(summary['annual']['km'], 261 * 40 + 104 * 20)
+        self.assertAlmostEqual(summary['annual']['energy_kwh'], summary['annual']['km'] * 0.2)
+        self.assertAlmostEqual(summary['annual']['cost'], summary['annual']['energy_kwh'] * 0.2 * 1.2)
+        self.assertEqual(summary['sessions'], 365)
+        self.assertEqual(len(summary['monthly']), 12)
+        self.assertEqual(summary['monthly'][1]['month'], '2025-02')
+        self.assertAlmostEqual(sum(month['cost'] for month in summary['monthly']), summary['annual']['cost'])
+
+    def test_tariff_change_only_recomputes_cost(self):
+        """Test that a new tariff leaves driving, energy and emissions untouched"""
+        self.projection.summary()
+        self.projection.update(tariff=[('2025-01-01', 0.2), ('2025-07-01', 0.3)])
+        summary = self.projection.summary()
+
+        self.assertEqual(self.projection.recomputed, ['price', 'cost', 'cost_totals'])
+        self.assertAlmostEqual(summary['monthly'][0]['cost'], summary['monthly'][0]['energy_kwh'] * 0.2 * 1.2)
+        self.assertAlmostEqual(summary['monthly'][6]['cost'], summary['monthly'][6]['energy_kwh'] * 0.3 * 1.2)
+
+    def test_distance_change_skips_prices(self):
+        """Test that changing daily km does not touch the calendar or prices"""
+        self.projection.summary()
+        self.projection.update(weekday_km=10)
+        summary = self.projection.summary()
+
+        self.assertNotIn('price', self.projection.recomputed)
+        self.assertNotIn('calendar', self.projection.recomputed)
+        self.assertAlmostEqual(summary['annual']['km'], 3650)
+
+    def test_unchanged_inputs_recompute_nothing(self):
+        """Test that resending the same inputs is free"""
+        self.projection.summary()
+        self.projection.update(tariff=0.2, weekday_km=(40, 40, 40, 40, 40, 20, 20))
+        self.projection.summary()
+
+        self.assertEqual(self.projection.recomputed, [])
+
+    def test_winter_uses_more_energy(self):
+        """Test the seasonal consumption adjustment"""
+        self.projection.update(seasonal_amplitude=0.15, weekday_km=30)
+        monthly = self.projection.summary()['monthly']
+
+        self.assertGreater(monthly[0]['energy_kwh'] / 31, monthly[6]['energy_kwh'] / 31)
+
+    def test_invalid_inputs(self):
+        """Test that bad distances and unknown inputs are rejected"""
+        with self.assertRaises(ValueError):
+            self.projection.update(weekday_km=(1, 2))
+        with self.assertRaises(ValueError):
+            self.projection.update(daily_km=10)
+
+
+if __name__ == '__main__':
+    unittest.main()
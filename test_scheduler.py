@@ -0,0 +1,82 @@
+import unittest
+
+import numpy as np
+
+from app import app
+from scheduler import MAX_CURRENT, MIN_CURRENT, schedule_site
+
+
+class TestScheduleSite(unittest.TestCase):
+    """Test per-slot current allocation under a site limit"""
+
+    def test_respects_site_limit_and_charger_range(self):
+        """Test that no slot exceeds the limit and chargers stay in 6-16A"""
+        rng = np.random.default_rng(3)
+        n = 200
+        plan = schedule_site(
+            rng.uniform(30, 80, n), rng.uniform(10, 50, n), 80,
+            rng.integers(30, 96, n), site_limit_amps=1000,
+            arrival_slot=rng.integers(0, 20, n)
+        )
+        current = plan['current']
+
+        self.assertLessEqual(plan['site_current'].max(), 1000)
+        self.assertTrue(np.all((current == 0) | ((current >= MIN_CURRENT) & (current <= MAX_CURRENT))))
+
+    def test_energy_matches_power_model(self):
+        """Test that delivered energy follows voltage * amperage"""
+        plan = schedule_site([26.8], [20], [80], [96], site_limit_amps=32)
+        # 16A at 230V is 3.68 kW; 16.08 kWh needs 4.37 hours, 18 slots of 15 minutes
+        self.assertTrue(plan['met'][0])
+        self.assertAlmostEqual(plan['energy_delivered'][0], 16.08)
+        self.assertAlmostEqual(plan['final_percentage'][0], 80)
+        self.assertEqual(int((plan['current'][0] > 0).sum()), 18)
+
+    def test_urgent_vehicle_is_served_first(self):
+        """Test least-laxity-first when only one charger's worth of current is available"""
+        plan = schedule_site([40, 40], [50, 50], [60, 60], [96, 8], site_limit_amps=16)
+
+        self.assertTrue(plan['met'].all())
+        self.assertEqual(plan['current'][1, 0], 16)
+        self.assertEqual(plan['current'][0, 0], 0)
+
+    def test_reports_vehicles_that_miss_deadline(self):
+        """Test that capacity shortfalls and impossible targets are reported"""
+        plan = schedule_site([30, 30, 60], [0, 0, 0], [80, 80, 80], [40, 40, 4], site_limit_amps=16)
+
+        self.assertEqual(plan['unreachable'].tolist(), [2])
+        self.assertIn(2, plan['missed'].tolist())
+        self.assertEqual(len(plan['missed']), 2)  # only one of the first two fits in 16A
+
+    def test_schedule_endpoint(self):
+        """Test the JSON scheduling endpoint"""
+        response = app.test_client().post('/api/v1/schedule', json={
+            'site_limit_amps': 16,
+            'vehicles': [
+                {'id': 'van-1', 'battery_kwh': 40, 'start_pct': 50, 'target_pct': 60, 'departure_slot': 8},
+                {'id': 'van-2', 'battery_kwh': 60, 'start_pct': 0, 'target_pct': 80, 'departure_slot': 4}
+            ]
+        })
+        result = response.get_json()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(result['unreachable'], ['van-2'])
+        self.assertTrue(result['vehicles'][0]['met'])
+
+    def test_slot_length_and_voltage_must_be_positive(self):
+        """Test that zero or negative slots and voltages are rejected, with a 400 from the endpoint"""
+        for options in ({'slot_minutes': 0}, {'slot_minutes': -15}, {'voltage': 0}, {'voltage': -230}):
+            with self.assertRaises(ValueError):
+                schedule_site([40], [20], [80], [8], 32, **options)
+
+            payload = dict(options, site_limit_amps=32, vehicles=[
+                {'battery_kwh': 40, 'start_pct': 20, 'target_pct': 80, 'departure_slot': 8}
+            ])
+            for asynchronous in (False, True):
+                response = app.test_client().post('/api/v1/schedule', json=dict(payload, **{'async': asynchronous}))
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('must be positive', response.get_json()['error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+
+import numpy as np
+
+from solar import plan_solar_charging
+
+SLOTS_PER_DAY = 288  # 5-minute slots
+
+
+def sunny_week():
+    hours = np.arange(7 * SLOTS_PER_DAY) % SLOTS_PER_DAY / 12
+    return np.clip(4 * np.sin((hours - 6) / 12 * np.pi), 0, None)
+
+
+class TestSolarCharging(unittest.TestCase):
+    """Test the PV self-consumption optimizer"""
+
+    def test_uses_surplus_before_grid(self):
+        """Test that a week of sunshine covers a moderate charge without imports"""
+        pv = sunny_week()
+        plan = plan_solar_charging(pv, 0.5, 60, 20, 80, len(pv), cost_per_kwh=0.2)
+
+        self.assertTrue(plan['met'])
+        self.assertAlmostEqual(plan['energy_delivered'], 36)
+        self.assertAlmostEqual(plan['grid_kwh'], 0)
+        self.assertEqual(plan['cost'], 0)
+        self.assertAlmostEqual(plan['cost_without_solar'], 36 * 0.2 * 1.2)
+        charging = plan['current'][plan['current'] > 0]
+        self.assertTrue(((charging >= 6) & (charging <= 16)).all())
+        # Never charge at night when the surplus is zero
+        self.assertFalse(plan['current'][pv == 0].any())
+
+    def test_overnight_deadline_imports(self):
+        """Test that a deadline before sunrise is met from the grid"""
+        pv = sunny_week()
+        plan = plan_solar_charging(pv, 0.5, 60, 20, 40, 72, cost_per_kwh=0.2)
+
+        self.assertTrue(plan['met'])
+        self.assertAlmostEqual(plan['grid_kwh'], 12)
+        self.assertAlmostEqual(plan['cost'], 12 * 0.2 * 1.2)
+
+    def test_partial_surplus_preferred_over_none(self):
+        """Test that slots with some surplus are used before slots with none"""
+        pv = np.array([0.0, 1.0, 0.0, 0.0])
+        plan = plan_solar_charging(pv, 0.0, 10, 0, 1.38 / 12 / 10 * 100, 4)
+
+        self.assertEqual(plan['current'].tolist(), [0, 6, 0, 0])
+        self.assertAlmostEqual(plan['grid_kwh'], 0.38 / 12)
+
+    def test_unreachable_target_charges_flat_out(self):
+        """Test that an impossible target uses every slot at full current"""
+        plan = plan_solar_charging(np.zeros(12), 0.5, 100, 0, 100, 12)
+
+        self.assertFalse(plan['met'])
+        self.assertEqual(plan['current'].tolist(), [16] * 12)
+        self.assertAlmostEqual(plan['final_percentage'], 3.68)
+
+    def test_invalid_inputs(self):
+        """Test that bad windows and charger limits are rejected"""
+        with self.assertRaises(ValueError):
+            plan_solar_charging(np.zeros(12), 0, 60, 20, 80, 13)
+        with self.assertRaises(ValueError):
+            plan_solar_charging(np.zeros(12), 0, 60, 20, 80, 12, max_power_kw=1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
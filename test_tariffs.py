@@ -0,0 +1,120 @@
+import unittest
+
+import numpy as np
+
+from app import app
+from calculator import TVA_MULTIPLIER, calculate_costs, charging_time_values
+from curves import get_curve
+from tariffs import TimeOfUseTariff, format_clock, overnight_window, time_of_use_summary
+
+
+def simulate_cost(prices, slot_hours, start_hour, power_kw, energy_kwh):
+    """Reference cost by stepping through the session minute by minute"""
+    step = 1 / 600  # 6 seconds, in hours
+    cost = 0.0
+    t = start_hour
+    remaining = energy_kwh
+    while remaining > 1e-12:
+        delivered = min(power_kw * step, remaining)
+        cost += delivered * prices[int(t / slot_hours + 1e-9)]
+        remaining -= delivered
+        t += step
+    return cost * TVA_MULTIPLIER
+
+
+class TestTimeOfUseTariff(unittest.TestCase):
+    """Test session pricing and the cheapest window search"""
+
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.prices = np.round(rng.uniform(0.05, 0.40, 96), 4)  # one day of 15 minute slots
+        self.tariff = TimeOfUseTariff(self.prices, slot_minutes=15)
+
+    def test_flat_tariff_matches_calculate_costs(self):
+        """Test that a flat price gives the same cost as calculate_costs"""
+        tariff = TimeOfUseTariff([0.16428] * 48, slot_minutes=30)
+        _, total_cost, _ = calculate_costs(26.8, 20, 80, 0.16428)
+
+        self.assertEqual(f"€{tariff.session_cost(3.25, 2.3, 16.08):.2f}", total_cost)
+
+    def test_session_cost_matches_simulation(self):
+        """Test the prefix-sum cost against a step-by-step simulation"""
+        for start in (0.0, 1.1, 7.33, 15.9):
+            expected = simulate_cost(self.prices, 0.25, start, 3.68, 16.08)
+            self.assertAlmostEqual(self.tariff.session_cost(start, 3.68, 16.08), expected, places=2)
+
+    def test_cheapest_start_beats_every_candidate(self):
+        """Test that no start on a fine grid is cheaper than the search result"""
+        best_start, best_cost = self.tariff.cheapest_start(3.68, 16.08, earliest_hour=2, deadline_hour=20)
+        duration = 16.08 / 3.68
+        grid = np.arange(2, 20 - duration, 0.01)
+
+        self.assertLessEqual(best_start + duration, 20 + 1e-9)
+        self.assertLessEqual(best_cost, self.tariff.session_cost(grid, 3.68, 16.08).min() + 1e-9)
+
+    def test_deadline_too_close_raises(self):
+        """Test that an impossible deadline is reported"""
+        with self.assertRaises(ValueError):
+            self.tariff.cheapest_start(1.38, 16.08, earliest_hour=0, deadline_hour=5)
+
+
+class TestTimeOfUseSummary(unittest.TestCase):
+    """Test the summary shown in the UI and API"""
+
+    def test_overnight_window(self):
+        """Test that a ready-by time before plug-in means the next morning"""
+        self.assertEqual(overnight_window('18:00', '07:00'), (18, 31))
+        self.assertEqual(format_clock(25.5), '01:30')
+
+    def test_cheap_night_rate_is_chosen(self):
+        """Test that charging moves into the cheap night slots"""
+        prices = [0.10] * 8 + [0.30] * 16  # hourly, cheap until 08:00
+        summary = time_of_use_summary(prices, '18:00', '07:00', 26.8, 230, [16], 20, 80)
+
+        self.assertEqual(summary[0]['cheapest_start'], '00:00')
+        self.assertAlmostEqual(summary[0]['cheapest_cost'], 16.08 * 0.10 * TVA_MULTIPLIER)
+        self.assertGreater(summary[0]['savings'], 0)
+
+    def test_unreachable_deadline_has_no_start(self):
+        """Test that an amperage too slow for the window is flagged"""
+        summary = time_of_use_summary([0.2] * 24, '18:00', '05:00', 26.8, 230, [6], 20, 80)
+
+        self.assertIsNone(summary[0]['cheapest_start'])  # 11.7 hours needed, 11 available
+
+    def test_session_length_follows_cap_and_curve(self):
+        """Test that the cheapest start leaves time for the capped, curve-limited session"""
+        prices = [0.30] * 43 + [0.10] + [0.30] * 52  # 15-minute slots, cheap from 10:45 to 11:00
+        uncapped = time_of_use_summary(prices, '08:00', '11:00', 39, 400, [375], 20, 80)
+        self.assertEqual(uncapped[0]['cheapest_start'], '10:45')  # 150 kW fits in the cheap slot
+
+        curve = get_curve('standard_taper')
+        for options in ({'max_power_kw': 47.5}, {'max_power_kw': 47.5, 'curve': curve}):
+            summary = time_of_use_summary(prices, '08:00', '11:00', 39, 400, [375], 20, 80, **options)
+            hours = charging_time_values(39, 400, 375, 20, 80, **options)['hours']
+            self.assertAlmostEqual(summary[0]['cheapest_start_hour'], 11 - hours)
+
+        # The grid energy is priced, including the charger's losses
+        summary = time_of_use_summary(prices, '08:00', '11:00', 39, 400, [375], 20, 80, max_power_kw=47.5,
+                                      charger_efficiency=0.95)
+        grid_kw = 47.5 / 0.95
+        expected = grid_kw * ((23.4 / 47.5 - 0.25) * 0.30 + 0.25 * 0.10) * TVA_MULTIPLIER
+        self.assertAlmostEqual(summary[0]['cheapest_cost'], expected)
+
+    def test_form_shows_time_of_use_table(self):
+        """Test that the results page includes the time-of-use block"""
+        response = app.test_client().post('/', data={
+            'battery_size': '26.8',
+            'voltage': '230',
+            'cost_per_kwh': '0.16428',
+            'start_percentage': '20',
+            'end_percentage': '80',
+            'tou_prices': ','.join(['0.10'] * 8 + ['0.30'] * 16),
+            'plug_in': '18:00',
+            'ready_by': '07:00'
+        })
+
+        self.assertIn(b'Time-of-Use Tariff', response.data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+
+from app import app
+from calculator import calculate_charging_time, calculate_environmental_impact
+from vehicles import CATALOG, VehicleCatalog, get_vehicle
+
+
+def make_row(vehicle_id, make, model, trim, usable_kwh=50, efficiency=0.16, charger=11):
+    return {'id': vehicle_id, 'make': make, 'model': model, 'trim': trim, 'usable_kwh': usable_kwh,
+            'efficiency_kwh_per_km': efficiency, 'onboard_charger_kw': charger, 'charge_curve': 'linear'}
+
+
+class TestVehicleCatalog(unittest.TestCase):
+    """Test catalog indexes"""
+
+    def setUp(self):
+        self.catalog = VehicleCatalog([
+            make_row('kia-ev6', 'Kia', 'EV6', '77 kWh'),
+            make_row('kia-niro', 'Kia', 'e-Niro', '64 kWh'),
+            make_row('ford-mach-e', 'Ford', 'Mustang Mach-E', 'SR', charger=3.0),
+        ])
+
+    def test_exact_id_lookup(self):
+        """Test lookups by ID"""
+        self.assertEqual(self.catalog.get('kia-niro').model, 'e-Niro')
+        self.assertIsNone(self.catalog.get('missing'))
+
+    def test_prefix_search_by_make_and_model(self):
+        """Test autocomplete on make, model and case-insensitive prefixes"""
+        self.assertEqual([v.id for v in self.catalog.search('kia')], ['kia-niro', 'kia-ev6'])
+        self.assertEqual([v.id for v in self.catalog.search('MUSTANG')], ['ford-mach-e'])
+        self.assertEqual([v.id for v in self.catalog.search('kia  e')], ['kia-niro', 'kia-ev6'])
+        self.assertEqual(self.catalog.search('kia', limit=1)[0].id, 'kia-niro')
+        self.assertEqual(self.catalog.search(''), [])
+
+    def test_duplicate_ids_rejected(self):
+        """Test that the ID index stays unique"""
+        with self.assertRaises(ValueError):
+            VehicleCatalog([make_row('a', 'X', 'Y', ''), make_row('a', 'X', 'Z', '')])
+
+    def test_shipped_catalog_loads(self):
+        """Test the bundled data file"""
+        self.assertGreater(len(CATALOG), 0)
+        self.assertEqual(get_vehicle('nissan-leaf-40').usable_kwh, 39.0)
+        with self.assertRaises(ValueError):
+            get_vehicle('no-such-car')
+
+
+class TestVehicleSpecsInCalculations(unittest.TestCase):
+    """Test that per-model specs reach the calculators"""
+
+    def test_efficiency_changes_range(self):
+        """Test per-model kWh/km in the environmental impact"""
+        self.assertEqual(calculate_environmental_impact(16.08, 0.16)['ev_range'], '100.5')
+        self.assertEqual(calculate_environmental_impact(16.08)['ev_range'], '80.4')
+
+    def test_onboard_charger_limits_power(self):
+        """Test that the onboard charger caps the charging power"""
+        result = calculate_charging_time(26.8, 230, 16, 20, 80, max_power_kw=3.0)
+
+        self.assertEqual(result['power_kw'], 3.0)
+        self.assertEqual(result['duration'], "5h 21m")  # 16.08 / 3.0 = 5.36 hours
+
+    def test_api_uses_vehicle_specs(self):
+        """Test that vehicle_id supplies battery size and efficiency"""
+        vehicle = get_vehicle('nissan-leaf-40')
+        result = app.test_client().post('/api/v1/calculate', json={
+            'vehicle_id': vehicle.id, 'start_percentage': 20, 'end_percentage': 80, 'cost_per_kwh': 0.2
+        }).get_json()
+
+        self.assertAlmostEqual(result['energy_needed'], vehicle.usable_kwh * 0.6)
+        self.assertAlmostEqual(result['environmental']['ev_range'],
+                               vehicle.usable_kwh * 0.6 / vehicle.efficiency_kwh_per_km)
+
+    def test_autocomplete_endpoint(self):
+        """Test the vehicle search endpoint"""
+        client = app.test_client()
+        vehicles = client.get('/api/v1/vehicles?q=nissan%20le').get_json()['vehicles']
+
+        self.assertTrue(vehicles)
+        self.assertTrue(all(v['make'] == 'Nissan' for v in vehicles))
+        self.assertEqual(client.get('/api/v1/vehicles/missing').status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+"""In-memory EV model catalog with exact-ID and prefix indexes.
+
+The catalog is loaded once from data/ev_models.csv into column arrays. An
+ID dictionary gives O(1) exact lookups, and a sorted list of lower-cased
+search keys ("make model trim", "model trim") gives autocomplete results
+with a binary search instead of scanning every model.
+"""
+import csv
+import os
+from bisect import bisect_left
+
+import numpy as np
+
+MODELS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'ev_models.csv')
+
+
+class Vehicle:
+    """One catalog entry."""
+
+    __slots__ = ('id', 'make', 'model', 'trim', 'usable_kwh', 'efficiency_kwh_per_km',
+                 'onboard_charger_kw', 'charge_curve', 'dc_max_kw')
+
+    def __init__(self, id, make, model, trim, usable_kwh, efficiency_kwh_per_km,
+                 onboard_charger_kw, charge_curve, dc_max_kw=0.0):
+        self.id = id
+        self.make = make
+        self.model = model
+        self.trim = trim
+        self.usable_kwh = usable_kwh
+        self.efficiency_kwh_per_km = efficiency_kwh_per_km
+        self.onboard_charger_kw = onboard_charger_kw
+        self.charge_curve = charge_curve
+        self.dc_max_kw = dc_max_kw
+
+    @property
+    def name(self):
+        return f"{self.make} {self.model} {self.trim}".strip()
+
+    def to_dict(self):
+        values = {field: getattr(self, field) for field in self.__slots__}
+        values['name'] = self.name
+        return values
+
+
+class VehicleCatalog:
+    """Column-oriented store of EV specifications.
+
+    Args:
+        rows (iterable): Dicts with the ev_models.csv columns; a missing or
+            zero dc_max_kw means the vehicle has no DC fast charging
+    """
+
+    def __init__(self, rows):
+        ids, makes, models, trims, curves = [], [], [], [], []
+        usable, efficiency, charger, dc = [], [], [], []
+        for row in rows:
+            ids.append(row['id'])
+            makes.append(row['make'])
+            models.append(row['model'])
+            trims.append(row.get('trim') or '')
+            curves.append(row.get('charge_curve') or 'linear')
+            usable.append(float(row['usable_kwh']))
+            efficiency.append(float(row['efficiency_kwh_per_km']))
+            charger.append(float(row['onboard_charger_kw']))
+            dc.append(float(row.get('dc_max_kw') or 0))
+
+        self.ids = ids
+        self.makes = makes
+        self.models = models
+        self.trims = trims
+        self.charge_curves = curves
+        self.usable_kwh = np.array(usable)
+        self.efficiency_kwh_per_km = np.array(efficiency)
+        self.onboard_charger_kw = np.array(charger)
+        self.dc_max_kw = np.array(dc)
+
+        self._by_id = {}
+        for index, vehicle_id in enumerate(ids):
+            if vehicle_id in self._by_id:
+                raise ValueError(f"Duplicate vehicle id: {vehicle_id}")
+            self._by_id[vehicle_id] = index
+
+        # Each vehicle can be found by its full name or by model and trim
+        keys = []
+        for index in range(len(ids)):
+            full_name = f"{makes[index]} {models[index]} {trims[index]}".lower()
+            keys.append((full_name, index))
+            keys.append((f"{models[index]} {trims[index]}".lower(), index))
+            keys.append((ids[index], index))
+        keys.sort()
+        self._prefix_keys = [key for key, _ in keys]
+        self._prefix_rows = [index for _, index in keys]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _record(self, index):
+        return Vehicle(
+            self.ids[index], self.makes[index], self.models[index], self.trims[index],
+            float(self.usable_kwh[index]), float(self.efficiency_kwh_per_km[index]),
+            float(self.onboard_charger_kw[index]), self.charge_curves[index], float(self.dc_max_kw[index])
+        )
+
+    def get(self, vehicle_id):
+        """Return the Vehicle with this ID, or None."""
+        index = self._by_id.get(vehicle_id)
+        return None if index is None else self._record(index)
+
+    def search(self, prefix, limit=10):
+        """Return up to limit vehicles whose name, model or ID starts with prefix."""
+        prefix = ' '.join(prefix.lower().split())
+        if not prefix:
+            return []
+        results = []
+        seen = set()
+        position = bisect_left(self._prefix_keys, prefix)
+        while (position < len(self._prefix_keys) and len(results) < limit
+               and self._prefix_keys[position].startswith(prefix)):
+            index = self._prefix_rows[position]
+            if index not in seen:
+                seen.add(index)
+                results.append(self._record(index))
+            position += 1
+        return results
+
+
+def load_catalog(path=MODELS_PATH):
+    """Load the catalog from a CSV file; a missing file gives an empty catalog."""
+    if not os.path.exists(path):
+        return VehicleCatalog([])
+    with open(path, newline='', encoding='utf-8') as f:
+        return VehicleCatalog(csv.DictReader(f))
+
+
+CATALOG = load_catalog()
+
+
+def get_vehicle(vehicle_id):
+    """Look up a catalog vehicle, raising ValueError if the ID is unknown."""
+    vehicle = CATALOG.get(vehicle_id)
+    if vehicle is None:
+        raise ValueError(f"Unknown vehicle: {vehicle_id}")
+    return vehicle